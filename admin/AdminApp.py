@@ -1,13 +1,18 @@
-from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QComboBox, QLabel, QMessageBox, QLineEdit
+from PyQt5.QtWidgets import QApplication, QMainWindow, QPushButton, QVBoxLayout, QWidget, QComboBox, QLabel, QMessageBox, QLineEdit, \
+    QHBoxLayout, QSpinBox, QFileDialog
 from PyQt5.QtGui import QIcon, QFont
 from PyQt5.QtCore import Qt, QTimer
 import sys
+import csv
 import requests
 from uuid import uuid4
 import pyperclip
 import os
 from client.config import SERVER_URL
 
+# Ключ администратора сервера (ADMIN_API_KEY в окружении или .env), нужен для массового создания лицензий
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY", "")
+
 def resource_path(relative_path):
     if getattr(sys, 'frozen', False):
         base_path = sys._MEIPASS
@@ -20,7 +25,7 @@ class AdminApp(QMainWindow):
         super().__init__()
         self.setWindowTitle("DocStitcher admin")
         self.setWindowIcon(QIcon(resource_path("../assets/app_icon.png")))
-        self.setGeometry(100, 100, 500, 300)
+        self.setGeometry(100, 100, 500, 380)
         self.setMinimumSize(400, 250)
 
         self.central_widget = QWidget()
@@ -52,6 +57,24 @@ class AdminApp(QMainWindow):
         self.copy_btn.setEnabled(False)
         layout.addWidget(self.copy_btn)
 
+        bulk_layout = QHBoxLayout()
+        self.bulk_count = QSpinBox()
+        self.bulk_count.setFont(QFont("Arial", 11))
+        self.bulk_count.setRange(1, 50000)
+        self.bulk_count.setValue(100)
+        self.bulk_count.setToolTip("Количество лицензий для пакетного создания")
+        bulk_layout.addWidget(self.bulk_count)
+        self.create_bulk_btn = QPushButton("Создать N лицензий")
+        self.create_bulk_btn.setFont(QFont("Arial", 12))
+        self.create_bulk_btn.clicked.connect(self.create_licenses_bulk)
+        bulk_layout.addWidget(self.create_bulk_btn)
+        self.export_btn = QPushButton("Экспорт в CSV")
+        self.export_btn.setFont(QFont("Arial", 12))
+        self.export_btn.clicked.connect(self.export_to_csv)
+        self.export_btn.setEnabled(False)
+        bulk_layout.addWidget(self.export_btn)
+        layout.addLayout(bulk_layout)
+
         self.result_label = QLineEdit()
         self.result_label.setFont(QFont("Arial", 11))
         self.result_label.setReadOnly(True)
@@ -121,6 +144,8 @@ class AdminApp(QMainWindow):
         """)
 
         self.last_license_key = ""
+        self.last_license_keys = []
+        self.last_license_code = ""
 
         self.code_to_name = {
             "LICENSE-UNLIMITED": "Безлимитная лицензия",
@@ -214,6 +239,66 @@ class AdminApp(QMainWindow):
             self.copy_btn.setEnabled(False)
             QMessageBox.critical(self, "Ошибка", f"Неизвестная ошибка: {str(e)}")
 
+    def create_licenses_bulk(self):
+        license_name = self.license_type.currentText()
+        license_code = next((code for code, name in self.code_to_name.items() if name == license_name), None)
+        if not license_code:
+            QMessageBox.critical(self, "Ошибка", "Выберите тип лицензии")
+            return
+
+        count = self.bulk_count.value()
+        try:
+            response = requests.post(f"{SERVER_URL}/create_licenses/bulk", json={
+                "license_type_code": license_code,
+                "count": count
+            }, headers={"X-Admin-Key": ADMIN_API_KEY}, timeout=60)
+            if response.status_code == 200:
+                data = response.json()
+                self.last_license_keys = data.get("license_keys", [])
+                self.last_license_code = license_code
+                self.export_btn.setEnabled(bool(self.last_license_keys))
+                self.result_label.setText(f"Создано лицензий: {len(self.last_license_keys)}")
+                self.result_label.setStyleSheet("color: #2e7d32;")
+                QMessageBox.information(self, "Успех", f"Создано лицензий: {len(self.last_license_keys)}\n"
+                                                       f"Нажмите 'Экспорт в CSV', чтобы сохранить ключи")
+            else:
+                error = response.json().get("detail", "Ошибка создания лицензий")
+                self.result_label.setText(f"Ошибка: {error}")
+                self.result_label.setStyleSheet("color: #d32f2f;")
+                QMessageBox.critical(self, "Ошибка", f"Ошибка: {error}")
+        except requests.exceptions.ConnectionError as e:
+            self.result_label.setText(f"Ошибка соединения: {str(e)}")
+            self.result_label.setStyleSheet("color: #d32f2f;")
+            QMessageBox.critical(self, "Ошибка", f"Ошибка соединения: {str(e)}")
+        except requests.exceptions.Timeout:
+            self.result_label.setText("Тайм-аут при создании лицензий")
+            self.result_label.setStyleSheet("color: #d32f2f;")
+            QMessageBox.critical(self, "Ошибка", "Тайм-аут при создании лицензий")
+        except Exception as e:
+            self.result_label.setText(f"Неизвестная ошибка: {str(e)}")
+            self.result_label.setStyleSheet("color: #d32f2f;")
+            QMessageBox.critical(self, "Ошибка", f"Неизвестная ошибка: {str(e)}")
+
+    def export_to_csv(self):
+        if not self.last_license_keys:
+            return
+        file_path, _ = QFileDialog.getSaveFileName(self, "Экспорт ключей", f"{self.last_license_code}.csv",
+                                                   "CSV Files (*.csv)")
+        if not file_path:
+            return
+        try:
+            # utf-8-sig, чтобы Excel правильно открыл кириллицу
+            with open(file_path, "w", newline="", encoding="utf-8-sig") as f:
+                writer = csv.writer(f, delimiter=";")
+                writer.writerow(["license_key", "license_type_code", "license_type"])
+                license_name = self.code_to_name.get(self.last_license_code, self.last_license_code)
+                for license_key in self.last_license_keys:
+                    writer.writerow([license_key, self.last_license_code, license_name])
+            self.result_label.setText(f"Ключи сохранены: {file_path}")
+            self.result_label.setStyleSheet("color: #2e7d32;")
+        except OSError as e:
+            QMessageBox.critical(self, "Ошибка", f"Не удалось сохранить файл: {str(e)}")
+
     def copy_to_clipboard(self):
         if self.last_license_key:
             pyperclip.copy(self.last_license_key)
@@ -16,7 +16,7 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
-from backend.models import Base, LicenseType, License, LicenseDevice
+from backend.models import Base, LicenseType, License, LicenseDevice, RenderJob, RenderJobChunk
 target_metadata = Base.metadata
 
 def run_migrations_offline() -> None:
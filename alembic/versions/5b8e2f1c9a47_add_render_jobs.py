@@ -0,0 +1,66 @@
+"""Add render jobs
+
+Revision ID: 5b8e2f1c9a47
+Revises: 9d41c7e2b5a3
+Create Date: 2026-10-19 12:20:11.305817
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2f1c9a47'
+down_revision: Union[str, Sequence[str], None] = '9d41c7e2b5a3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table('render_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('license_id', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('params', sa.Text(), nullable=False),
+    sa.Column('input_files', sa.Text(), nullable=False),
+    sa.Column('page_count', sa.Integer(), nullable=True),
+    sa.Column('first_page_count', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('worker_id', sa.String(length=64), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=True),
+    sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['license_id'], ['licenses.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_render_jobs_status', 'render_jobs', ['status'], unique=False)
+    op.create_index('idx_render_jobs_license', 'render_jobs', ['license_id', 'created_at'], unique=False)
+    op.create_table('render_job_chunks',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('job_id', sa.String(length=36), nullable=False),
+    sa.Column('first_page', sa.Integer(), nullable=False),
+    sa.Column('last_page', sa.Integer(), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('pages_done', sa.Integer(), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('layers', sa.Text(), nullable=True),
+    sa.Column('worker_id', sa.String(length=64), nullable=True),
+    sa.Column('heartbeat_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['job_id'], ['render_jobs.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('idx_render_job_chunks_job', 'render_job_chunks', ['job_id', 'first_page'], unique=False)
+    op.create_index('idx_render_job_chunks_status', 'render_job_chunks', ['status'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_render_job_chunks_status', table_name='render_job_chunks')
+    op.drop_index('idx_render_job_chunks_job', table_name='render_job_chunks')
+    op.drop_table('render_job_chunks')
+    op.drop_index('idx_render_jobs_license', table_name='render_jobs')
+    op.drop_index('idx_render_jobs_status', table_name='render_jobs')
+    op.drop_table('render_jobs')
@@ -0,0 +1,32 @@
+"""Add license search indexes
+
+Revision ID: 9d41c7e2b5a3
+Revises: f7ba904fb211
+Create Date: 2026-10-19 12:04:51.418203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9d41c7e2b5a3'
+down_revision: Union[str, Sequence[str], None] = 'f7ba904fb211'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_licenses_type_active', 'licenses', ['license_type_code', 'is_active'], unique=False)
+    op.create_index('idx_licenses_created_at', 'licenses', ['created_at'], unique=False)
+    op.create_index('idx_license_devices_device_id', 'license_devices', ['device_id'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_license_devices_device_id', table_name='license_devices')
+    op.drop_index('idx_licenses_created_at', table_name='licenses')
+    op.drop_index('idx_licenses_type_active', table_name='licenses')
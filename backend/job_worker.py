@@ -0,0 +1,298 @@
+"""Рабочие процессы сервиса задач объединения (backend/jobs.py).
+
+Каждый процесс в цикле берёт из БД очередной шаг и выполняет его:
+prepare — склеить загруженные файлы в merged.pdf и нарезать страницы на диапазоны;
+render — отрендерить один диапазон страниц тем же process_page, что и клиент;
+assemble — когда все диапазоны готовы, собрать result.pdf по порядку страниц.
+Шаг забирается условным UPDATE по статусу, поэтому процессы на разных узлах с общей БД
+и общим JOB_STORAGE_DIR не берут одно и то же дважды. Шаг, чей процесс перестал
+обновлять heartbeat_at дольше JOB_LEASE_S, возвращается в очередь.
+
+    python -m backend.job_worker --processes 4
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import shutil
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+import pymupdf as fitz
+from sqlalchemy import exists
+
+from backend.dbase import SessionLocal, engine
+from backend.jobs import job_dir, RESULT_NAME
+from backend.models import RenderJob, RenderJobChunk
+from client.pdf_output import save_pdf
+from client.render_profiles import get_render_profile, A4_WIDTH_PT, A4_HEIGHT_PT
+from client.render_worker import pt_to_px, process_page
+
+logger = logging.getLogger(__name__)
+
+JOB_CHUNK_PAGES = int(os.getenv("JOB_CHUNK_PAGES", "25"))
+JOB_LEASE_S = int(os.getenv("JOB_LEASE_S", "300"))
+JOB_WORKER_POLL_S = float(os.getenv("JOB_WORKER_POLL_S", "1"))
+MAX_CHUNK_ATTEMPTS = 3
+ASSETS_DIR = os.getenv("JOB_ASSETS_DIR", os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                                                      "assets"))
+MERGED_NAME = "merged.pdf"
+
+def decoration_assets():
+    """Пути к картинкам ленты и точек в порядке аргументов process_page (как в клиенте)."""
+    return (
+        os.path.join(ASSETS_DIR, "ribbons", "ribbon.png"),
+        os.path.join(ASSETS_DIR, "ribbons", "ribbon_left.png"),
+        os.path.join(ASSETS_DIR, "ribbons", "ribbon_middle.png"),
+        os.path.join(ASSETS_DIR, "dots", "dot1.png"),
+        os.path.join(ASSETS_DIR, "dots", "dot2.png"),
+        os.path.join(ASSETS_DIR, "dots", "middle_dot.png"),
+    )
+
+def now_utc():
+    return datetime.now(timezone.utc)
+
+def claim(db, model, row_id, from_status, to_status, worker_id, **values):
+    """Переводит строку из from_status в to_status, только если её никто не успел забрать."""
+    updated = db.query(model).filter(model.id == row_id, model.status == from_status).update(
+        {"status": to_status, "worker_id": worker_id, "heartbeat_at": now_utc(), **values},
+        synchronize_session=False,
+    )
+    db.commit()
+    return updated == 1
+
+def heartbeat(db, model, row_id, status, worker_id):
+    """Продлевает аренду шага; False, если шаг уже вернулся в очередь и его забрал другой процесс."""
+    updated = db.query(model).filter(model.id == row_id, model.status == status, model.worker_id == worker_id).update(
+        {"heartbeat_at": now_utc()}, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+def temp_path(base_dir, name):
+    # Свой временный файл у каждого процесса: шаг, вернувшийся в очередь, может ещё доделывать старый
+    return os.path.join(base_dir, f"{name}.{uuid.uuid4().hex}.tmp")
+
+def fail_job(db, job_id, error):
+    db.query(RenderJob).filter(RenderJob.id == job_id, RenderJob.status.notin_(("done", "cancelled"))).update(
+        {"status": "failed", "error": error[:2000], "finished_at": now_utc()}, synchronize_session=False)
+    db.commit()
+    logger.error(f"Render job {job_id} failed: {error}")
+
+def requeue_stale(db):
+    """Возвращает в очередь шаги процессов, которые перестали подавать признаки жизни."""
+    deadline = now_utc() - timedelta(seconds=JOB_LEASE_S)
+    stale_chunks = db.query(RenderJobChunk).filter(RenderJobChunk.status == "running",
+                                                   RenderJobChunk.heartbeat_at < deadline).all()
+    for chunk in stale_chunks:
+        if chunk.attempts >= MAX_CHUNK_ATTEMPTS:
+            chunk.status = "failed"
+            db.commit()
+            fail_job(db, chunk.job_id, f"Страницы {chunk.first_page + 1}-{chunk.last_page + 1}: "
+                                       f"рабочий процесс не ответил {MAX_CHUNK_ATTEMPTS} раза")
+        else:
+            claim(db, RenderJobChunk, chunk.id, "running", "queued", None)
+    for from_status, to_status in (("preparing", "queued"), ("assembling", "rendering")):
+        for job in db.query(RenderJob).filter(RenderJob.status == from_status, RenderJob.heartbeat_at < deadline):
+            claim(db, RenderJob, job.id, from_status, to_status, None)
+
+def claim_task(db, worker_id):
+    """Следующий шаг: сначала сборка готовых задач, затем страницы старых задач, затем новые."""
+    unfinished_chunk = exists().where(RenderJobChunk.job_id == RenderJob.id, RenderJobChunk.status != "done")
+    for job in db.query(RenderJob).filter(RenderJob.status == "rendering", ~unfinished_chunk).order_by(
+            RenderJob.created_at):
+        if claim(db, RenderJob, job.id, "rendering", "assembling", worker_id):
+            return "assemble", job.id
+    chunks = db.query(RenderJobChunk).join(RenderJob).filter(
+        RenderJobChunk.status == "queued", RenderJob.status == "rendering"
+    ).order_by(RenderJob.created_at, RenderJobChunk.first_page).limit(10).all()
+    for chunk in chunks:
+        if claim(db, RenderJobChunk, chunk.id, "queued", "running", worker_id, attempts=chunk.attempts + 1):
+            return "render", chunk.id
+    for job in db.query(RenderJob).filter(RenderJob.status == "queued").order_by(RenderJob.created_at).limit(10):
+        if claim(db, RenderJob, job.id, "queued", "preparing", worker_id):
+            return "prepare", job.id
+    return None
+
+def prepare_job(db, job_id, worker_id):
+    job = db.get(RenderJob, job_id)
+    base_dir = job_dir(job_id)
+    merged = fitz.open()
+    first_page_count = None
+    for relative_path in json.loads(job.input_files):
+        if not heartbeat(db, RenderJob, job_id, "preparing", worker_id):
+            merged.close()
+            logger.warning(f"Render job {job_id} was taken over by another worker")
+            return
+        path = os.path.join(base_dir, relative_path)
+        if relative_path.lower().endswith(".pdf"):
+            src = fitz.open(path)
+        else:
+            # Картинка становится страницей своего размера; в лист A4 её вписывает рендер
+            with fitz.open(path) as image:
+                src = fitz.open("pdf", image.convert_to_pdf())
+        with src:
+            merged.insert_pdf(src)
+            if first_page_count is None:
+                first_page_count = len(src)
+    page_count = len(merged)
+    if page_count == 0:
+        merged.close()
+        fail_job(db, job_id, "В пакете нет страниц")
+        return
+    temp_merged = temp_path(base_dir, MERGED_NAME)
+    merged.save(temp_merged, garbage=3, deflate=True)
+    merged.close()
+    os.replace(temp_merged, os.path.join(base_dir, MERGED_NAME))
+    os.makedirs(os.path.join(base_dir, "pages"), exist_ok=True)
+    # Диапазоны добавляются в одной транзакции с условным переходом задачи в rendering:
+    # процесс, у которого задачу уже забрали, не добавит второй набор страниц
+    updated = db.query(RenderJob).filter(
+        RenderJob.id == job_id, RenderJob.status == "preparing", RenderJob.worker_id == worker_id
+    ).update({"status": "rendering", "page_count": page_count, "first_page_count": first_page_count},
+             synchronize_session=False)
+    if updated != 1:
+        db.rollback()
+        logger.warning(f"Render job {job_id} was taken over by another worker")
+        return
+    # Последняя страница не рендерится: при сборке она копируется как есть
+    for first_page in range(0, page_count - 1, JOB_CHUNK_PAGES):
+        db.add(RenderJobChunk(job_id=job_id, first_page=first_page,
+                              last_page=min(first_page + JOB_CHUNK_PAGES, page_count - 1) - 1))
+    db.commit()
+    logger.info(f"Render job {job_id} prepared: {page_count} pages")
+
+def render_chunk(db, chunk_id, worker_id):
+    chunk = db.get(RenderJobChunk, chunk_id)
+    job = chunk.job
+    params = json.loads(job.params)
+    profile = get_render_profile(params["render_profile"])
+    dpi = profile["dpi"]
+    base_dir = job_dir(job.id)
+    merged_path = os.path.join(base_dir, MERGED_NAME)
+    pages_dir = os.path.join(base_dir, "pages")
+    rendered = []
+    for page_num in range(chunk.first_page, chunk.last_page + 1):
+        db.refresh(job)
+        if job.status != "rendering":
+            logger.info(f"Render job {job.id} is {job.status}, chunk {chunk_id} dropped")
+            return
+        _, layers = process_page(page_num, merged_path, pt_to_px(A4_WIDTH_PT, dpi), pt_to_px(A4_HEIGHT_PT, dpi), dpi,
+                                 params["ribbon_position"], job.first_page_count, params["checkbox_bw"],
+                                 *decoration_assets(), page_offset=0, profile=profile, output_dir=pages_dir)
+        if not layers:
+            # process_page пишет причину в лог и возвращает None; диапазон повторяется или задача падает
+            raise RuntimeError(f"Не удалось обработать страницу {page_num + 1}")
+        # Пути относительно каталога задачи: на других узлах общий том может быть смонтирован иначе
+        rendered.append([[os.path.relpath(path, base_dir), rect] for path, rect in layers])
+        updated = db.query(RenderJobChunk).filter(
+            RenderJobChunk.id == chunk_id, RenderJobChunk.worker_id == worker_id, RenderJobChunk.status == "running"
+        ).update({"pages_done": len(rendered), "heartbeat_at": now_utc()}, synchronize_session=False)
+        db.commit()
+        if not updated:
+            logger.warning(f"Chunk {chunk_id} was taken over by another worker")
+            return
+    db.query(RenderJobChunk).filter(
+        RenderJobChunk.id == chunk_id, RenderJobChunk.worker_id == worker_id, RenderJobChunk.status == "running"
+    ).update({"status": "done", "layers": json.dumps(rendered)}, synchronize_session=False)
+    db.commit()
+
+def assemble_job(db, job_id, worker_id):
+    job = db.get(RenderJob, job_id)
+    base_dir = job_dir(job_id)
+    merged = fitz.open(os.path.join(base_dir, MERGED_NAME))
+    new_doc = fitz.open()
+    for chunk in job.chunks:
+        if not heartbeat(db, RenderJob, job_id, "assembling", worker_id):
+            new_doc.close()
+            merged.close()
+            logger.warning(f"Render job {job_id} was taken over by another worker")
+            return
+        for offset, layers in enumerate(json.loads(chunk.layers)):
+            if not layers:
+                raise RuntimeError(f"Нет страницы {chunk.first_page + offset + 1}")
+            new_page = new_doc.new_page(width=A4_WIDTH_PT, height=A4_HEIGHT_PT)
+            for relative_path, rect in layers:
+                rect = fitz.Rect(rect) if rect else fitz.Rect(0, 0, A4_WIDTH_PT, A4_HEIGHT_PT)
+                new_page.insert_image(rect, filename=os.path.join(base_dir, relative_path))
+    new_doc.insert_pdf(merged, from_page=len(merged) - 1, to_page=len(merged) - 1)
+    merged.close()
+    temp_output = temp_path(base_dir, RESULT_NAME)
+    save_pdf(new_doc, temp_output)
+    new_doc.close()
+    os.replace(temp_output, os.path.join(base_dir, RESULT_NAME))
+    updated = db.query(RenderJob).filter(
+        RenderJob.id == job_id, RenderJob.status == "assembling", RenderJob.worker_id == worker_id
+    ).update({"status": "done", "finished_at": now_utc()}, synchronize_session=False)
+    db.commit()
+    if updated:
+        # Промежуточные файлы больше не нужны, остаётся только результат
+        for name in ("inputs", "pages"):
+            shutil.rmtree(os.path.join(base_dir, name), ignore_errors=True)
+        os.remove(os.path.join(base_dir, MERGED_NAME))
+        logger.info(f"Render job {job_id} done: {job.page_count} pages")
+
+TASKS = {"prepare": prepare_job, "render": render_chunk, "assemble": assemble_job}
+
+def run_task(kind, row_id, worker_id):
+    with SessionLocal() as db:
+        try:
+            TASKS[kind](db, row_id, worker_id)
+        except Exception as e:
+            db.rollback()
+            logger.exception(f"Task {kind} {row_id} failed")
+            if kind == "render":
+                chunk = db.get(RenderJobChunk, row_id)
+                if chunk.attempts < MAX_CHUNK_ATTEMPTS:
+                    claim(db, RenderJobChunk, row_id, "running", "queued", None)
+                    return
+                claim(db, RenderJobChunk, row_id, "running", "failed", worker_id)
+                fail_job(db, chunk.job_id, f"Страницы {chunk.first_page + 1}-{chunk.last_page + 1}: {e}")
+            else:
+                fail_job(db, row_id, str(e))
+
+def worker_loop(worker_index, idle_exit=False):
+    """Цикл одного процесса; idle_exit=True завершает его, когда очередь опустела."""
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(asctime)s %(name)s: %(message)s')
+    # Соединения, унаследованные от родителя при fork, не должны использоваться в двух процессах
+    engine.dispose(close=False)
+    worker_id = f"{socket.gethostname()}:{os.getpid()}"
+    logger.info(f"Job worker {worker_index} started as {worker_id}")
+    while True:
+        with SessionLocal() as db:
+            requeue_stale(db)
+            task = claim_task(db, worker_id)
+        if task is None:
+            if idle_exit:
+                return
+            time.sleep(JOB_WORKER_POLL_S)
+            continue
+        run_task(*task, worker_id)
+
+def main():
+    parser = argparse.ArgumentParser(description="Рабочие процессы сервиса задач объединения")
+    parser.add_argument("--processes", type=int, default=multiprocessing.cpu_count(), help="Число процессов")
+    parser.add_argument("--idle-exit", action="store_true", help="Завершиться, когда очередь опустеет")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='[%(levelname)s] %(asctime)s %(name)s: %(message)s')
+    missing = [path for path in decoration_assets() if not os.path.isfile(path)]
+    if missing:
+        logger.error(f"Decoration assets not found (JOB_ASSETS_DIR={ASSETS_DIR}): {', '.join(missing)}")
+        return 1
+    processes = [multiprocessing.Process(target=worker_loop, args=(index, args.idle_exit), daemon=True)
+                 for index in range(args.processes)]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+import shutil
+import uuid
+from datetime import datetime, timezone
+
+import jwt
+from dotenv import load_dotenv
+from fastapi import APIRouter, Depends, File, Form, HTTPException, Security, UploadFile
+from fastapi.responses import FileResponse
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.orm import Session
+
+from backend.dbase import SessionLocal
+from backend.models import RenderJob
+
+load_dotenv()
+logger = logging.getLogger(__name__)
+router = APIRouter(prefix="/jobs", tags=["jobs"])
+security = HTTPBearer()
+
+ALGORITHM = "HS256"
+# Общий каталог задач: на нескольких узлах это один сетевой том, пути в БД хранятся относительно него
+JOB_STORAGE_DIR = os.path.abspath(os.getenv("JOB_STORAGE_DIR", "job_storage"))
+MAX_JOB_UPLOAD_MB = int(os.getenv("MAX_JOB_UPLOAD_MB", "500"))
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+# .doc/.docx конвертирует Word на клиенте: на сервере его нет
+SERVER_INPUT_EXTENSIONS = ('.pdf', '.jpg', '.jpeg', '.png')
+RIBBON_POSITIONS = ("Сверху", "Слева", "По середине")
+RENDER_PROFILES = ("draft", "standard", "archival")
+FINAL_STATUSES = ("done", "failed", "cancelled")
+RESULT_NAME = "result.pdf"
+
+def job_dir(job_id: str):
+    return os.path.join(JOB_STORAGE_DIR, job_id)
+
+def get_db():
+    db = SessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+def current_license_id(credentials: HTTPAuthorizationCredentials = Security(security)):
+    """Задачи ставит и читает владелец токена-аренды клиента (см. create_lease_token)."""
+    try:
+        payload = jwt.decode(credentials.credentials, os.getenv("SECRET_KEY"), algorithms=[ALGORITHM])
+    except jwt.ExpiredSignatureError:
+        raise HTTPException(status_code=401, detail="Токен истек")
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Неверный токен")
+    license_id = payload.get("license_id")
+    if license_id is None:
+        raise HTTPException(status_code=401, detail="Неверный токен")
+    return license_id
+
+def get_own_job(job_id: str, license_id: int, db: Session):
+    job = db.query(RenderJob).filter(RenderJob.id == job_id, RenderJob.license_id == license_id).first()
+    if not job:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    return job
+
+def job_status(job: RenderJob):
+    pages_done = sum(chunk.pages_done for chunk in job.chunks)
+    # Последняя страница не рендерится, а копируется при сборке
+    render_pages = max((job.page_count or 0) - 1, 0)
+    chunks = {}
+    for chunk in job.chunks:
+        chunks[chunk.status] = chunks.get(chunk.status, 0) + 1
+    if job.status == "done":
+        progress = 1.0
+    elif render_pages:
+        progress = round(pages_done / render_pages, 4)
+    else:
+        progress = 0.0
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "page_count": job.page_count,
+        "pages_done": pages_done,
+        "progress": progress,
+        "chunks": chunks,
+        "error": job.error,
+        "created_at": job.created_at.isoformat() if job.created_at else None,
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }
+
+def save_upload(upload: UploadFile, path: str, budget: int):
+    """Пишет файл на диск частями; возвращает, сколько байт из budget осталось."""
+    with open(path, "wb") as f:
+        while True:
+            data = upload.file.read(UPLOAD_CHUNK_BYTES)
+            if not data:
+                break
+            budget -= len(data)
+            if budget < 0:
+                raise HTTPException(status_code=413, detail=f"Пакет больше {MAX_JOB_UPLOAD_MB} МБ")
+            f.write(data)
+    return budget
+
+@router.post("", status_code=202)
+def create_job(files: list[UploadFile] = File(...), ribbon_position: str = Form("Сверху"),
+               checkbox_bw: bool = Form(False), render_profile: str = Form("archival"),
+               license_id: int = Depends(current_license_id), db: Session = Depends(get_db)):
+    if ribbon_position not in RIBBON_POSITIONS:
+        raise HTTPException(status_code=400, detail="Неизвестное расположение ленты")
+    if render_profile not in RENDER_PROFILES:
+        raise HTTPException(status_code=400, detail="Неизвестный профиль рендеринга")
+    for upload in files:
+        if not (upload.filename or "").lower().endswith(SERVER_INPUT_EXTENSIONS):
+            raise HTTPException(status_code=415,
+                                detail=f"Формат файла {upload.filename} не поддерживается сервером: "
+                                       f"документы Word нужно сначала преобразовать в PDF")
+    job_id = str(uuid.uuid4())
+    inputs_dir = os.path.join(job_dir(job_id), "inputs")
+    os.makedirs(inputs_dir)
+    input_files = []
+    budget = MAX_JOB_UPLOAD_MB * 1024 * 1024
+    try:
+        for index, upload in enumerate(files):
+            # Порядок объединения — порядок файлов в запросе; имя клиента в путь не попадает
+            ext = os.path.splitext(upload.filename)[1].lower()
+            relative_path = os.path.join("inputs", f"{index:04d}{ext}")
+            budget = save_upload(upload, os.path.join(job_dir(job_id), relative_path), budget)
+            input_files.append(relative_path)
+    except Exception:
+        shutil.rmtree(job_dir(job_id), ignore_errors=True)
+        raise
+    job = RenderJob(
+        id=job_id,
+        license_id=license_id,
+        status="queued",
+        params=json.dumps({"ribbon_position": ribbon_position, "checkbox_bw": checkbox_bw,
+                           "render_profile": render_profile}, ensure_ascii=False),
+        input_files=json.dumps(input_files),
+        created_at=datetime.now(timezone.utc),
+    )
+    db.add(job)
+    db.commit()
+    logger.info(f"Render job {job_id} queued: {len(input_files)} files, license {license_id}")
+    return {"job_id": job_id, "status": job.status}
+
+@router.get("/{job_id}")
+def get_job(job_id: str, license_id: int = Depends(current_license_id), db: Session = Depends(get_db)):
+    return job_status(get_own_job(job_id, license_id, db))
+
+@router.get("/{job_id}/result")
+def get_job_result(job_id: str, license_id: int = Depends(current_license_id), db: Session = Depends(get_db)):
+    job = get_own_job(job_id, license_id, db)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail="Задача ещё не завершена")
+    result_path = os.path.join(job_dir(job_id), RESULT_NAME)
+    if not os.path.exists(result_path):
+        raise HTTPException(status_code=410, detail="Результат задачи уже удалён")
+    return FileResponse(result_path, media_type="application/pdf", filename=f"{job_id}.pdf")
+
+@router.delete("/{job_id}")
+def delete_job(job_id: str, license_id: int = Depends(current_license_id), db: Session = Depends(get_db)):
+    """Отменяет незавершённую задачу или удаляет завершённую вместе с файлами."""
+    job = get_own_job(job_id, license_id, db)
+    if job.status in FINAL_STATUSES:
+        db.delete(job)
+        status = "deleted"
+    else:
+        # Рабочие процессы проверяют статус перед каждой страницей и бросают задачу
+        job.status = "cancelled"
+        job.finished_at = datetime.now(timezone.utc)
+        status = job.status
+    db.commit()
+    shutil.rmtree(job_dir(job_id), ignore_errors=True)
+    return {"job_id": job_id, "status": status}
@@ -1,5 +1,5 @@
 import sqlalchemy
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Boolean, Text
 from sqlalchemy.orm import relationship, declarative_base
 from datetime import datetime, timezone
 
@@ -27,6 +27,11 @@ class License(Base):
     license_type = relationship("LicenseType", back_populates="licenses")
     devices = relationship("LicenseDevice", back_populates="license")
 
+    __table_args__ = (
+        sqlalchemy.Index('idx_licenses_type_active', 'license_type_code', 'is_active'),
+        sqlalchemy.Index('idx_licenses_created_at', 'created_at'),
+    )
+
 class LicenseDevice(Base):
     __tablename__ = 'license_devices'
 
@@ -39,4 +44,54 @@ class LicenseDevice(Base):
 
     __table_args__ = (
         sqlalchemy.Index('idx_license_device', 'license_id', 'device_id', unique=True),
-    )
\ No newline at end of file
+        sqlalchemy.Index('idx_license_devices_device_id', 'device_id'),
+    )
+
+class RenderJob(Base):
+    """Задача объединения, загруженная на сервер; страницы рендерят процессы backend/job_worker.py."""
+    __tablename__ = "render_jobs"
+
+    id = Column(String(36), primary_key=True)
+    license_id = Column(Integer, ForeignKey("licenses.id"), nullable=False)
+    # queued -> preparing -> rendering -> assembling -> done; failed и cancelled — конечные
+    status = Column(String(20), nullable=False, default="queued")
+    params = Column(Text, nullable=False)    # JSON: ribbon_position, checkbox_bw, render_profile
+    input_files = Column(Text, nullable=False)    # JSON-список файлов в каталоге задачи, в порядке объединения
+    page_count = Column(Integer, nullable=True)
+    first_page_count = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    worker_id = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+    created_at = Column(DateTime(timezone=True), default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+    chunks = relationship("RenderJobChunk", back_populates="job", order_by="RenderJobChunk.first_page",
+                          cascade="all, delete-orphan")
+
+    __table_args__ = (
+        sqlalchemy.Index('idx_render_jobs_status', 'status'),
+        sqlalchemy.Index('idx_render_jobs_license', 'license_id', 'created_at'),
+    )
+
+class RenderJobChunk(Base):
+    """Диапазон страниц задачи, который один рабочий процесс берёт целиком."""
+    __tablename__ = "render_job_chunks"
+
+    id = Column(Integer, primary_key=True)
+    job_id = Column(String(36), ForeignKey("render_jobs.id", ondelete="CASCADE"), nullable=False)
+    first_page = Column(Integer, nullable=False)
+    last_page = Column(Integer, nullable=False)
+    # queued -> running -> done или failed
+    status = Column(String(20), nullable=False, default="queued")
+    pages_done = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    layers = Column(Text, nullable=True)    # JSON: слои каждой страницы диапазона
+    worker_id = Column(String(64), nullable=True)
+    heartbeat_at = Column(DateTime(timezone=True), nullable=True)
+
+    job = relationship("RenderJob", back_populates="chunks")
+
+    __table_args__ = (
+        sqlalchemy.Index('idx_render_job_chunks_job', 'job_id', 'first_page'),
+        sqlalchemy.Index('idx_render_job_chunks_status', 'status'),
+    )
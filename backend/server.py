@@ -1,11 +1,16 @@
+import hashlib
+import hmac
 import uuid
 
-from fastapi import FastAPI, HTTPException, Depends, Security, Form
+from fastapi import FastAPI, HTTPException, Depends, Security, Form, Header, Response, Query
+from fastapi.responses import JSONResponse
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from pydantic import BaseModel
 from backend.dbase import SessionLocal
 from backend import models
+from sqlalchemy import func, or_
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from datetime import datetime, timedelta, timezone
 import jwt
 import os
@@ -13,8 +18,10 @@ import logging
 from dotenv import load_dotenv
 
 from backend.models import LicenseDevice, LicenseType, License
+from backend.jobs import router as jobs_router
 
 app = FastAPI()
+app.include_router(jobs_router)
 security = HTTPBearer()
 
 logging.basicConfig(
@@ -30,6 +37,14 @@ if not SECRET_KEY:
     raise ValueError("SECRET_KEY не установлен в переменных окружения")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_DAYS = 30
+MAX_BULK_LICENSES = 50000
+# 4 параметра на строку: один INSERT остаётся в пределах 65535 параметров PostgreSQL
+BULK_INSERT_CHUNK = 10000
+MAX_PAGE_SIZE = 1000
+# Сколько дней после истечения токена клиент может работать офлайн, не дожидаясь сервера
+LEASE_GRACE_DAYS = int(os.getenv("LEASE_GRACE_DAYS", "7"))
+# Общий секрет администратора для выгрузок и отчётов (заголовок X-Admin-Key); без него они недоступны
+ADMIN_API_KEY = os.getenv("ADMIN_API_KEY")
 
 class TokenRefreshRequest(BaseModel):
     token: str
@@ -42,6 +57,11 @@ class LicenseCreate(BaseModel):
     license_type_code: str
     license_key: str
 
+class LicenseBulkCreate(BaseModel):
+    license_type_code: str
+    count: int | None = None
+    license_keys: list[str] | None = None
+
 class LicenseAssignRequest(BaseModel):
     license_key: str
 
@@ -77,12 +97,48 @@ def verify_token(token: str):
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Неверный токен")
 
+def require_admin(x_admin_key: str | None = Header(default=None)):
+    if not ADMIN_API_KEY:
+        raise HTTPException(status_code=503, detail="ADMIN_API_KEY не установлен на сервере")
+    if not x_admin_key or not hmac.compare_digest(x_admin_key, ADMIN_API_KEY):
+        raise HTTPException(status_code=403, detail="Неверный ключ администратора")
+
 def create_access_token(data: dict, expires_delta: timedelta):
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + expires_delta
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
+def create_lease_token(license, device_id: str):
+    """Токен-аренда: клиент проверяет подпись и сроки локально, без запроса к серверу."""
+    now = datetime.now(timezone.utc)
+    expire = now + timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
+    grace_until = expire + timedelta(days=LEASE_GRACE_DAYS)
+    license_expires_at = None
+    expires_days = license.license_type.expires_days
+    if expires_days is not None:
+        created_at = license.created_at
+        if created_at.tzinfo is None:
+            created_at = created_at.replace(tzinfo=timezone.utc)
+        license_expiration = created_at + timedelta(days=expires_days)
+        license_expires_at = int(license_expiration.timestamp())
+        grace_until = min(grace_until, license_expiration)
+    to_encode = {
+        "license_id": license.id,
+        "device_id": device_id,
+        "license_type_code": license.license_type_code,
+        "license_expires_at": license_expires_at,
+        "grace_until": int(grace_until.timestamp()),
+        "exp": expire,
+    }
+    return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def license_etag(token_license_id: int, license, device_id: str):
+    """ETag состояния лицензии: не меняется, пока не меняется привязка или сама лицензия."""
+    state = f"{token_license_id}:{license.id}:{device_id}:{license.license_type_code}:{license.is_active}:" \
+            f"{license.created_at.isoformat()}"
+    return '"' + hashlib.sha256(state.encode()).hexdigest()[:32] + '"'
+
 def check_license_expiration(license, db: Session):
     now = datetime.now(timezone.utc)
     expires_days = license.license_type.expires_days
@@ -140,11 +196,7 @@ def activate_trial(device_id: str = Form(...), db: Session = Depends(get_db)):
         db.add(license_device)
         db.commit()
 
-    access_token_expires = timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-    access_token = create_access_token(
-        data={"license_id": license.id, "device_id": device_id},
-        expires_delta=access_token_expires
-    )
+    access_token = create_lease_token(license, device_id)
     return {"access_token": access_token, "token_type": "bearer"}
 
 
@@ -201,6 +253,165 @@ def create_license(data: LicenseCreate, db: Session = Depends(get_db)):
     db.refresh(license)
     return {"license_key": license.license_key}
 
+@app.post("/create_licenses/bulk", dependencies=[Depends(require_admin)])
+def create_licenses_bulk(data: LicenseBulkCreate, db: Session = Depends(get_db)):
+    license_type = db.query(models.LicenseType).filter(models.LicenseType.code == data.license_type_code).first()
+    if not license_type:
+        raise HTTPException(status_code=404, detail="Тип лицензии не найден")
+
+    if data.license_keys:
+        license_keys = list(dict.fromkeys(key.strip() for key in data.license_keys if key.strip()))
+        if any(len(key) > 36 for key in license_keys):
+            raise HTTPException(status_code=400, detail="Ключ лицензии не может быть длиннее 36 символов")
+    elif data.count:
+        license_keys = [str(uuid.uuid4()) for _ in range(data.count)]
+    else:
+        raise HTTPException(status_code=400, detail="Укажите количество лицензий или список ключей")
+    if not 0 < len(license_keys) <= MAX_BULK_LICENSES:
+        raise HTTPException(status_code=400, detail=f"За один запрос можно создать до {MAX_BULK_LICENSES} лицензий")
+
+    now = datetime.now(timezone.utc)
+    rows = [
+        {"license_type_code": data.license_type_code, "license_key": key, "created_at": now, "is_active": True}
+        for key in license_keys
+    ]
+    created_keys = []
+    # Все части вставляются в одной транзакции, уже существующие ключи пропускаются
+    for start in range(0, len(rows), BULK_INSERT_CHUNK):
+        stmt = pg_insert(models.License).values(rows[start:start + BULK_INSERT_CHUNK])
+        stmt = stmt.on_conflict_do_nothing(index_elements=["license_key"]).returning(models.License.license_key)
+        created_keys.extend(db.execute(stmt).scalars().all())
+    db.commit()
+    logger.info(f"Bulk created {len(created_keys)} licenses of type {data.license_type_code}")
+    return {
+        "license_type_code": data.license_type_code,
+        "license_keys": created_keys,
+        "skipped": len(license_keys) - len(created_keys)
+    }
+
+@app.get("/licenses", dependencies=[Depends(require_admin)])
+def list_licenses(after_id: int = 0, limit: int = Query(default=100, ge=1, le=MAX_PAGE_SIZE),
+                  license_type_code: str | None = None, is_active: bool | None = None,
+                  created_from: datetime | None = None, created_to: datetime | None = None,
+                  device_id: str | None = None, db: Session = Depends(get_db)):
+    # Keyset-пагинация по licenses.id: стоимость страницы не зависит от её номера
+    query = db.query(models.License).filter(models.License.id > after_id)
+    if license_type_code is not None:
+        query = query.filter(models.License.license_type_code == license_type_code)
+    if is_active is not None:
+        query = query.filter(models.License.is_active == is_active)
+    if created_from is not None:
+        query = query.filter(models.License.created_at >= created_from)
+    if created_to is not None:
+        query = query.filter(models.License.created_at < created_to)
+    if device_id is not None:
+        device_license_ids = db.query(models.LicenseDevice.license_id).filter(
+            models.LicenseDevice.device_id == device_id
+        )
+        query = query.filter(models.License.id.in_(device_license_ids))
+    licenses = query.order_by(models.License.id).limit(limit + 1).all()
+    has_more = len(licenses) > limit
+    licenses = licenses[:limit]
+
+    # Устройства всей страницы одним запросом
+    devices_by_license = {}
+    if licenses:
+        page_devices = db.query(models.LicenseDevice).filter(
+            models.LicenseDevice.license_id.in_([license.id for license in licenses])
+        ).all()
+        for device in page_devices:
+            devices_by_license.setdefault(device.license_id, []).append(device.device_id)
+
+    return {
+        "items": [
+            {
+                "id": license.id,
+                "license_key": license.license_key,
+                "license_type_code": license.license_type_code,
+                "created_at": license.created_at.isoformat() if license.created_at else None,
+                "is_active": license.is_active,
+                "devices": devices_by_license.get(license.id, [])
+            }
+            for license in licenses
+        ],
+        "next_after_id": licenses[-1].id if has_more else None
+    }
+
+@app.get("/license_devices", dependencies=[Depends(require_admin)])
+def list_license_devices(after_id: int = 0, limit: int = Query(default=100, ge=1, le=MAX_PAGE_SIZE),
+                         license_id: int | None = None, device_id: str | None = None,
+                         db: Session = Depends(get_db)):
+    query = db.query(models.LicenseDevice).filter(models.LicenseDevice.id > after_id)
+    if license_id is not None:
+        query = query.filter(models.LicenseDevice.license_id == license_id)
+    if device_id is not None:
+        query = query.filter(models.LicenseDevice.device_id == device_id)
+    devices = query.order_by(models.LicenseDevice.id).limit(limit + 1).all()
+    has_more = len(devices) > limit
+    devices = devices[:limit]
+    return {
+        "items": [
+            {
+                "id": device.id,
+                "license_id": device.license_id,
+                "device_id": device.device_id,
+                "activated_at": device.activated_at.isoformat() if device.activated_at else None
+            }
+            for device in devices
+        ],
+        "next_after_id": devices[-1].id if has_more else None
+    }
+
+@app.get("/reports/active_devices_by_type", dependencies=[Depends(require_admin)])
+def report_active_devices_by_type(db: Session = Depends(get_db)):
+    rows = db.query(
+        models.License.license_type_code,
+        func.count(models.LicenseDevice.id)
+    ).join(models.LicenseDevice, models.LicenseDevice.license_id == models.License.id).filter(
+        models.License.is_active == True
+    ).group_by(models.License.license_type_code).all()
+    return [{"license_type_code": code, "active_devices": count} for code, count in rows]
+
+@app.get("/reports/expiring", dependencies=[Depends(require_admin)])
+def report_expiring(days: int = Query(default=7, ge=0, le=3650), after_id: int = 0,
+                    limit: int = Query(default=100, ge=1, le=MAX_PAGE_SIZE), db: Session = Depends(get_db)):
+    now = datetime.now(timezone.utc)
+    license_types = db.query(models.LicenseType).filter(models.LicenseType.expires_days.isnot(None)).all()
+    # Истекающие в ближайшие days дней = созданные в окне [now - expires_days, now - expires_days + days).
+    # Условие по created_at для каждого типа использует индексы, а не вычисляется по каждой строке
+    conditions = []
+    for license_type in license_types:
+        window_start = now - timedelta(days=license_type.expires_days)
+        conditions.append(
+            (models.License.license_type_code == license_type.code)
+            & (models.License.created_at >= window_start)
+            & (models.License.created_at < window_start + timedelta(days=days))
+        )
+    if not conditions:
+        return {"counts": [], "items": [], "next_after_id": None}
+    base_query = db.query(models.License).filter(models.License.is_active == True, or_(*conditions))
+    counts = base_query.with_entities(
+        models.License.license_type_code, func.count(models.License.id)
+    ).group_by(models.License.license_type_code).all()
+    licenses = base_query.filter(models.License.id > after_id).order_by(models.License.id).limit(limit + 1).all()
+    has_more = len(licenses) > limit
+    licenses = licenses[:limit]
+    expires_days_by_type = {license_type.code: license_type.expires_days for license_type in license_types}
+    return {
+        "counts": [{"license_type_code": code, "expiring": count} for code, count in counts],
+        "items": [
+            {
+                "id": license.id,
+                "license_key": license.license_key,
+                "license_type_code": license.license_type_code,
+                "expires_at": (license.created_at + timedelta(
+                    days=expires_days_by_type[license.license_type_code])).isoformat()
+            }
+            for license in licenses
+        ],
+        "next_after_id": licenses[-1].id if has_more else None
+    }
+
 @app.post("/create_license_type")
 def create_license_type(data: LicenseTypeCreate, db: Session = Depends(get_db)):
     existing = db.query(models.LicenseType).filter(models.LicenseType.code == data.code).first()
@@ -287,10 +498,7 @@ def change_license(data: LicenseChangeRequest, credentials: HTTPAuthorizationCre
 
     return {
         "message": "Лицензия успешно сменена",
-        "access_token": create_access_token(
-            data={"license_id": new_license.id, "device_id": data.device_id},
-            expires_delta=timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-        ),
+        "access_token": create_lease_token(new_license, data.device_id),
         "token_type": "bearer"
     }
 
@@ -310,11 +518,7 @@ def activate_license(request: LicenseActivateRequest, db: Session = Depends(get_
         models.LicenseDevice.device_id == request.device_id
     ).first()
     if existing_new_device:
-        token_data = {
-            "license_id": license.id,
-            "device_id": request.device_id
-        }
-        access_token = create_access_token(token_data, timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS))
+        access_token = create_lease_token(license, request.device_id)
         return LicenseActivateResponse(access_token=access_token)
 
     device_count = db.query(models.LicenseDevice).filter(models.LicenseDevice.license_id == license.id).count()
@@ -351,15 +555,12 @@ def activate_license(request: LicenseActivateRequest, db: Session = Depends(get_
 
     db.commit()
 
-    token_data = {
-        "license_id": license.id,
-        "device_id": request.device_id,
-    }
-    access_token = create_access_token(token_data, timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS))
+    access_token = create_lease_token(license, request.device_id)
     return LicenseActivateResponse(access_token=access_token)
 
 @app.get("/verify")
-def verify(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db)):
+def verify(credentials: HTTPAuthorizationCredentials = Security(security), db: Session = Depends(get_db),
+           if_none_match: str | None = Header(default=None)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=["HS256"])
         license_id = payload.get("license_id")
@@ -383,19 +584,27 @@ def verify(credentials: HTTPAuthorizationCredentials = Security(security), db: S
             # Проверяем срок действия лицензии
         check_license_expiration(license, db)
 
+        etag = license_etag(license_id, license, device_id)
+        # Клиент уже знает актуальное состояние: отвечаем без тела и без подписи нового токена
+        if current_license_id == license_id and if_none_match == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+
         # Проверяем, совпадает ли license_id из токена с текущей лицензией
         if current_license_id == license_id:
             # Токен актуален
             print(f"[DEBUG] License verified successfully: license_id={license_id}")
-            return {"status": "valid", "license_id": license_id, "device_id": device_id}
+            # Продлеваем аренду, чтобы клиент мог дольше работать без сервера
+            content = {
+                "status": "valid",
+                "license_id": license_id,
+                "device_id": device_id,
+                "lease": create_lease_token(license, device_id)
+            }
+            return JSONResponse(content=content, headers={"ETag": etag})
         else:
             # Устройство привязано к другой лицензии, генерируем новый токен
             print(f"[DEBUG] Token outdated: generating new token for license_id={current_license_id}")
-            access_token_expires = timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS)
-            new_token = create_access_token(
-                data={"license_id": current_license_id, "device_id": device_id},
-                expires_delta=access_token_expires
-            )
+            new_token = create_lease_token(license, device_id)
             return {
                 "status": "updated",
                 "license_id": current_license_id,
@@ -412,6 +621,8 @@ def verify(credentials: HTTPAuthorizationCredentials = Security(security), db: S
     except jwt.InvalidTokenError as e:
         print(f"[DEBUG] Invalid token: {str(e)}")
         raise HTTPException(status_code=401, detail=f"Недействительный токен: {str(e)}")
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"[DEBUG] Error in verify: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Ошибка сервера: {str(e)}")
@@ -485,13 +696,14 @@ async def refresh_token(token_data: dict, db: Session = Depends(get_db)):
         license = db.query(models.License).filter(models.License.id == license_device.license_id).first()
         check_license_expiration(license, db)
 
-        new_token_data = {"license_id": license_device.license_id, "device_id": device_id}
-        new_token = create_access_token(new_token_data, expires_delta=timedelta(days=ACCESS_TOKEN_EXPIRE_DAYS))
+        new_token = create_lease_token(license, device_id)
         logger.info(f"[DEBUG] New token created for license_id={license_device.license_id}")
         return {"access_token": new_token}
     except jwt.PyJWTError as e:
         logger.error(f"[ERROR] JWT error in refresh_token: {str(e)}")
         raise HTTPException(status_code=401, detail="Невалидный токен")
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"[ERROR] Unexpected error in refresh_token: {str(e)}")
         raise HTTPException(status_code=500, detail="Внутренняя ошибка сервера")
\ No newline at end of file
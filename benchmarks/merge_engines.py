@@ -0,0 +1,94 @@
+"""Сравнение объединения PDF: прежний путь через pypdf и client.merge.merge_pdfs (PyMuPDF).
+
+Без аргументов генерирует набор входных документов, в каждом из которых повторяется одна и та
+же картинка-бланк (как у писем на фирменном бланке), чтобы было видно дедупликацию ресурсов.
+Можно передать свои PDF. Печатает медианное время и размер результата каждого движка.
+
+    python benchmarks/merge_engines.py [file.pdf ...] [--docs 20] [--pages 10] [--runs 3]
+"""
+import argparse
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pymupdf as fitz
+from PIL import Image, ImageDraw
+
+from client.merge import merge_pdfs
+
+def make_inputs(temp_dir, docs, pages):
+    letterhead = Image.new("RGB", (1240, 300), (255, 255, 255))
+    draw = ImageDraw.Draw(letterhead)
+    for x in range(0, 1240, 8):
+        draw.line((x, 0, 1240 - x, 300), fill=(x % 256, 80, 160))
+    buffer = io.BytesIO()
+    letterhead.save(buffer, "JPEG", quality=90)
+    letterhead_bytes = buffer.getvalue()
+    paths = []
+    for d in range(docs):
+        doc = fitz.open()
+        for p in range(pages):
+            page = doc.new_page(width=595, height=842)
+            page.insert_image(fitz.Rect(40, 30, 555, 154), stream=letterhead_bytes)
+            page.insert_text((72, 200), f"Документ {d + 1}, страница {p + 1}", fontsize=14)
+        path = os.path.join(temp_dir, f"input_{d:03d}.pdf")
+        doc.save(path)
+        doc.close()
+        paths.append(path)
+    return paths
+
+def merge_with_pypdf(pdf_lst, output_path):
+    """Прежняя реализация save: отдельное открытие первого файла и PdfWriter.append."""
+    from pypdf import PdfWriter
+    doc_first = fitz.open(pdf_lst[0])
+    first_page_count = len(doc_first)
+    doc_first.close()
+    pdf_merger = PdfWriter()
+    for pdf_file in pdf_lst:
+        pdf_merger.append(pdf_file)
+    pdf_merger.write(output_path)
+    pdf_merger.close()
+    return first_page_count
+
+def merge_with_pymupdf(pdf_lst, output_path):
+    return merge_pdfs(pdf_lst, output_path)[0]
+
+ENGINES = {
+    "pypdf": merge_with_pypdf,
+    "pymupdf": merge_with_pymupdf,
+}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="*")
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temp_dir:
+        pdf_lst = args.inputs or make_inputs(temp_dir, args.docs, args.pages)
+        input_size = sum(os.path.getsize(p) for p in pdf_lst)
+        print(f"[*] Входных файлов: {len(pdf_lst)}, общий размер {input_size / 1024:.0f} КБ")
+        results = {}
+        for name, engine in ENGINES.items():
+            output_path = os.path.join(temp_dir, f"merged_{name}.pdf")
+            times = []
+            for _ in range(args.runs):
+                start = time.perf_counter()
+                first_page_count = engine(pdf_lst, output_path)
+                times.append((time.perf_counter() - start) * 1000)
+            results[name] = statistics.median(times)
+            print(f"    {name:<8} {results[name]:8.0f} мс  {os.path.getsize(output_path) / 1024:8.0f} КБ  "
+                  f"(страниц в первом документе: {first_page_count})")
+        print(f"[+] PyMuPDF быстрее pypdf в {results['pypdf'] / results['pymupdf']:.1f} раза")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
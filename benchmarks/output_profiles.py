@@ -0,0 +1,41 @@
+"""Сравнение профилей оптимизации итогового PDF по размеру и времени сохранения.
+
+Пересохраняет указанный PDF (обычно готовый документ из "Итоговые документы") с каждым
+профилем из client/pdf_output.py и печатает размер, выигрыш относительно исходника и время.
+
+    python benchmarks/output_profiles.py path/to/result.pdf [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from client.pdf_output import OUTPUT_PROFILES, optimize_pdf
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("pdf")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    source_size = os.path.getsize(args.pdf)
+    print(f"[*] Исходный файл: {source_size / 1024:.0f} КБ")
+    print(f"    {'профиль':<10} {'размер, КБ':>11} {'изменение':>10} {'время, мс':>10}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for name in OUTPUT_PROFILES:
+            output_path = os.path.join(temp_dir, f"{name}.pdf")
+            times = []
+            size = 0
+            for _ in range(args.runs):
+                size, elapsed = optimize_pdf(args.pdf, output_path, name)
+                times.append(elapsed * 1000)
+            change = (size - source_size) / source_size * 100
+            print(f"    {name:<10} {size / 1024:>11.0f} {change:>+9.1f}% {statistics.median(times):>10.0f}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
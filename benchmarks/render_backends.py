@@ -0,0 +1,186 @@
+"""Сравнение пула процессов и пула потоков при рендеринге страниц (DOCSTITCHER_RENDER_BACKEND).
+
+Каждый случай (движок × число страниц) выполняется в отдельном процессе тем же путём, что
+и "Объединить": scan_effect_steps с запуском пула, рендером, вставкой страниц и сохранением.
+По умолчанию процессы пула запускаются через spawn, как в Windows. Печатает время и пик
+памяти всего дерева процессов (psutil; без него — оценка по resource).
+
+    python benchmarks/render_backends.py [file.pdf] [--pages 5,20,60] [--profile archival]
+        [--workers N] [--start-method spawn] [--runs 1]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Модули клиента импортируют друг друга и как client.x, и как x (запуск из каталога client)
+sys.path.insert(1, os.path.join(ROOT, "client"))
+
+BACKENDS = ("process", "thread")
+SAMPLE_INTERVAL_S = 0.05
+
+def make_input(path, pages):
+    import pymupdf as fitz
+    doc = fitz.open()
+    for p in range(pages):
+        page = doc.new_page(width=595, height=842)
+        page.draw_rect(fitz.Rect(60, 60, 535, 200), color=(0.2, 0.3, 0.6), fill=(0.85, 0.9, 1.0))
+        for line in range(30):
+            page.insert_text((72, 240 + line * 18), f"Страница {p + 1}, строка {line + 1}: съешь же ещё этих "
+                                                    f"мягких французских булок", fontsize=10, fontname="helv")
+    doc.save(path)
+    doc.close()
+    return path
+
+class TreeMemory:
+    """Пик суммарной памяти процесса и его потомков (psutil) в фоне."""
+
+    def __init__(self):
+        import psutil
+        self.process = psutil.Process()
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(SAMPLE_INTERVAL_S):
+            total = 0
+            for process in [self.process] + self.process.children(recursive=True):
+                try:
+                    total += process.memory_info().rss
+                except Exception:
+                    pass
+            self.peak = max(self.peak, total)
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.peak / (1024 * 1024), False
+
+class RusageMemory:
+    """Без psutil: пик своего процесса плюс самый большой потомок × число потомков (оценка)."""
+
+    def __init__(self, workers):
+        self.workers = workers
+
+    def stop(self):
+        import resource
+        scale = 1024 if sys.platform != "darwin" else 1
+        own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale
+        child = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale
+        return (own + child * self.workers) / (1024 * 1024), True
+
+class BenchWindow:
+    """Минимальное окно для scan_effect_steps: лента сверху, без Ч/Б, выбранный движок."""
+
+    class Value:
+        def __init__(self, value):
+            self.value = value
+
+        def currentText(self):
+            return self.value
+
+        def isChecked(self):
+            return self.value
+
+    class Bar:
+        def setVisible(self, visible):
+            pass
+
+    def __init__(self, backend):
+        self.render_backend = backend
+        self.ribbon_position = self.Value("Сверху")
+        self.checkbox_bw_first = self.Value(False)
+        self.progress_bar = self.Bar()
+        self.progress = None
+        self.workspace = None
+        self.temp_file_path = []
+        self.first_page_count = 1
+
+    def update_progress(self, fraction, eta_seconds=None):
+        pass
+
+def run_case(backend, pdf_path, profile, workers):
+    """Один прогон в этом процессе; возвращает {seconds, peak_mb, estimated}."""
+    from client import file_processing
+    from client.file_processing import run_steps, scan_effect_steps
+    file_processing.get_max_workers = lambda page_count: workers
+    try:
+        memory = TreeMemory()
+    except ImportError:
+        memory = RusageMemory(workers if backend == "process" else 0)
+    window = BenchWindow(backend)
+    output_path = pdf_path + f".{backend}.out.pdf"
+    start = time.perf_counter()
+    run_steps(scan_effect_steps(window, pdf_path, output_path, profile=profile))
+    seconds = time.perf_counter() - start
+    peak_mb, estimated = memory.stop()
+    window.workspace.cleanup()
+    os.remove(output_path)
+    return {"seconds": seconds, "peak_mb": peak_mb, "estimated": estimated}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", nargs="?", help="Свой PDF вместо сгенерированного")
+    parser.add_argument("--pages", default="5,20,60", help="Числа страниц через запятую (для сгенерированного PDF)")
+    parser.add_argument("--profile", default="archival", help="Профиль рендеринга")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--start-method", default="spawn", choices=multiprocessing.get_all_start_methods())
+    parser.add_argument("--runs", type=int, default=1)
+    parser.add_argument("--case", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        multiprocessing.set_start_method(args.start_method, force=True)
+        backend, pdf_path = args.case.split(":", 1)
+        print(json.dumps(run_case(backend, pdf_path, args.profile, args.workers)))
+        return 0
+
+    print(f"[*] Профиль {args.profile}, рабочих: {args.workers}, запуск процессов: {args.start_method}")
+    with tempfile.TemporaryDirectory() as temp_dir:
+        if args.input:
+            cases = [args.input]
+        else:
+            cases = [make_input(os.path.join(temp_dir, f"input_{pages}.pdf"), pages)
+                     for pages in (int(value) for value in args.pages.split(","))]
+        for pdf_path in cases:
+            import pymupdf as fitz
+            with fitz.open(pdf_path) as doc:
+                page_count = len(doc)
+            results = {}
+            for backend in BACKENDS:
+                runs = []
+                for _ in range(args.runs):
+                    output = subprocess.run(
+                        [sys.executable, os.path.abspath(__file__), "--case", f"{backend}:{pdf_path}",
+                         "--profile", args.profile, "--workers", str(args.workers),
+                         "--start-method", args.start_method],
+                        cwd=os.path.join(ROOT, "client"), capture_output=True, text=True
+                    )
+                    if output.returncode != 0:
+                        print(f"[!] {backend}: {output.stderr.strip().splitlines()[-1]}")
+                        break
+                    runs.append(json.loads(output.stdout.strip().splitlines()[-1]))
+                if not runs:
+                    continue
+                best = min(runs, key=lambda run: run["seconds"])
+                results[backend] = best
+                mark = "≈" if best["estimated"] else " "
+                print(f"    {page_count:4d} стр.  {backend:<8} {best['seconds']:7.2f} с  "
+                      f"{page_count / best['seconds']:6.1f} стр/с  пик памяти {mark}{best['peak_mb']:6.0f} МБ")
+            if len(results) == len(BACKENDS):
+                speedup = results["process"]["seconds"] / results["thread"]["seconds"]
+                memory = results["process"]["peak_mb"] / max(results["thread"]["peak_mb"], 1)
+                print(f"[+] {page_count} стр.: потоки быстрее в {speedup:.2f} раза, памяти меньше в {memory:.1f} раза")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
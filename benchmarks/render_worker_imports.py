@@ -0,0 +1,113 @@
+"""Проверка бюджета импорта процесса-рабочего рендеринга.
+
+Запускает чистый интерпретатор с -X importtime, импортирует client.render_worker и
+проверяет, что в процесс не попали Qt, лицензирование и конвертеры, а суммарное время
+импорта укладывается в бюджет. Затем запускает настоящий пул get_context("spawn") с run.py
+в роли главного модуля — так процессы пула стартуют в Windows без сборки в exe, заново
+выполняя run.py как __mp_main__, — и проверяет те же запреты внутри процесса пула.
+Код возврата 1, если проверка не прошла.
+
+    python benchmarks/render_worker_imports.py [--budget-ms 250] [--runs 5]
+"""
+import argparse
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+# Как при запуске приложения: client_utils импортирует config без пакета
+sys.path.insert(1, os.path.join(ROOT, "client"))
+SPAWN_TIMEOUT_S = 120
+WORKER_MODULE = "client.render_worker"
+FORBIDDEN_MODULES = (
+    "PyQt5", "wmi", "requests", "jwt", "dotenv", "pypdf", "comtypes", "pythoncom", "docx2pdf", "img2pdf",
+    "client.config", "client.client_utils", "client.licensing", "client.file_processing", "run",
+)
+
+def measure_imports(module):
+    """Возвращает {модуль: собственное время импорта в мкс} для одного холодного запуска."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip().splitlines()[-1])
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, _, name = line[len("import time:"):].split("|", 2)
+        timings[name.strip()] = int(self_us)
+    return timings
+
+def forbidden_in(modules):
+    """Запрещённые пакеты, хотя бы один модуль которых загружен."""
+    return sorted(
+        prefix for prefix in FORBIDDEN_MODULES
+        if any(name == prefix or name.startswith(prefix + ".") for name in modules)
+    )
+
+def spawn_worker_modules():
+    """Модули процесса пула spawn, запущенного из run.py, и время до ответа первого процесса в мс."""
+    main_module = sys.modules["__main__"]
+    main_file = main_module.__file__
+    # spawn запускает в процессе пула файл главного модуля как __mp_main__: подставляем run.py
+    main_module.__file__ = os.path.join(ROOT, "run.py")
+    try:
+        start = time.perf_counter()
+        with multiprocessing.get_context("spawn").Pool(1) as pool:
+            # eval — встроенная функция, её можно передать в пул без импорта этого скрипта
+            result = pool.apply_async(eval, (f"__import__('{WORKER_MODULE}') and sorted(__import__('sys').modules)",))
+            # Если run.py падает в процессе пула, пул перезапускает процессы бесконечно
+            modules = result.get(SPAWN_TIMEOUT_S)
+            startup_ms = (time.perf_counter() - start) * 1000
+    finally:
+        main_module.__file__ = main_file
+    return modules, startup_ms
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-ms", type=float, default=250.0)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    totals = []
+    timings = {}
+    for _ in range(args.runs):
+        timings = measure_imports(WORKER_MODULE)
+        totals.append(sum(timings.values()) / 1000)
+    best_ms = min(totals)
+
+    forbidden = forbidden_in(timings)
+    heaviest = sorted(timings.items(), key=lambda item: item[1], reverse=True)[:10]
+    print(f"[*] {WORKER_MODULE}: {len(timings)} модулей, лучшее время импорта {best_ms:.1f} мс "
+          f"(бюджет {args.budget_ms:.0f} мс)")
+    for name, self_us in heaviest:
+        print(f"    {self_us / 1000:8.1f} мс  {name}")
+
+    ok = True
+    if forbidden:
+        print(f"[!] Рабочий процесс импортирует лишние модули: {', '.join(forbidden)}")
+        ok = False
+    if best_ms > args.budget_ms:
+        print(f"[!] Время импорта {best_ms:.1f} мс превышает бюджет {args.budget_ms:.0f} мс")
+        ok = False
+
+    modules, startup_ms = spawn_worker_modules()
+    print(f"[*] Процесс пула spawn из run.py: {len(modules)} модулей, первый ответ через {startup_ms:.0f} мс")
+    spawn_forbidden = forbidden_in(modules)
+    if "__mp_main__" not in modules:
+        print("[!] Процесс пула не выполнил run.py как __mp_main__")
+        ok = False
+    if spawn_forbidden:
+        print(f"[!] Процесс пула spawn импортирует лишние модули: {', '.join(spawn_forbidden)}")
+        ok = False
+    if ok:
+        print("[+] Бюджет импорта соблюдён")
+    return 0 if ok else 1
+
+if __name__ == "__main__":
+    sys.exit(main())
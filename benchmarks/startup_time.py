@@ -0,0 +1,120 @@
+"""Замер холодного запуска приложения до первого окна.
+
+Запускает run.py с -X importtime через небольшую обёртку на платформе Qt offscreen:
+обёртка подменяет QApplication наследником с фильтром событий, который ловит показ
+первого окна (главного или окна активации, если лицензии нет), печатает маркер
+FIRST_WINDOW и закрывает окно. В самом приложении для замера ничего нет. Скрипт меряет
+время до маркера, показывает самые тяжёлые импорты и возвращает код 1, если медиана
+превышает цель.
+
+    python benchmarks/startup_time.py [--target-ms 1500] [--runs 3]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MARKER = "FIRST_WINDOW"
+# Обёртка импортирует PyQt5 раньше приложения: общее время не меняется, PyQt5 в отчёте
+# просто оказывается импортом верхнего уровня
+PROBE = f"""
+import os, runpy, sys
+from PyQt5 import QtWidgets
+from PyQt5.QtCore import QEvent, QObject, QTimer
+
+class FirstWindowProbe(QObject):
+    def eventFilter(self, obj, event):
+        if event.type() == QEvent.Show and obj.isWidgetType() and obj.isWindow():
+            QtWidgets.QApplication.instance().removeEventFilter(self)
+            QTimer.singleShot(0, lambda: self.report(obj))
+        return False
+
+    def report(self, window):
+        print("{MARKER}", type(window).__name__, flush=True)
+        window.close()
+
+class ProbeApplication(QtWidgets.QApplication):
+    def __init__(self, argv):
+        super().__init__(argv)
+        self.probe = FirstWindowProbe()
+        self.installEventFilter(self.probe)
+
+QtWidgets.QApplication = ProbeApplication
+sys.argv = ["run.py"]
+runpy.run_path(os.path.join(os.getcwd(), "run.py"), run_name="__main__")
+"""
+
+def run_once():
+    # client в PYTHONPATH — как в сборке: client_utils импортирует config без пакета
+    python_path = os.pathsep.join(filter(None, [ROOT, os.path.join(ROOT, "client"), os.environ.get("PYTHONPATH")]))
+    env = dict(os.environ, PYTHONPATH=python_path, PYTHONUNBUFFERED="1")
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-X", "importtime", "-c", PROBE],
+        cwd=ROOT, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
+    )
+    first_window_ms = None
+    window_name = None
+    for line in process.stdout:
+        if MARKER in line:
+            first_window_ms = (time.perf_counter() - start) * 1000
+            window_name = line.split(MARKER, 1)[1].strip()
+            break
+    try:
+        _, stderr = process.communicate(timeout=30)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        _, stderr = process.communicate()
+    if first_window_ms is None:
+        raise RuntimeError("Приложение не показало окно:\n" + stderr[-2000:])
+    return first_window_ms, window_name, parse_importtime(stderr)
+
+def parse_importtime(stderr):
+    """{модуль: накопленное время импорта в мкс} для импортов верхнего уровня и их прямых импортов.
+
+    Второй уровень нужен, потому что run.py импортирует только client.main_window, а уже
+    он — Qt, лицензирование и остальное. Ключ — (уровень, модуль).
+    """
+    cumulative = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        # Отступ в два пробела на уровень вложенности, после разделителя — один пробел
+        depth = (len(name) - len(name.lstrip(" ")) - 1) // 2
+        if depth <= 1:
+            cumulative[depth, name.strip()] = int(cumulative_us)
+    return cumulative
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target-ms", type=float, default=1500.0)
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    times = []
+    window_name = None
+    imports = {}
+    for _ in range(args.runs):
+        first_window_ms, window_name, imports = run_once()
+        times.append(first_window_ms)
+    median_ms = statistics.median(times)
+
+    print(f"[*] Время до первого окна ({window_name}): медиана {median_ms:.0f} мс, "
+          f"запуски: {', '.join(f'{t:.0f}' for t in times)} мс (цель {args.target_ms:.0f} мс)")
+    top_level_us = sum(cumulative_us for (depth, _), cumulative_us in imports.items() if depth == 0)
+    print(f"[*] Импорты верхнего уровня: {top_level_us / 1000:.0f} мс")
+    for (depth, name), cumulative_us in sorted(imports.items(), key=lambda item: item[1], reverse=True)[:10]:
+        print(f"    {cumulative_us / 1000:8.1f} мс  {'  ' * depth}{name}")
+    if median_ms > args.target_ms:
+        print(f"[!] Запуск медленнее цели на {median_ms - args.target_ms:.0f} мс")
+        return 1
+    print("[+] Цель по времени запуска выполнена")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -4,4 +4,28 @@ import os
 load_dotenv()  
 
 SERVER_URL = os.getenv("SERVER_URL", "http://localhost:8000")
-SECRET_KEY = os.getenv("SECRET_KEY", "...")
\ No newline at end of file
+SECRET_KEY = os.getenv("SECRET_KEY", "...")
+# Бюджет памяти на растр одной страницы в процессе рендеринга; большие страницы рендерятся полосами
+RENDER_MEMORY_BUDGET_MB = int(os.getenv("DOCSTITCHER_RENDER_MEMORY_MB", "256"))
+# Профиль оптимизации итогового PDF: fast, standard, archive или email (см. client/pdf_output.py)
+OUTPUT_PROFILE = os.getenv("DOCSTITCHER_OUTPUT_PROFILE", "standard")
+# Лимит дискового кэша миниатюр списка файлов
+THUMBNAIL_CACHE_MB = int(os.getenv("DOCSTITCHER_THUMBNAIL_CACHE_MB", "64"))
+# Профиль рендеринга страниц по умолчанию: draft, standard или archival (см. client/render_profiles.py)
+RENDER_PROFILE = os.getenv("DOCSTITCHER_RENDER_PROFILE", "archival")
+# Каталог промежуточных файлов: быстрый диск или RAM (/dev/shm, RAM-диск); пусто — системный временный.
+# Задачи в RAM не переживают перезагрузку, продолжить их после неё не получится
+WORKSPACE_ROOT = os.getenv("DOCSTITCHER_WORKSPACE_ROOT", "")
+# Сколько места могут занимать отрендеренные, но ещё не вставленные в документ страницы
+WORKSPACE_QUOTA_MB = int(os.getenv("DOCSTITCHER_WORKSPACE_QUOTA_MB", "512"))
+# Чем рендерить страницы: process — пул процессов, thread — пул потоков окна (без запуска
+# интерпретаторов и копий модулей), auto — потоки для документов до RENDER_THREAD_MAX_PAGES страниц.
+# По умолчанию process: порог auto ещё не замерен на многоядерных машинах, а на 60 страницах
+# потоки уже медленнее процессов. Сравнение: benchmarks/render_backends.py
+RENDER_BACKEND = os.getenv("DOCSTITCHER_RENDER_BACKEND", "process")
+RENDER_THREAD_MAX_PAGES = int(os.getenv("DOCSTITCHER_RENDER_THREAD_MAX_PAGES", "20"))
+# Диагностика медленных сохранений: 1 — каждое сохранение профилируется (см. client/profiling.py).
+# Файлы speedscope пишутся в DOCSTITCHER_PROFILE_DIR, по умолчанию в DocStitcher/profiles временного каталога
+PROFILE_CAPTURE = os.getenv("DOCSTITCHER_PROFILE", "0") == "1"
+PROFILE_DIR = os.getenv("DOCSTITCHER_PROFILE_DIR", "")
+PROFILE_INTERVAL_MS = float(os.getenv("DOCSTITCHER_PROFILE_INTERVAL_MS", "10"))
@@ -0,0 +1,97 @@
+import hashlib
+import hmac
+import os
+import platform
+import sys
+import threading
+import time
+import uuid
+
+from PyQt5.QtCore import QSettings
+
+from client.config import SECRET_KEY
+
+DEVICE_BACKEND = os.getenv("DOCSTITCHER_DEVICE_BACKEND", "wmi" if sys.platform == "win32" else "linux")
+
+def wmi_device_id():
+    """UUID материнской платы из Win32_ComputerSystemProduct (инициализация WMI занимает сотни мс)."""
+    from wmi import WMI
+    return WMI().Win32_ComputerSystemProduct()[0].UUID
+
+def linux_device_id():
+    """DMI product_uuid (тот же SMBIOS UUID, что отдаёт WMI) или machine-id, если DMI недоступен."""
+    for path in ("/sys/class/dmi/id/product_uuid", "/etc/machine-id", "/var/lib/dbus/machine-id"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if not value:
+            continue
+        try:
+            # machine-id хранится без дефисов, в БД device_id — строка формата UUID
+            return str(uuid.UUID(value)).upper()
+        except ValueError:
+            print(f"[!] Некорректный идентификатор в {path}: {value!r}")
+    raise RuntimeError("Не удалось определить идентификатор устройства")
+
+_backends = {
+    "wmi": wmi_device_id,
+    "linux": linux_device_id,
+}
+# Бэкенд -> ID устройства
+_device_ids = {}
+_lock = threading.Lock()
+
+def register_backend(name, func):
+    """Регистрирует способ получения ID устройства; выбирается через DOCSTITCHER_DEVICE_BACKEND."""
+    _backends[name] = func
+
+def _machine_hint(backend):
+    # Дешёвые признаки машины: сохранённая копия ID не подойдёт, если профиль перенесли на другой ПК
+    return f"{backend}:{platform.node()}:{uuid.getnode():012x}"
+
+def _signature(device_id, backend):
+    message = f"{device_id}:{_machine_hint(backend)}".encode()
+    return hmac.new(SECRET_KEY.encode(), message, hashlib.sha256).hexdigest()
+
+def _load_verified(settings, backend):
+    device_id = settings.value("device_id")
+    signature = settings.value("device_id_signature")
+    if device_id and signature and hmac.compare_digest(signature, _signature(device_id, backend)):
+        return device_id
+    return None
+
+def get_device_id(backend=None):
+    """ID устройства: вычисляется один раз за процесс для каждого бэкенда, проверенная копия хранится в QSettings."""
+    backend = backend or DEVICE_BACKEND
+    with _lock:
+        device_id = _device_ids.get(backend)
+        if device_id is None:
+            settings = QSettings("YourCompany", "DocStitcher")
+            device_id = _load_verified(settings, backend)
+            if device_id is None:
+                device_id = _backends[backend]()
+                settings.setValue("device_id", device_id)
+                settings.setValue("device_id_signature", _signature(device_id, backend))
+                settings.sync()
+            _device_ids[backend] = device_id
+        return device_id
+
+def reset_device_id_cache():
+    with _lock:
+        _device_ids.clear()
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    device_id = _backends[DEVICE_BACKEND]()
+    backend_time = time.perf_counter() - start
+    start = time.perf_counter()
+    get_device_id()
+    first_time = time.perf_counter() - start
+    start = time.perf_counter()
+    get_device_id()
+    cached_time = time.perf_counter() - start
+    print(f"[*] Бэкенд: {DEVICE_BACKEND}, ID устройства: {device_id}")
+    print(f"[*] Запрос к бэкенду: {backend_time * 1000:.2f} мс, первый вызов get_device_id: "
+          f"{first_time * 1000:.2f} мс, повторный: {cached_time * 1000:.4f} мс")
@@ -0,0 +1,262 @@
+import itertools
+import os
+
+from PyQt5.QtCore import QAbstractListModel, QModelIndex, QMimeData, Qt, pyqtSignal
+from PyQt5.QtWidgets import QAbstractItemView, QListView
+
+STATE_PENDING = "pending"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+RECORD_ID_ROLE = Qt.UserRole
+RECORD_IDS_MIME = "application/x-docstitcher-record-ids"
+
+class FileRecord:
+    """Один файл списка; id не меняется при перестановках и не зависит от имени файла."""
+    __slots__ = ("id", "path", "name", "ext", "size", "page_count", "state", "digest", "pdf_path")
+
+    def __init__(self, record_id, path):
+        self.id = record_id
+        self.path = path
+        self.name = os.path.basename(path)
+        self.ext = path.lower().rsplit('.', 1)[-1]
+        self.size = None
+        self.page_count = None
+        self.state = STATE_PENDING
+        # Заполняются фоновой подготовкой: хэш содержимого и PDF, из которого строится миниатюра
+        self.digest = None
+        self.pdf_path = None
+
+class FileListModel(QAbstractListModel):
+    """Список файлов для объединения: записи по id и порядок строк.
+
+    Перестановка, удаление и поиск строки по id выполняются за O(n), без поиска по имени.
+    Размер и число страниц заполняются позже через update_path, когда фоновая подготовка
+    закончит файл.
+    """
+    files_added = pyqtSignal(list)
+    files_removed = pyqtSignal(list)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._ids = itertools.count(1)
+        self._records = {}
+        self._order = []
+        self._rows = None
+        self._ids_by_path = {}
+        self.thumbnails = None
+
+    def set_thumbnail_provider(self, provider):
+        self.thumbnails = provider
+        provider.thumbnail_changed.connect(self.refresh_digest)
+
+    # Чтение
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._order)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        record = self._records[self._order[index.row()]]
+        if role == Qt.DisplayRole:
+            if record.state == STATE_FAILED:
+                return f"{record.name}  (ошибка подготовки)"
+            if record.page_count is not None:
+                return f"{record.name}  ·  {record.page_count} стр."
+            return record.name
+        if role == Qt.ToolTipRole:
+            details = [record.path]
+            if record.size is not None:
+                details.append(f"{record.size / 1024:.0f} КБ")
+            if record.page_count is not None:
+                details.append(f"Страниц: {record.page_count}")
+            return "\n".join(details)
+        if role == Qt.DecorationRole:
+            if self.thumbnails is None or record.digest is None:
+                return None
+            return self.thumbnails.pixmap(record.digest, record.pdf_path)
+        if role == RECORD_ID_ROLE:
+            return record.id
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.ItemIsDropEnabled
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction | Qt.CopyAction
+
+    def mimeTypes(self):
+        return [RECORD_IDS_MIME, "text/uri-list"]
+
+    def mimeData(self, indexes):
+        mime = QMimeData()
+        record_ids = [self._order[index.row()] for index in sorted(indexes, key=lambda i: i.row())]
+        mime.setData(RECORD_IDS_MIME, ",".join(map(str, record_ids)).encode())
+        return mime
+
+    def record(self, row):
+        return self._records[self._order[row]]
+
+    def records(self):
+        return [self._records[record_id] for record_id in self._order]
+
+    def paths(self):
+        return [self._records[record_id].path for record_id in self._order]
+
+    def row_of(self, record_id):
+        if self._rows is None:
+            self._rows = {rid: row for row, rid in enumerate(self._order)}
+        return self._rows.get(record_id)
+
+    # Изменение
+
+    def add_files(self, paths, row=None):
+        if not paths:
+            return []
+        row = len(self._order) if row is None else max(0, min(row, len(self._order)))
+        records = [FileRecord(next(self._ids), path) for path in paths]
+        self.beginInsertRows(QModelIndex(), row, row + len(records) - 1)
+        for record in records:
+            self._records[record.id] = record
+            self._ids_by_path.setdefault(record.path, set()).add(record.id)
+        self._order[row:row] = [record.id for record in records]
+        self._rows = None
+        self.endInsertRows()
+        self.files_added.emit(records)
+        return records
+
+    def remove_rows(self, rows):
+        removed = []
+        # Подряд идущие строки удаляются одним диапазоном, с конца списка
+        for first, last in reversed(_row_ranges(rows)):
+            self.beginRemoveRows(QModelIndex(), first, last)
+            for record_id in self._order[first:last + 1]:
+                removed.append(self._drop_record(record_id))
+            del self._order[first:last + 1]
+            self._rows = None
+            self.endRemoveRows()
+        if removed:
+            self.files_removed.emit(removed)
+        return removed
+
+    def clear(self):
+        removed = self.records()
+        self.beginResetModel()
+        self._records.clear()
+        self._order.clear()
+        self._ids_by_path.clear()
+        self._rows = None
+        self.endResetModel()
+        if removed:
+            self.files_removed.emit(removed)
+
+    def move_ids(self, record_ids, row):
+        """Переносит записи (в их текущем порядке) так, чтобы они встали перед строкой row."""
+        moved = set(record_ids)
+        if not moved:
+            return
+        record_ids = [rid for rid in self._order if rid in moved]
+        insert_at = sum(1 for rid in self._order[:row] if rid not in moved)
+        rest = [rid for rid in self._order if rid not in moved]
+        new_order = rest[:insert_at] + record_ids + rest[insert_at:]
+        if new_order == self._order:
+            return
+        self.layoutAboutToBeChanged.emit()
+        old_indexes = self.persistentIndexList()
+        old_ids = [self._order[index.row()] for index in old_indexes]
+        self._order = new_order
+        self._rows = None
+        new_indexes = [self.index(self.row_of(rid), 0) for rid in old_ids]
+        self.changePersistentIndexList(old_indexes, new_indexes)
+        self.layoutChanged.emit()
+
+    def update_path(self, path, **fields):
+        """Обновляет поля всех записей с этим путём (файл может быть в списке дважды)."""
+        for record_id in self._ids_by_path.get(path, ()):
+            record = self._records[record_id]
+            for name, value in fields.items():
+                setattr(record, name, value)
+            index = self.index(self.row_of(record_id), 0)
+            self.dataChanged.emit(index, index)
+
+    def refresh_digest(self, digest):
+        for row, record_id in enumerate(self._order):
+            if self._records[record_id].digest == digest:
+                index = self.index(row, 0)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def _drop_record(self, record_id):
+        record = self._records.pop(record_id)
+        same_path = self._ids_by_path.get(record.path)
+        if same_path is not None:
+            same_path.discard(record_id)
+            if not same_path:
+                del self._ids_by_path[record.path]
+        return record
+
+def _row_ranges(rows):
+    ranges = []
+    for row in sorted(set(rows)):
+        if ranges and ranges[-1][1] == row - 1:
+            ranges[-1][1] = row
+        else:
+            ranges.append([row, row])
+    return ranges
+
+class FileListView(QListView):
+    """Список файлов: перестановка перетаскиванием и приём файлов из проводника."""
+
+    def __init__(self, accepted_extensions, parent=None):
+        super().__init__(parent)
+        self.accepted_extensions = tuple(accepted_extensions)
+        self.setSelectionMode(QAbstractItemView.ExtendedSelection)
+        self.setDragDropMode(QAbstractItemView.DragDrop)
+        self.setDefaultDropAction(Qt.MoveAction)
+        self.setDropIndicatorShown(True)
+        self.setAcceptDrops(True)
+
+    def dragEnterEvent(self, event):
+        if event.mimeData().hasUrls() or event.source() == self:
+            event.accept()
+        else:
+            event.ignore()
+
+    def dragMoveEvent(self, event):
+        if event.mimeData().hasUrls() or event.source() == self:
+            super().dragMoveEvent(event)
+            event.accept()
+        else:
+            event.ignore()
+
+    def dropEvent(self, event):
+        row = self.drop_row(event.pos())
+        mime = event.mimeData()
+        if event.source() == self and mime.hasFormat(RECORD_IDS_MIME):
+            record_ids = [int(rid) for rid in bytes(mime.data(RECORD_IDS_MIME)).decode().split(",") if rid]
+            self.model().move_ids(record_ids, row)
+            # Перенос уже выполнен моделью: CopyAction не даёт QAbstractItemView удалить исходные строки
+            event.setDropAction(Qt.CopyAction)
+            event.accept()
+            print("[*] Обновлен порядок файлов после перемещения внутри списка")
+        elif mime.hasUrls():
+            paths = []
+            for url in mime.urls():
+                file_path = os.path.normpath(url.toLocalFile())
+                if file_path.lower().endswith(self.accepted_extensions):
+                    paths.append(file_path)
+                else:
+                    print(f"[!] Неподдерживаемый формат файла: {file_path}")
+            self.model().add_files(paths, row)
+            event.acceptProposedAction()
+        else:
+            event.ignore()
+
+    def drop_row(self, pos):
+        index = self.indexAt(pos)
+        if not index.isValid():
+            return self.model().rowCount()
+        rect = self.visualRect(index)
+        return index.row() + (1 if pos.y() > rect.center().y() else 0)
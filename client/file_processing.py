@@ -1,27 +1,94 @@
 import os
+import platform
 import sys
-import tempfile
 import time
+from collections import deque
 from PyQt5.QtWidgets import QMessageBox, QFileDialog
-from pypdf import PdfWriter
 import pymupdf as fitz
-import comtypes.client
 from multiprocessing import Pool
-import pythoncom
-from docx2pdf import convert
-import img2pdf
+from multiprocessing.pool import ThreadPool
 
-from client.client_utils import pt_to_px, resource_path, get_max_workers, process_page
+from client.client_utils import resource_path, get_max_workers
+from client.render_worker import pt_to_px, process_page, init_worker, close_source
+from client.config import RENDER_MEMORY_BUDGET_MB, RENDER_PROFILE, PROFILE_CAPTURE, PROFILE_DIR, PROFILE_INTERVAL_MS, \
+    RENDER_BACKEND, RENDER_THREAD_MAX_PAGES
+from client.fitz_lock import FITZ_LOCK
+from client.render_profiles import get_render_profile, A4_WIDTH_PT, A4_HEIGHT_PT
+from client.pdf_output import save_pdf
+from client.merge import merge_pdfs
+from client.jobs import StitchJob, collect_stale_jobs, find_interrupted_jobs
+from client.workspace import Workspace, collect_stale_workspaces, workspace_root
+from client.progress import ProgressTracker, estimate_pages, format_eta, input_kind, render_cost_key
+from client.profiling import ProfileCapture, finish_worker_profiles
 
 white_list = ['.doc', '.docx', '.pdf', '.jpg', '.jpeg', '.png']
+# Как часто задача сохраняет собранные страницы в контрольную точку
+CHECKPOINT_PAGES = 50
+# Картинки оформления в репозитории: путь от модуля, а не от текущего каталога
+ASSETS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "assets")
 
-def update_progress(window, value, total):
+def update_progress(window, fraction, eta_seconds=None):
+    """Показывает долю готового и оставшееся время; ProgressTracker вызывает её не чаще PROGRESS_INTERVAL_S."""
     window.progress_bar.setVisible(True)
-    percent = int((value / total) * 100)
-    window.progress_bar.setValue(percent)
+    window.progress_bar.setValue(int(fraction * 100))
+    if eta_seconds is None:
+        window.progress_bar.setFormat("%p%")
+    else:
+        window.progress_bar.setFormat(f"%p% · осталось ~{format_eta(eta_seconds)}")
     from PyQt5.QtWidgets import QApplication
     QApplication.processEvents()
 
+def progress_tracker(window):
+    """Прогресс текущей операции окна; без start_progress создаётся пустой при первом обращении."""
+    progress = getattr(window, "progress", None)
+    if progress is None:
+        progress = window.progress = ProgressTracker(window.update_progress)
+    return progress
+
+def start_progress(window, inputs, job=None, extra_pages=0, profile=None):
+    """Новый прогресс объединения inputs, сразу взвешенный по всем этапам.
+
+    Числа страниц берутся из журнала задачи, у сервиса подготовки или из самих файлов,
+    чтобы рендер, который занимает большую часть времени, учитывался с самого начала.
+    extra_pages — страницы, которые рендерятся помимо входных (бывшая последняя при дописывании).
+    profile — профиль рендеринга (см. current_render_profile).
+    """
+    progress = window.progress = ProgressTracker(window.update_progress)
+    preprocess = getattr(window, "preprocess", None)
+    kinds = {}
+    page_count = extra_pages
+    for i, path in enumerate(inputs):
+        prepared = preprocess.lookup(path) if preprocess is not None else None
+        ready = (job is not None and job.converted_pdf(i)) or prepared is not None
+        kind = "ready" if ready else input_kind(path)
+        kinds[kind] = kinds.get(kind, 0) + 1
+        if job is not None and job.page_counts is not None:
+            continue
+        if prepared is not None and prepared.page_count:
+            page_count += prepared.page_count
+        else:
+            converted = job.converted_pdf(i) if job is not None else None
+            page_count += estimate_pages(converted or path)
+    if job is not None and job.page_counts is not None:
+        page_count = sum(job.page_counts)
+    for kind, count in kinds.items():
+        progress.plan(kind, count)
+    progress.plan("merge", page_count)
+    progress.plan("render", max(page_count - 1, 0), render_cost_key(current_render_profile(window, profile)))
+    progress.plan("save", page_count)
+    return progress
+
+def finish_progress(window):
+    window.progress = None
+    window.progress_bar.setVisible(False)
+
+def session_workspace(owner):
+    """Временный каталог окна (или сервиса подготовки); создаётся при первом обращении."""
+    workspace = getattr(owner, "workspace", None)
+    if workspace is None:
+        workspace = owner.workspace = Workspace.create()
+    return workspace
+
 def convert_to_pdf(window, doc_file):
     if not os.path.exists(doc_file):
         print(f"[!] Файл не найден для конвертации: {doc_file}")
@@ -29,13 +96,16 @@ def convert_to_pdf(window, doc_file):
     if not doc_file.lower().endswith(".docx"):
         print(f"[!] Недопустимый тип файла для convert_to_pdf: {doc_file}")
         return None
-    temp_name = next(tempfile._get_candidate_names()) + '.pdf'
-    temp_pdf = os.path.join(tempfile.gettempdir(), temp_name)
+    temp_pdf = session_workspace(window).new_path('.pdf')
     try:
+        # Конвертеры тянут COM и pywin32: импортируем их только при первой конвертации
+        from docx2pdf import convert
         convert(input_path=doc_file, output_path=temp_pdf)
         print(f"[+] Конвертировано через docx2pdf: {doc_file}")
     except Exception as e:
         print(f"[!] Ошибка в docx2pdf: {e}")
+        import pythoncom
+        import comtypes.client
         try:
             pythoncom.CoInitialize()
             wd_format_pdf = 17
@@ -66,11 +136,12 @@ def convert_doc_to_pdf(window, doc_file):
     if not os.path.exists(doc_file):
         print(f"[!] Файл не найден для конвертации: {doc_file}")
         return None
+    import pythoncom
+    import comtypes.client
     try:
         pythoncom.CoInitialize()
         wd_format_pdf = 17
-        temp_name = next(tempfile._get_candidate_names()) + '.pdf'
-        temp_pdf = os.path.join(tempfile.gettempdir(), temp_name)
+        temp_pdf = session_workspace(window).new_path('.pdf')
         word = comtypes.client.CreateObject('Word.Application')
         time.sleep(1.5)
         word.DisplayAlerts = 0
@@ -96,11 +167,11 @@ def convert_doc_to_pdf(window, doc_file):
 
 def convert_image_to_pdf(window, image_file):
     try:
+        import img2pdf
         if not os.path.exists(image_file):
             print(f"[!] Файл не найден для конвертации: {image_file}")
             return None
-        temp_name = next(tempfile._get_candidate_names()) + '_img2pdf.pdf'
-        pdf_file = os.path.join(tempfile.gettempdir(), temp_name)
+        pdf_file = session_workspace(window).new_path('_img2pdf.pdf')
         a4_page_size = [img2pdf.in_to_pt(8.25), img2pdf.in_to_pt(11.65)]
         layout_fun = img2pdf.get_layout_fun(a4_page_size)
         with open(pdf_file, "wb") as f:
@@ -112,16 +183,26 @@ def convert_image_to_pdf(window, image_file):
         print(f"[!] Ошибка при конвертации {image_file} в PDF через img2pdf: {e}")
         return None
 
-def save(window):
-    if not window.file_lst:
-        QMessageBox.warning(window, "Ошибка", "Нет файлов для объединения!")
-        return
-    pdf_lst = [None] * len(window.file_lst)
-    window.progress_bar.setVisible(True)
-    window.progress_bar.setValue(0)
-    for i, file_path in enumerate(window.file_lst):
+def convert_inputs(window, job=None):
+    """Конвертирует файлы списка (или входные файлы задачи job) в PDF в исходном порядке; возвращает пути к PDF.
+
+    С job уже сконвертированные по журналу файлы не конвертируются повторно, а новые
+    результаты сохраняются в рабочем каталоге задачи.
+    """
+    inputs = job.inputs if job is not None else window.file_lst
+    pdf_lst = [None] * len(inputs)
+    progress = progress_tracker(window)
+    preprocess = getattr(window, "preprocess", None)
+    for i, file_path in enumerate(inputs):
         ext = file_path.lower().rsplit('.', 1)[-1]
-        if ext == 'docx':
+        prepared = preprocess.lookup(file_path) if preprocess is not None else None
+        journaled = job.converted_pdf(i) if job is not None else None
+        if journaled is not None:
+            pdf_path = journaled
+        elif prepared is not None:
+            # Уже сконвертирован в фоне; временным PDF владеет сервис подготовки
+            pdf_path = prepared.pdf_path
+        elif ext == 'docx':
             pdf_path = convert_to_pdf(window, file_path)
         elif ext == 'doc':
             pdf_path = convert_doc_to_pdf(window, file_path)
@@ -133,25 +214,34 @@ def save(window):
             pdf_path = None
             print(f"[!] Неподдерживаемый формат файла: {file_path}")
         if pdf_path and os.path.exists(pdf_path):
+            if job is not None and journaled is None:
+                # Свой временный PDF переносим в каталог задачи, PDF сервиса подготовки копируем
+                owned = pdf_path in window.temp_file_path
+                if owned:
+                    window.temp_file_path.remove(pdf_path)
+                pdf_path = job.record_converted(i, file_path, pdf_path, move=owned)
             pdf_lst[i] = pdf_path
         else:
             print(f"[!] Не удалось обработать: {file_path}")
-        update_progress(window, i + 1, len(window.file_lst))
-    pdf_lst = [p for p in pdf_lst if p is not None and os.path.exists(p)]
-    if not pdf_lst:
-        QMessageBox.warning(window, "Ошибка", "Не удалось преобразовать файлы!")
-        window.progress_bar.setVisible(False)
+        if journaled is not None or prepared is not None:
+            progress.skip("ready")
+        else:
+            progress.advance(input_kind(file_path))
+    return [p for p in pdf_lst if p is not None and os.path.exists(p)]
+
+def remove_temp_files(window):
+    for file_path in window.temp_file_path:
+        if os.path.exists(file_path):
+            try:
+                os.remove(file_path)
+            except Exception as e:
+                print(f"[!] Ошибка при удалении временного файла {file_path}: {e}")
+    window.temp_file_path = []
+
+def save(window):
+    if not window.file_lst:
+        QMessageBox.warning(window, "Ошибка", "Нет файлов для объединения!")
         return
-    first_pdf_path = pdf_lst[0]
-    doc_first = fitz.open(first_pdf_path)
-    window.first_page_count = len(doc_first)
-    doc_first.close()
-    pdf_merger = PdfWriter()
-    for pdf_file in pdf_lst:
-        try:
-            pdf_merger.append(pdf_file)
-        except Exception as e:
-            print(f"[!] Ошибка при добавлении {pdf_file}: {e}")
     app_dir = os.path.dirname(sys.argv[0])
     output_dir = os.path.join(app_dir, "Итоговые документы")
     os.makedirs(output_dir, exist_ok=True)
@@ -167,66 +257,13 @@ def save(window):
         msg_box.exec_()
         if msg_box.clickedButton() == no_button:
             QMessageBox.information(window, "Отменено", "Сохранение отменено.")
-            window.progress_bar.setVisible(False)
             return
-    try:
-        pdf_merger.write(window.output_file)
-        pdf_merger.close()
-        apply_scan_effect(window, window.output_file)
-        for file_path in window.temp_file_path:
-            if os.path.exists(file_path):
-                try:
-                    os.remove(file_path)
-                except Exception as e:
-                    print(f"[!] Ошибка при удалении временного файла {file_path}: {e}")
-        window.temp_file_path = []
-        QMessageBox.information(window, "Успешно", f"Файлы объединены и сохранены в:\n{window.output_file}")
-    except Exception as e:
-        QMessageBox.critical(window, "Ошибка", f"Не удалось сохранить файл: {e}")
-        print(f"[!] Ошибка сохранения: {e}")
-    finally:
-        window.progress_bar.setVisible(False)
+    stitch_to(window, window.output_file)
 
 def save_as(window):
     if not window.file_lst:
         QMessageBox.warning(window, "Ошибка", "Нет файлов для объединения!")
         return
-    pdf_lst = [None] * len(window.file_lst)
-    window.progress_bar.setVisible(True)
-    window.progress_bar.setValue(0)
-    for i, file_path in enumerate(window.file_lst):
-        ext = file_path.lower().rsplit('.', 1)[-1]
-        if ext == 'docx':
-            pdf_path = convert_to_pdf(window, file_path)
-        elif ext == 'doc':
-            pdf_path = convert_doc_to_pdf(window, file_path)
-        elif ext == 'pdf':
-            pdf_path = file_path
-        elif ext in ('jpg', 'jpeg', 'png'):
-            pdf_path = convert_image_to_pdf(window, file_path)
-        else:
-            pdf_path = None
-            print(f"[!] Неподдерживаемый формат файла: {file_path}")
-        if pdf_path and os.path.exists(pdf_path):
-            pdf_lst[i] = pdf_path
-        else:
-            print(f"[!] Не удалось обработать: {file_path}")
-        update_progress(window, i + 1, len(window.file_lst))
-    pdf_lst = [p for p in pdf_lst if p is not None and os.path.exists(p)]
-    if not pdf_lst:
-        QMessageBox.warning(window, "Ошибка", "Не удалось преобразовать файлы!")
-        window.progress_bar.setVisible(False)
-        return
-    first_pdf_path = pdf_lst[0]
-    doc_first = fitz.open(first_pdf_path)
-    window.first_page_count = len(doc_first)
-    doc_first.close()
-    pdf_merger = PdfWriter()
-    for pdf_file in pdf_lst:
-        try:
-            pdf_merger.append(pdf_file)
-        except Exception as e:
-            print(f"[!] Ошибка при добавлении {pdf_file}: {e}")
     first_file_name = os.path.splitext(os.path.basename(window.file_lst[0]))[0]
     suggested_name = os.path.join(window.file_path, f"{first_file_name}.pdf")
     output_file, _ = QFileDialog.getSaveFileName(
@@ -234,111 +271,535 @@ def save_as(window):
     )
     if not output_file:
         QMessageBox.information(window, "Отменено", "Сохранение отменено.")
-        window.progress_bar.setVisible(False)
         return
-    if output_file:
+    stitch_to(window, output_file)
+
+def job_params(window):
+    """Настройки окна, с которыми задачу нужно будет продолжить после перезапуска."""
+    combo = getattr(window, "render_profile", None)
+    return {
+        "ribbon_position": window.ribbon_position.currentText(),
+        "checkbox_bw": window.checkbox_bw_first.isChecked(),
+        "render_profile": combo.currentData() if combo is not None else RENDER_PROFILE,
+    }
+
+def restore_job_params(window, params):
+    window.ribbon_position.setCurrentText(params["ribbon_position"])
+    window.checkbox_bw_first.setChecked(params["checkbox_bw"])
+    combo = getattr(window, "render_profile", None)
+    if combo is not None:
+        index = combo.findData(params["render_profile"])
+        if index >= 0:
+            combo.setCurrentIndex(index)
+
+def run_steps(steps):
+    """Выполняет генератор шагов (..._steps) до конца и возвращает его результат."""
+    while True:
         try:
-            pdf_merger.write(output_file)
-            pdf_merger.close()
-            apply_scan_effect(window, output_file)
-            for file_path in window.temp_file_path:
-                if os.path.exists(file_path):
-                    try:
-                        os.remove(file_path)
-                    except Exception as e:
-                        print(f"[!] Ошибка при удалении временного файла {file_path}: {e}")
-            window.temp_file_path = []
-            QMessageBox.information(window, "Успешно", f"Файлы объединены и сохранены в:\n{output_file}")
-        except Exception as e:
-            QMessageBox.critical(window, "Ошибка", f"Не удалось сохранить файл: {e}")
-            print(f"[!] Ошибка сохранения: {e}")
-        finally:
-            window.progress_bar.setVisible(False)
+            next(steps)
+        except StopIteration as stop:
+            return stop.value
 
-def apply_scan_effect(window, pdf_path, output_pdf=None):
-    if output_pdf is None:
-        output_pdf = pdf_path
+def run_stitch_job(window, job):
+    """Конвертация, объединение и рендер по журналу задачи; возвращает итоговый файл или None.
+
+    Шаги, уже отмеченные в журнале, пропускаются, поэтому прерванную задачу можно
+    вызвать повторно. После успеха рабочий каталог задачи удаляется.
+    """
+    return run_steps(stitch_job_steps(window, job))
+
+def stitch_job_steps(window, job):
+    """run_stitch_job по шагам: генератор отдаёт номер каждой собранной страницы.
+
+    Так несколько задач можно вести по очереди в одном потоке с общим пулом рендеринга
+    (см. client/hotfolder.py): PyMuPDF в родительском процессе остаётся однопоточным.
+    """
+    # Профиль задачи — из её параметров: продолжение после перезапуска рендерит тем же профилем
+    profile = job.params.get("render_profile")
+    progress = start_progress(window, job.inputs, job, profile=profile)
+    # Демон горячих папок не отдаёт документ без части входных файлов или страниц
+    require_all_pages = getattr(window, "require_all_pages", False)
+    pdf_lst = convert_inputs(window, job)
+    if not pdf_lst:
+        return None
+    if require_all_pages and len(pdf_lst) < len(job.inputs):
+        raise RuntimeError(f"Не удалось преобразовать файлов: {len(job.inputs) - len(pdf_lst)} "
+                           f"из {len(job.inputs)}")
+    if job.page_counts is None or not os.path.exists(job.merged_path):
+        job.record_merged(merge_pdfs(pdf_lst, job.merged_path))
+        progress.plan("merge", sum(job.page_counts))
+        progress.advance("merge", sum(job.page_counts))
+    else:
+        progress.skip("merge", sum(job.page_counts))
+    if require_all_pages and 0 in job.page_counts:
+        failed = [pdf_path for pdf_path, count in zip(pdf_lst, job.page_counts) if not count]
+        raise RuntimeError(f"Не удалось объединить: {', '.join(failed)}")
+    window.first_page_count = job.page_counts[0]
     try:
-        dpi = 210
-        a4_width_pt = 595
-        a4_height_pt = 842
-        a4_width_px = pt_to_px(a4_width_pt, dpi)
-        a4_height_px = pt_to_px(a4_height_pt, dpi)
-        doc = fitz.open(pdf_path)
-        new_doc = fitz.open()
-        page_count = len(doc) - 1
-        if page_count == 0:
-            new_doc.insert_pdf(doc)
-            new_doc.save(output_pdf)
-            new_doc.close()
-            doc.close()
-            window.progress_bar.setVisible(False)
-            return output_pdf
-        window.progress_count = 0
-        ribbon_path = resource_path("../assets/ribbons/ribbon.png")
-        ribbon_left_path = resource_path("../assets/ribbons/ribbon_left.png")
-        ribbon_middle_path = resource_path("../assets/ribbons/ribbon_middle.png")
-        dot1_path = resource_path("../assets/dots/dot1.png")
-        dot2_path = resource_path("../assets/dots/dot2.png")
-        dot_mid_path = resource_path("../assets/dots/middle_dot.png")
-        temp_images = [None] * page_count
-        max_workers = get_max_workers(page_count)
-        with Pool(processes=max_workers) as pool:
-            results = [
-                pool.apply_async(
+        yield from scan_effect_steps(window, job.merged_path, job.output, job, profile)
+    except Exception as e:
+        # Журнал, контрольная точка и готовые страницы остаются: задачу можно продолжить
+        print(f"[!] Задача {job.job_id} прервана ошибкой рендеринга: {e}")
+        job.release()
+        raise
+    progress.finish()
+    job.finish()
+    print(f"[+] Задача {job.job_id} завершена: {job.output}")
+    return job.output
+
+def profiling_enabled(window):
+    action = getattr(window, "profile_saves_action", None)
+    return PROFILE_CAPTURE or (action is not None and action.isChecked())
+
+def start_profile_capture(window):
+    """В диагностическом режиме запускает профилирование сохранения (window.profile_capture)."""
+    window.profile_capture = None
+    if not profiling_enabled(window):
+        return
+    try:
+        window.profile_capture = ProfileCapture(PROFILE_DIR or os.path.join(workspace_root(), "profiles"),
+                                                PROFILE_INTERVAL_MS)
+    except OSError as e:
+        print(f"[!] Не удалось начать профилирование: {e}")
+
+def finish_profile_capture(window, job):
+    """Сливает профиль сохранения с параметрами задачи; возвращает путь к файлу speedscope или None."""
+    capture = getattr(window, "profile_capture", None)
+    window.profile_capture = None
+    if capture is None:
+        return None
+    try:
+        path = capture.finish(profile_tags(window, job))
+    except Exception as e:
+        print(f"[!] Не удалось сохранить профиль: {e}")
+        return None
+    print(f"[+] Профиль сохранения: {path}")
+    return path
+
+def profile_tags(window, job):
+    """Параметры задачи, от которых зависит время сохранения, для названия и metadata профиля."""
+    inputs = job.inputs if job is not None else window.file_lst
+    types = {}
+    for path in inputs:
+        ext = os.path.splitext(path)[1].lower().lstrip(".")
+        types[ext] = types.get(ext, 0) + 1
+    page_count = sum(job.page_counts) if job is not None and job.page_counts else None
+    params = job.params if job is not None else job_params(window)
+    return {
+        "pages": page_count,
+        "files": len(inputs),
+        "input_types": " ".join(f"{ext}×{count}" for ext, count in sorted(types.items())),
+        "render_profile": params["render_profile"],
+        "dpi": get_render_profile(params["render_profile"])["dpi"],
+        "ribbon": params["ribbon_position"],
+        "bw": params["checkbox_bw"],
+        "workers": get_max_workers(page_count or 1),
+        "render_backend": select_render_backend(window, max((page_count or 1) - 1, 0)),
+        "cpu_count": os.cpu_count(),
+        "platform": platform.platform(),
+        "job_id": job.job_id if job is not None else None,
+    }
+
+def stitch_to(window, output_file, job=None):
+    """Объединяет файлы списка в output_file (или продолжает job) и сообщает результат."""
+    start_profile_capture(window)
+    try:
+        if job is None:
+            job = StitchJob.create(window.file_lst, output_file, job_params(window))
+        result = run_stitch_job(window, job)
+        profile_path = finish_profile_capture(window, job)
+        if result is None:
+            job.remove()
+            QMessageBox.warning(window, "Ошибка", "Не удалось преобразовать файлы!")
+            return
+        remove_temp_files(window)
+        message = f"Файлы объединены и сохранены в:\n{job.output}"
+        if profile_path:
+            message += f"\n\nПрофиль сохранения для диагностики:\n{profile_path}"
+        QMessageBox.information(window, "Успешно", message)
+    except Exception as e:
+        finish_profile_capture(window, job)
+        # Рабочий каталог остаётся: задачу предложат продолжить при следующем запуске
+        if job is not None:
+            job.release()
+        message = f"Не удалось сохранить файл: {e}"
+        if job is not None and os.path.isdir(job.workspace):
+            message += "\n\nГотовые страницы сохранены, объединение можно будет продолжить при следующем запуске."
+        QMessageBox.critical(window, "Ошибка", message)
+        print(f"[!] Ошибка сохранения: {e}")
+    finally:
+        finish_progress(window)
+
+def resume_interrupted_jobs(window):
+    """При запуске удаляет устаревшие рабочие каталоги и предлагает продолжить прерванные задачи."""
+    try:
+        collect_stale_workspaces()
+        collect_stale_jobs()
+        jobs = find_interrupted_jobs()
+    except OSError as e:
+        print(f"[!] Не удалось проверить прерванные задачи: {e}")
+        return
+    for job in jobs:
+        if job.page_counts:
+            done = f"готово страниц: {len(job.pages)} из {max(sum(job.page_counts) - 1, 0)}"
+        else:
+            done = f"сконвертировано файлов: {len(job.converted)} из {len(job.inputs)}"
+        msg_box = QMessageBox(window)
+        msg_box.setWindowTitle("Незавершённое объединение")
+        msg_box.setText(f"Объединение в '{os.path.basename(job.output)}' было прервано ({done}).\n"
+                        f"Продолжить с места остановки?")
+        resume_button = msg_box.addButton("Продолжить", QMessageBox.YesRole)
+        discard_button = msg_box.addButton("Удалить", QMessageBox.DestructiveRole)
+        msg_box.addButton("Позже", QMessageBox.RejectRole)
+        msg_box.exec_()
+        if msg_box.clickedButton() == resume_button:
+            print(f"[*] Продолжение задачи {job.job_id}: {done}")
+            restore_job_params(window, job.params)
+            stitch_to(window, job.output, job)
+        elif msg_box.clickedButton() == discard_button:
+            job.remove()
+            print(f"[*] Задача {job.job_id} удалена")
+        else:
+            job.release()
+
+def append_to_stitched(window):
+    """Дописывает файлы списка в конец уже собранного документа.
+
+    Старые страницы не трогаются: заново рендерятся только новые страницы и бывшая
+    последняя страница (теперь она средняя и получает точку). Результат дописывается
+    в файл инкрементальным обновлением, поэтому время зависит от объёма добавки,
+    а не от размера всего документа.
+    """
+    if not window.file_lst:
+        QMessageBox.warning(window, "Ошибка", "Нет файлов для добавления!")
+        return
+    stitched_pdf, _ = QFileDialog.getOpenFileName(
+        window, "Выберите собранный документ", window.file_path, "PDF Files (*.pdf)"
+    )
+    if not stitched_pdf:
+        return
+    # Бывшая последняя страница собранного документа рендерится заново вместе с новыми
+    start_progress(window, window.file_lst, extra_pages=1)
+    pdf_lst = convert_inputs(window)
+    if not pdf_lst:
+        QMessageBox.warning(window, "Ошибка", "Не удалось преобразовать файлы!")
+        finish_progress(window)
+        return
+    try:
+        added = append_scan_pages(window, stitched_pdf, pdf_lst)
+        remove_temp_files(window)
+        QMessageBox.information(window, "Успешно", f"Добавлено страниц: {added}\nДокумент:\n{stitched_pdf}")
+    except Exception as e:
+        QMessageBox.critical(window, "Ошибка", f"Не удалось дополнить документ: {e}")
+        print(f"[!] Ошибка добавления в документ: {e}")
+    finally:
+        finish_progress(window)
+
+def append_scan_pages(window, stitched_pdf, pdf_lst):
+    """Добавляет PDF из pdf_lst в конец stitched_pdf; возвращает число добавленных страниц.
+
+    Если хотя бы одну страницу не удалось обработать, файл на диске не меняется: иначе
+    пропала бы и бывшая последняя страница, которая рендерится заново вместе с новыми.
+    """
+    profile = current_render_profile(window)
+    a4_width_pt = A4_WIDTH_PT
+    a4_height_pt = A4_HEIGHT_PT
+    workspace = session_workspace(window)
+    delta_path = workspace.new_path('_append.pdf')
+    # Потоки миниатюр и подготовки работают, пока окно обрабатывает события: MuPDF — под блокировкой
+    with FITZ_LOCK:
+        bundle = fitz.open(stitched_pdf)
+        delta = fitz.open()
+    try:
+        with FITZ_LOCK:
+            last_index = len(bundle) - 1
+            # Во временный документ попадают бывшая последняя страница и все новые
+            delta.insert_pdf(bundle, from_page=last_index, to_page=last_index)
+            for pdf_file in pdf_lst:
+                try:
+                    with fitz.open(pdf_file) as src:
+                        delta.insert_pdf(src)
+                except Exception as e:
+                    print(f"[!] Ошибка при добавлении {pdf_file}: {e}")
+            delta.save(delta_path)
+            bundle.delete_page(last_index)
+        window.temp_file_path.append(delta_path)
+        render_count = len(delta) - 1
+        progress = progress_tracker(window)
+        progress.plan("merge", len(delta))
+        progress.advance("merge", len(delta))
+        # Ч/Б относится только к первому документу, а он уже в собранном файле
+        for page_num, layers in render_scan_pages(window, workspace, delta_path, render_count, profile,
+                                                  a4_width_pt, a4_height_pt, first_page_count=0,
+                                                  page_offset=last_index):
+            if not layers:
+                raise RuntimeError(f"Не удалось обработать страницу {last_index + page_num + 1}")
+            insert_rendered_page(bundle, layers, a4_width_pt, a4_height_pt)
+            workspace.remove(layer_paths(layers))
+        with FITZ_LOCK:
+            bundle.insert_pdf(delta, from_page=len(delta) - 1, to_page=len(delta) - 1)
+            if bundle.can_save_incrementally():
+                bundle.saveIncr()
+            else:
+                # Повреждённый или зашифрованный файл приходится переписать целиком
+                print(f"[*] Инкрементальное сохранение недоступно, файл будет перезаписан: {stitched_pdf}")
+                temp_output = stitched_pdf + ".tmp"
+                save_pdf(bundle, temp_output)
+                # В Windows открытый файл нельзя заменить
+                bundle.close()
+                os.replace(temp_output, stitched_pdf)
+    finally:
+        # Без явного закрытия собранный файл остаётся открытым (в Windows — заблокированным) до сборки мусора
+        with FITZ_LOCK:
+            for doc in (delta, bundle):
+                if not doc.is_closed:
+                    doc.close()
+    progress.plan("save", render_count + 1)
+    progress.advance("save", render_count + 1)
+    progress.finish()
+    # Новых страниц столько же, сколько перерисовано: бывшая последняя заменила последнюю новую
+    print(f"[+] В {stitched_pdf} добавлено {render_count} стр.")
+    return render_count
+
+def asset_path(relative_path):
+    if getattr(sys, "frozen", False):
+        return resource_path(os.path.join("..", "assets", relative_path))
+    return os.path.join(ASSETS_DIR, relative_path)
+
+def decoration_assets():
+    """Пути к картинкам ленты и точек в порядке аргументов process_page."""
+    return (
+        asset_path("ribbons/ribbon.png"),
+        asset_path("ribbons/ribbon_left.png"),
+        asset_path("ribbons/ribbon_middle.png"),
+        asset_path("dots/dot1.png"),
+        asset_path("dots/dot2.png"),
+        asset_path("dots/middle_dot.png"),
+    )
+
+def current_render_profile(window, profile=None):
+    """Словарь профиля рендеринга: profile (имя или словарь из render_profiles), если задан,
+    иначе выбранный в окне или DOCSTITCHER_RENDER_PROFILE."""
+    if isinstance(profile, dict):
+        return profile
+    if profile is not None:
+        return get_render_profile(profile)
+    combo = getattr(window, "render_profile", None)
+    return get_render_profile(combo.currentData() if combo is not None else RENDER_PROFILE)
+
+def select_render_backend(window, page_count):
+    """process или thread: выбор в меню "Сервис" (window.render_backend), иначе DOCSTITCHER_RENDER_BACKEND.
+
+    В режиме auto маленькие документы рендерятся потоками: запуск процессов (spawn в Windows —
+    новый интерпретатор и импорт модулей на каждый) для них дороже, чем потеря параллельности
+    растеризации MuPDF, которая в потоках идёт под FITZ_LOCK. Режим включается явно: порог
+    RENDER_THREAD_MAX_PAGES нужно подобрать по benchmarks/render_backends.py на целевых машинах.
+    """
+    backend = getattr(window, "render_backend", None) or RENDER_BACKEND
+    if backend == "auto":
+        backend = "thread" if page_count <= RENDER_THREAD_MAX_PAGES else "process"
+    return "thread" if backend == "thread" else "process"
+
+def create_render_pool(backend, processes, pdf_path, capture=None):
+    """Пул рендеринга с init_worker: процессы или потоки этого процесса (backend="thread")."""
+    profiler = capture.worker_args() if capture is not None else None
+    pool_class = ThreadPool if backend == "thread" else Pool
+    return pool_class(processes=processes, initializer=init_worker, initargs=(pdf_path, profiler))
+
+def render_scan_pages(window, workspace, pdf_path, page_count, profile, a4_width_pt, a4_height_pt, first_page_count,
+                      page_offset=0, start_page=0, job=None):
+    """Рендерит страницы start_page..page_count-1 в пуле (select_render_backend) и отдаёт (номер, слои) по порядку.
+
+    Слои пишутся в каталог workspace. Новые страницы уходят в пул, только пока готовые слои
+    и ожидаемый объём страниц в работе помещаются в квоту workspace: вызывающий код должен
+    удалять вставленные слои через workspace.remove, иначе в работе останется одна страница.
+    page_offset — номер первой страницы в итоговом документе: от него зависят лента и Ч/Б.
+    С job каждая готовая страница отмечается в журнале, а страницы, готовые с прошлого
+    запуска, не рендерятся заново. Страница, которую не удалось обработать, отдаётся с None.
+    """
+    dpi = profile["dpi"]
+    a4_width_px = pt_to_px(a4_width_pt, dpi)
+    a4_height_px = pt_to_px(a4_height_pt, dpi)
+    ribbon_path, ribbon_left_path, ribbon_middle_path, dot1_path, dot2_path, dot_mid_path = decoration_assets()
+    done = job.completed_pages(page_count) if job is not None else {}
+    done = {page_num: layers for page_num, layers in done.items() if page_num >= start_page}
+    progress = progress_tracker(window)
+    progress.plan("render", page_count, render_cost_key(profile))
+    if start_page + len(done):
+        progress.skip("render", start_page + len(done))
+        print(f"[*] Страниц, готовых с прошлого запуска: {start_page + len(done)}")
+    todo = deque(page_num for page_num in range(start_page, page_count) if page_num not in done)
+    if not todo:
+        for page_num in range(start_page, page_count):
+            yield page_num, done[page_num]
+        return
+    max_workers = get_max_workers(len(todo))
+    max_in_flight = max_workers * 2
+    # Демон горячих папок отдаёт общий пул процессов на все пакеты; окно создаёт пул на каждый документ
+    shared_pool = getattr(window, "render_pool", None)
+    # Пока нет ни одной готовой страницы, оцениваем её как несжатый растр / 8
+    page_bytes = a4_width_px * a4_height_px * 3 // 8
+    rendered_bytes = rendered_pages = 0
+    in_flight = {}
+    own_pool = None
+    backend = None
+    capture = getattr(window, "profile_capture", None)
+    if shared_pool is None:
+        backend = select_render_backend(window, len(todo))
+        own_pool = create_render_pool(backend, max_workers, pdf_path, capture)
+    pool = shared_pool or own_pool
+    try:
+        for page_num in range(start_page, page_count):
+            # Нужная сейчас страница всегда отправляется: без неё работа не продвинется
+            while todo and (not in_flight or (len(in_flight) < max_in_flight and
+                                              workspace.has_room(page_bytes * (len(in_flight) + 1)))):
+                next_page = todo.popleft()
+                in_flight[next_page] = pool.apply_async(
                     process_page,
                     args=(
-                        page_num,
+                        next_page,
                         pdf_path,
                         a4_width_px,
                         a4_height_px,
                         dpi,
                         window.ribbon_position.currentText(),
-                        window.first_page_count,
+                        first_page_count,
                         window.checkbox_bw_first.isChecked(),
                         ribbon_path,
                         ribbon_left_path,
                         ribbon_middle_path,
                         dot1_path,
                         dot2_path,
-                        dot_mid_path
+                        dot_mid_path,
+                        RENDER_MEMORY_BUDGET_MB,
+                        page_offset,
+                        profile,
+                        workspace.directory
                     )
-                ) for page_num in range(page_count)
-            ]
-            for r in results:
-                page_num, temp_img_path = r.get()
-                window.progress_count += 1
-                window.update_progress(window.progress_count, page_count)
-                if temp_img_path:
-                    temp_images[page_num] = temp_img_path
-        for page_num in range(page_count):
-            if temp_images[page_num]:
-                new_page = new_doc.new_page(width=a4_width_pt, height=a4_height_pt)
-                rect = fitz.Rect(0, 0, a4_width_pt, a4_height_pt)
-                new_page.insert_image(rect, filename=temp_images[page_num])
+                )
+            if page_num in done:
+                yield page_num, done[page_num]
+                continue
+            _, layers = in_flight.pop(page_num).get()
+            progress.advance("render")
+            if layers:
+                paths = layer_paths(layers)
+                workspace.track(paths)
+                rendered_bytes += sum(os.path.getsize(path) for path in paths)
+                rendered_pages += 1
+                page_bytes = rendered_bytes // rendered_pages
+                if job is not None:
+                    job.record_page(page_num, layers)
+            yield page_num, layers
+    finally:
+        if own_pool is not None:
+            if capture is not None and not in_flight:
+                # Процессы пула сохраняют последнюю часть профиля при выходе, а terminate их убивает
+                own_pool.close()
+                own_pool.join()
+            else:
+                own_pool.terminate()
+            if backend == "thread":
+                # Документы и сэмплеры потоков живут в этом процессе и закрываются явно
+                close_source()
+                if capture is not None:
+                    finish_worker_profiles()
+        else:
+            # Страницы, которые уже не нужны (ошибка или отмена), в общем пуле просто дорабатывают
+            in_flight.clear()
+
+def layer_paths(layers):
+    return [path for path, _ in layers] if layers else []
+
+def insert_rendered_page(new_doc, layers, a4_width_pt, a4_height_pt):
+    # С пулом потоков страницы вставляются, пока потоки рендерят следующие
+    with FITZ_LOCK:
+        new_page = new_doc.new_page(width=a4_width_pt, height=a4_height_pt)
+        # Слои: растр всего листа или скан в исходном виде и прозрачный декор поверх
+        for layer_path, layer_rect in layers:
+            rect = fitz.Rect(layer_rect) if layer_rect else fitz.Rect(0, 0, a4_width_pt, a4_height_pt)
+            new_page.insert_image(rect, filename=layer_path)
+
+def apply_scan_effect(window, pdf_path, output_pdf=None, job=None, profile=None):
+    """Собирает output_pdf из отрендеренных страниц pdf_path; последняя страница копируется как есть.
+
+    profile — профиль рендеринга (имя или словарь), по умолчанию выбранный в окне.
+
+    Вставленные в документ слои сразу удаляются. С job они удаляются только после контрольной
+    точки (каждые CHECKPOINT_PAGES страниц или когда слои заняли половину квоты), чтобы
+    после сбоя продолжить с последней сохранённой страницы.
+    """
+    try:
+        return run_steps(scan_effect_steps(window, pdf_path, output_pdf, job, profile))
+    except Exception as e:
+        print(f"[!] Ошибка при создании эффекта сканирования: {e}")
+        window.progress_bar.setVisible(False)
+        return pdf_path
+
+def scan_effect_steps(window, pdf_path, output_pdf=None, job=None, profile=None):
+    """apply_scan_effect по шагам, без перехвата ошибок: отдаёт номер каждой вставленной страницы.
+
+    Страница, которую не удалось обработать, в окне пропускается; если у window задан
+    require_all_pages (демон горячих папок, без оператора), это ошибка.
+    """
+    if output_pdf is None:
+        output_pdf = pdf_path
+    workspace = job.scratch if job is not None else session_workspace(window)
+    profile = current_render_profile(window, profile)
+    a4_width_pt = A4_WIDTH_PT
+    a4_height_pt = A4_HEIGHT_PT
+    with FITZ_LOCK:
+        doc = fitz.open(pdf_path)
+        page_count = len(doc) - 1
+    progress = progress_tracker(window)
+    progress.plan("save", page_count + 1)
+    if page_count == 0:
+        with FITZ_LOCK:
+            new_doc = fitz.open()
+            new_doc.insert_pdf(doc)
+            save_pdf(new_doc, output_pdf)
+            new_doc.close()
+            doc.close()
+        window.progress_bar.setVisible(False)
+        return output_pdf
+    with FITZ_LOCK:
+        new_doc, start_page = job.open_checkpoint() if job is not None else (fitz.open(), 0)
+    inserted = []
+    for page_num, layers in render_scan_pages(window, workspace, pdf_path, page_count, profile, a4_width_pt,
+                                              a4_height_pt, window.first_page_count, start_page=start_page,
+                                              job=job):
+        if layers:
+            insert_rendered_page(new_doc, layers, a4_width_pt, a4_height_pt)
+            inserted.extend(layer_paths(layers))
+        elif getattr(window, "require_all_pages", False):
+            raise RuntimeError(f"Не удалось обработать страницу {page_num + 1}")
+        if job is None:
+            workspace.remove(inserted)
+            inserted = []
+        elif page_num + 1 < page_count and (
+                (page_num + 1 - start_page) % CHECKPOINT_PAGES == 0
+                or not workspace.has_room(workspace.quota_bytes // 2)):
+            with FITZ_LOCK:
+                new_doc = job.save_checkpoint(new_doc, page_num + 1)
+            workspace.remove(inserted)
+            inserted = []
+        yield page_num
+    temp_output = output_pdf + ".tmp"
+    with FITZ_LOCK:
         if len(doc) > 0:
             new_doc.insert_pdf(doc, from_page=len(doc) - 1, to_page=len(doc) - 1)
-        temp_output = output_pdf + ".tmp"
-        new_doc.save(temp_output)
+        save_pdf(new_doc, temp_output)
+        saved_pages = len(new_doc)
         new_doc.close()
         doc.close()
-        time.sleep(0.3)
-        if os.path.exists(output_pdf):
-            try:
-                os.remove(output_pdf)
-            except Exception as e:
-                print(f"[!] Не удалось удалить старый файл: {e}")
-        os.replace(temp_output, output_pdf)
-        for temp_img_path in temp_images:
-            if temp_img_path and os.path.exists(temp_img_path):
-                try:
-                    os.remove(temp_img_path)
-                except Exception as e:
-                    print(f"[!] Ошибка при удалении временного файла {temp_img_path}: {e}")
-        window.temp_file_path = [f for f in window.temp_file_path if f not in temp_images]
-        window.progress_bar.setVisible(False)
-        return output_pdf
-    except Exception as e:
-        print(f"[!] Ошибка при создании эффекта сканирования: {e}")
-        window.progress_bar.setVisible(False)
-        return pdf_path
\ No newline at end of file
+    progress.advance("save", saved_pages)
+    time.sleep(0.3)
+    if os.path.exists(output_pdf):
+        try:
+            os.remove(output_pdf)
+        except Exception as e:
+            print(f"[!] Не удалось удалить старый файл: {e}")
+    os.replace(temp_output, output_pdf)
+    workspace.remove(inserted)
+    window.progress_bar.setVisible(False)
+    return output_pdf
@@ -0,0 +1,15 @@
+"""Общая блокировка вызовов PyMuPDF для потоков одного процесса.
+
+PyMuPDF не потокобезопасен даже с отдельным документом на поток: у MuPDF один контекст
+на процесс. Сейчас его вызовы и так идут под GIL, но порядок гарантирует эта блокировка,
+а не детали сборки. Её берут все, кто вызывает MuPDF в процессе окна: потоки рендеринга,
+миниатюр и подготовки файлов, а также код в потоке окна (объединение, сохранение,
+дополнение документа, предпросмотр) — во время сохранения окно обрабатывает события,
+и предпросмотр или добавление файлов остаются доступны. Под ней держатся только вызовы
+MuPDF (открытие, растеризация, вставка страниц, запись); работа Pillow с готовым растром
+идёт без неё и отпускает GIL, поэтому потоки рендеринга (DOCSTITCHER_RENDER_BACKEND=thread)
+действительно работают параллельно.
+"""
+import threading
+
+FITZ_LOCK = threading.RLock()
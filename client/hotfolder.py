@@ -0,0 +1,325 @@
+"""Демон горячих папок: собирает пакеты, которые сканеры складывают в отслеживаемые каталоги.
+
+Каждая подпапка отслеживаемого каталога — один пакет. Когда состав и размеры её файлов
+не меняются stable секунд, файлы сортируются по правилу имён и проходят тот же конвейер,
+что и "Объединить" в окне (stitch_job_steps), с заданными лентой, Ч/Б и профилем.
+Готовый PDF кладётся в каталог результатов, пакет переносится в .done. Если не удалось
+преобразовать или объединить хотя бы один файл или обработать хотя бы одну страницу, пакет
+переносится в .failed: без оператора неполный документ не должен уйти дальше как готовый.
+
+Пакеты ведутся по очереди в одном потоке: страницы всех пакетов рендерит общий пул
+процессов, а PyMuPDF в этом процессе не используется из нескольких потоков сразу.
+Каталоги отслеживаются опросом: он одинаково работает на Windows, Linux и сетевых дисках.
+
+Запуск из корня репозитория; client нужен и в PYTHONPATH, потому что client_utils
+импортирует config без пакета (Windows: set PYTHONPATH=client):
+
+    PYTHONPATH=client python -m client.hotfolder --watch D:/scans --output D:/stitched --ribbon Слева --bw
+"""
+import argparse
+import os
+import re
+import shutil
+import sys
+import time
+from collections import deque
+from multiprocessing import Pool
+
+from client.client_utils import get_max_workers
+from client.config import RENDER_PROFILE
+from client.file_processing import white_list, stitch_job_steps, remove_temp_files, decoration_assets
+from client.jobs import StitchJob, collect_stale_jobs, find_interrupted_jobs
+from client.progress import format_eta
+from client.workspace import workspace_root, collect_stale_workspaces
+
+HOTFOLDER_JOBS_ROOT = os.path.join(workspace_root(), "hotfolder-jobs")
+DONE_DIR = ".done"
+FAILED_DIR = ".failed"
+# Временные файлы, которые сканеры и Word держат рядом, пока пишут пакет
+PARTIAL_SUFFIXES = (".tmp", ".part", ".crdownload")
+PARTIAL_PREFIXES = ("~$", ".")
+STATS_INTERVAL_S = 60
+
+def natural_key(name):
+    """'scan2.jpg' раньше 'scan10.jpg': числа в имени сравниваются как числа."""
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r"(\d+)", name)]
+
+ORDER_RULES = {
+    "natural": lambda entry: natural_key(entry.name),
+    "name": lambda entry: entry.name.lower(),
+    "mtime": lambda entry: (entry.stat().st_mtime_ns, natural_key(entry.name)),
+}
+
+class PresetValue:
+    """Настройка с интерфейсом виджета окна, который читает конвейер file_processing."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def currentText(self):
+        return self.value
+
+    def isChecked(self):
+        return self.value
+
+class NullProgress:
+    def setVisible(self, visible):
+        pass
+
+    def setValue(self, value):
+        pass
+
+class BundleRun:
+    """Один пакет в работе; заменяет окно для stitch_job_steps, как PreprocessService для convert_*."""
+
+    def __init__(self, folder, job, render_pool):
+        self.folder = folder
+        self.job = job
+        self.render_pool = render_pool
+        self.require_all_pages = True
+        self.ribbon_position = PresetValue(job.params["ribbon_position"])
+        self.checkbox_bw_first = PresetValue(job.params["checkbox_bw"])
+        self.progress_bar = NullProgress()
+        self.temp_file_path = []
+        self.workspace = None
+        self.file_lst = job.inputs
+        self.first_page_count = 0
+        self.progress = None
+        self.started = time.perf_counter()
+        self.steps = stitch_job_steps(self, job)
+
+    def update_progress(self, fraction, eta_seconds=None):
+        pass
+
+    def close(self):
+        self.steps.close()
+        remove_temp_files(self)
+        if self.workspace is not None:
+            self.workspace.cleanup()
+
+class HotFolderDaemon:
+    def __init__(self, watch_dirs, output_dir, ribbon_position="Сверху", checkbox_bw=False,
+                 render_profile=RENDER_PROFILE, order="natural", max_bundles=2, poll_interval=2.0,
+                 stable_seconds=10.0):
+        self.watch_dirs = [os.path.abspath(path) for path in watch_dirs]
+        self.output_dir = os.path.abspath(output_dir)
+        self.params = {"ribbon_position": ribbon_position, "checkbox_bw": checkbox_bw,
+                       "render_profile": render_profile}
+        self.order_key = ORDER_RULES[order]
+        self.max_bundles = max_bundles
+        self.poll_interval = poll_interval
+        self.stable_seconds = stable_seconds
+        # Папка -> (снимок содержимого, когда он последний раз изменился)
+        self.snapshots = {}
+        self.waiting = deque()
+        self.active = deque()
+        self.render_pool = None
+        self.stats = {"bundles": 0, "failed": 0, "pages": 0, "files": 0}
+        self.started = time.time()
+        self.last_stats = self.started
+
+    # Поиск готовых пакетов
+
+    def bundle_files(self, folder):
+        entries = []
+        for entry in os.scandir(folder):
+            if not entry.is_file() or entry.name.startswith(PARTIAL_PREFIXES):
+                continue
+            if entry.name.lower().endswith(tuple(white_list)):
+                entries.append(entry)
+        return [entry.path for entry in sorted(entries, key=self.order_key)]
+
+    def snapshot(self, folder):
+        items = []
+        for entry in os.scandir(folder):
+            if entry.is_file():
+                stat = entry.stat()
+                items.append((entry.name, stat.st_size, stat.st_mtime_ns))
+        return tuple(sorted(items))
+
+    def busy_folders(self):
+        return {run.folder for run in self.active} | set(self.waiting)
+
+    def scan(self):
+        now = time.monotonic()
+        busy = self.busy_folders()
+        seen = set()
+        for watch_dir in self.watch_dirs:
+            try:
+                folders = [entry.path for entry in os.scandir(watch_dir)
+                           if entry.is_dir() and not entry.name.startswith(".")]
+            except OSError as e:
+                print(f"[!] Не удалось прочитать {watch_dir}: {e}")
+                continue
+            for folder in folders:
+                seen.add(folder)
+                if folder in busy:
+                    continue
+                try:
+                    snapshot = self.snapshot(folder)
+                except OSError:
+                    continue
+                if not snapshot:
+                    self.snapshots.pop(folder, None)
+                    continue
+                previous = self.snapshots.get(folder)
+                if previous is None or previous[0] != snapshot:
+                    self.snapshots[folder] = (snapshot, now)
+                    continue
+                has_partial = any(name.lower().endswith(PARTIAL_SUFFIXES) or name.startswith("~$")
+                                  for name, _, _ in snapshot)
+                if not has_partial and now - previous[1] >= self.stable_seconds:
+                    del self.snapshots[folder]
+                    self.waiting.append(folder)
+                    print(f"[*] Пакет готов к обработке: {folder}")
+        for folder in list(self.snapshots):
+            if folder not in seen:
+                del self.snapshots[folder]
+
+    # Обработка
+
+    def output_path(self, folder):
+        base_name = os.path.basename(folder)
+        output_file = os.path.join(self.output_dir, f"{base_name}.pdf")
+        counter = 2
+        while os.path.exists(output_file):
+            output_file = os.path.join(self.output_dir, f"{base_name} ({counter}).pdf")
+            counter += 1
+        return output_file
+
+    def start_bundle(self, folder):
+        inputs = self.bundle_files(folder)
+        if not inputs:
+            print(f"[!] В пакете нет поддерживаемых файлов: {folder}")
+            self.archive(folder, FAILED_DIR)
+            return
+        params = dict(self.params, bundle=folder)
+        job = StitchJob.create(inputs, self.output_path(folder), params, root=HOTFOLDER_JOBS_ROOT)
+        self.active.append(BundleRun(folder, job, self.render_pool))
+        self.stats["files"] += len(inputs)
+
+    def resume_interrupted(self):
+        for job in find_interrupted_jobs(HOTFOLDER_JOBS_ROOT):
+            folder = job.params.get("bundle")
+            print(f"[*] Продолжение прерванного пакета: {folder}")
+            self.active.append(BundleRun(folder, job, self.render_pool))
+
+    def step(self):
+        """Один шаг первого пакета в очереди (одна страница); возвращает False, если делать нечего."""
+        while self.waiting and len(self.active) < self.max_bundles:
+            folder = self.waiting.popleft()
+            try:
+                self.start_bundle(folder)
+            except Exception as e:
+                print(f"[!] Не удалось начать пакет {folder}: {e}")
+                self.stats["failed"] += 1
+        if not self.active:
+            return False
+        run = self.active.popleft()
+        try:
+            next(run.steps)
+            self.active.append(run)
+        except StopIteration as stop:
+            self.finish_bundle(run, stop.value)
+        except Exception as e:
+            print(f"[!] Ошибка обработки пакета {run.folder}: {e}")
+            self.finish_bundle(run, None)
+        return True
+
+    def finish_bundle(self, run, output_file):
+        run.close()
+        elapsed = time.perf_counter() - run.started
+        if output_file is None:
+            self.stats["failed"] += 1
+            if not run.job.finished:
+                run.job.remove()
+            self.archive(run.folder, FAILED_DIR)
+            print(f"[!] Пакет не собран: {run.folder}")
+            return
+        self.stats["bundles"] += 1
+        # Страницы итогового документа: шаги не считают последнюю, которая копируется как есть
+        self.stats["pages"] += sum(run.job.page_counts)
+        self.archive(run.folder, DONE_DIR)
+        print(f"[+] Пакет {os.path.basename(run.folder)} собран за {elapsed:.1f} с: {output_file}")
+
+    def archive(self, folder, target_name):
+        if folder is None or not os.path.isdir(folder):
+            return
+        target_dir = os.path.join(os.path.dirname(folder), target_name)
+        os.makedirs(target_dir, exist_ok=True)
+        target = os.path.join(target_dir, os.path.basename(folder))
+        if os.path.exists(target):
+            target += time.strftime("-%Y%m%d-%H%M%S")
+        try:
+            shutil.move(folder, target)
+        except OSError as e:
+            print(f"[!] Не удалось перенести пакет {folder}: {e}")
+
+    def report_stats(self, force=False):
+        now = time.time()
+        if not force and now - self.last_stats < STATS_INTERVAL_S:
+            return
+        self.last_stats = now
+        minutes = max(now - self.started, 1e-9) / 60
+        stats = self.stats
+        # Пакеты идут по очереди через общий пул, поэтому их остатки складываются
+        etas = [run.progress.eta() for run in self.active if run.progress is not None]
+        eta = sum(value for value in etas if value is not None)
+        print(f"[*] Пакетов: {stats['bundles']} (ошибок: {stats['failed']}), файлов: {stats['files']}, "
+              f"страниц: {stats['pages']} · {stats['bundles'] / minutes:.1f} пакетов/мин, "
+              f"{stats['pages'] / minutes:.0f} стр/мин · в работе: {len(self.active)}, "
+              f"в очереди: {len(self.waiting)}" + (f", осталось ~{format_eta(eta)}" if eta else ""))
+
+    def run(self, once=False):
+        """Основной цикл; once=True обрабатывает то, что уже лежит в папках, и завершается."""
+        missing = [path for path in decoration_assets() if not os.path.isfile(path)]
+        if missing:
+            raise FileNotFoundError(f"Нет картинок оформления: {', '.join(missing)}")
+        os.makedirs(self.output_dir, exist_ok=True)
+        collect_stale_workspaces()
+        collect_stale_jobs(HOTFOLDER_JOBS_ROOT)
+        with Pool(processes=get_max_workers(0)) as self.render_pool:
+            self.resume_interrupted()
+            next_scan = 0
+            try:
+                while True:
+                    if time.monotonic() >= next_scan:
+                        self.scan()
+                        next_scan = time.monotonic() + self.poll_interval
+                    if not self.step():
+                        if once and not self.snapshots and not self.waiting:
+                            break
+                        time.sleep(self.poll_interval)
+                    self.report_stats()
+            except KeyboardInterrupt:
+                print("[*] Остановка: незавершённые пакеты продолжатся при следующем запуске")
+            finally:
+                for run in self.active:
+                    run.steps.close()
+                    run.job.release()
+                self.report_stats(force=True)
+
+def main():
+    parser = argparse.ArgumentParser(description="Сборка пакетов из горячих папок")
+    parser.add_argument("--watch", action="append", required=True, help="Отслеживаемый каталог (можно несколько)")
+    parser.add_argument("--output", required=True, help="Каталог для готовых PDF")
+    parser.add_argument("--ribbon", default="Сверху", choices=["Сверху", "Слева", "По середине"])
+    parser.add_argument("--bw", action="store_true", help="Первый документ пакета в Ч/Б")
+    parser.add_argument("--profile", default=RENDER_PROFILE, help="Профиль рендеринга: draft, standard, archival")
+    parser.add_argument("--order", default="natural", choices=sorted(ORDER_RULES), help="Порядок файлов в пакете")
+    parser.add_argument("--bundles", type=int, default=2, help="Сколько пакетов обрабатывать одновременно")
+    parser.add_argument("--poll", type=float, default=2.0, help="Период опроса каталогов, с")
+    parser.add_argument("--stable", type=float, default=10.0, help="Сколько секунд пакет не должен меняться")
+    parser.add_argument("--once", action="store_true", help="Обработать готовые пакеты и выйти")
+    args = parser.parse_args()
+    daemon = HotFolderDaemon(args.watch, args.output, args.ribbon, args.bw, args.profile, args.order,
+                             args.bundles, args.poll, args.stable)
+    try:
+        daemon.run(once=args.once)
+    except FileNotFoundError as e:
+        print(f"[!] {e}")
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
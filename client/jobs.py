@@ -0,0 +1,244 @@
+import json
+import os
+import shutil
+import time
+import uuid
+
+import pymupdf as fitz
+from PyQt5.QtCore import QLockFile
+
+from client.workspace import Workspace, workspace_root
+
+JOBS_ROOT = os.path.join(workspace_root(), "jobs")
+# Незавершённые задачи старше этого срока не предлагаются к продолжению и удаляются
+JOB_MAX_AGE_DAYS = 7
+JOURNAL_NAME = "journal.jsonl"
+LOCK_NAME = "job.lock"
+
+class StitchJob:
+    """Задача объединения с журналом в собственном рабочем каталоге.
+
+    Журнал — файл JSON-строк, каждая запись дописывается и сбрасывается на диск сразу:
+    start (входные файлы, итоговый файл, параметры), converted (PDF входного файла),
+    merged (число страниц по документам), page (слои готовой страницы), checkpoint (сколько
+    страниц уже собрано в partial.pdf), done.
+    После сбоя StitchJob.load восстанавливает состояние, и уже сделанная работа не повторяется.
+    Пока задача выполняется, каталог занят QLockFile: блокировка умершего процесса считается
+    устаревшей, поэтому после падения задачу можно подхватить при следующем запуске.
+    """
+
+    def __init__(self, workspace):
+        self.workspace = workspace
+        self.job_id = os.path.basename(workspace)
+        self.inputs = []
+        self.output = None
+        self.params = {}
+        self.created = None
+        self.converted = {}
+        self.page_counts = None
+        self.pages = {}
+        self.checkpoint = None
+        self.finished = False
+        self._scratch = None
+        self.lock = QLockFile(os.path.join(workspace, LOCK_NAME))
+        self.lock.setStaleLockTime(0)
+
+    @property
+    def journal_path(self):
+        return os.path.join(self.workspace, JOURNAL_NAME)
+
+    @property
+    def merged_path(self):
+        return os.path.join(self.workspace, "merged.pdf")
+
+    @property
+    def pages_dir(self):
+        return os.path.join(self.workspace, "pages")
+
+    @property
+    def inputs_dir(self):
+        return os.path.join(self.workspace, "inputs")
+
+    @property
+    def partial_path(self):
+        return os.path.join(self.workspace, "partial.pdf")
+
+    @property
+    def scratch(self):
+        """Workspace каталога слоёв страниц: по его квоте пул рендеринга придерживает страницы."""
+        if self._scratch is None:
+            self._scratch = Workspace(self.pages_dir)
+        return self._scratch
+
+    @classmethod
+    def create(cls, inputs, output, params, root=JOBS_ROOT):
+        workspace = os.path.join(root, time.strftime("%Y%m%d-%H%M%S-") + uuid.uuid4().hex[:8])
+        os.makedirs(os.path.join(workspace, "pages"))
+        os.makedirs(os.path.join(workspace, "inputs"))
+        job = cls(workspace)
+        if not job.lock.tryLock(0):
+            raise RuntimeError(f"Не удалось занять рабочий каталог {workspace}")
+        job.inputs = list(inputs)
+        job.output = output
+        job.params = dict(params)
+        job.created = time.time()
+        job._append({"event": "start", "inputs": job.inputs, "output": output, "params": job.params,
+                     "created": job.created})
+        print(f"[*] Задача {job.job_id}: {len(job.inputs)} файл(ов) -> {output}")
+        return job
+
+    @classmethod
+    def load(cls, workspace):
+        job = cls(workspace)
+        with open(job.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    # Строка, недописанная в момент сбоя
+                    continue
+                job._apply(record)
+        if job.created is None:
+            raise ValueError(f"В журнале {job.journal_path} нет записи о начале задачи")
+        return job
+
+    def _apply(self, record):
+        event = record.get("event")
+        if event == "start":
+            self.inputs = record["inputs"]
+            self.output = record["output"]
+            self.params = record["params"]
+            self.created = record["created"]
+        elif event == "converted":
+            self.converted[record["index"]] = record["pdf"]
+        elif event == "merged":
+            self.page_counts = record["page_counts"]
+        elif event == "page":
+            self.pages[record["page"]] = [tuple(layer) for layer in record["layers"]]
+        elif event == "checkpoint":
+            self.checkpoint = (record["next_page"], record["doc_pages"])
+        elif event == "done":
+            self.finished = True
+
+    def _append(self, record):
+        with open(self.journal_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def try_lock(self):
+        return self.lock.tryLock(0)
+
+    def converted_pdf(self, index):
+        pdf_path = self.converted.get(index)
+        return pdf_path if pdf_path and os.path.exists(pdf_path) else None
+
+    def record_converted(self, index, source_path, pdf_path, move=False):
+        """Запоминает PDF входного файла; временный PDF переносится (move) или копируется в рабочий каталог."""
+        if os.path.abspath(pdf_path) != os.path.abspath(source_path):
+            stored_path = os.path.join(self.inputs_dir, f"{index:04d}.pdf")
+            if move:
+                shutil.move(pdf_path, stored_path)
+            else:
+                shutil.copyfile(pdf_path, stored_path)
+            pdf_path = stored_path
+        self.converted[index] = pdf_path
+        self._append({"event": "converted", "index": index, "pdf": pdf_path})
+        return pdf_path
+
+    def record_merged(self, page_counts):
+        self.page_counts = list(page_counts)
+        self._append({"event": "merged", "page_counts": self.page_counts})
+
+    def completed_pages(self, page_count):
+        """{номер страницы: слои} для уже отрендеренных страниц, файлы которых на месте."""
+        return {
+            page: layers for page, layers in self.pages.items()
+            if page < page_count and all(os.path.exists(path) for path, _ in layers)
+        }
+
+    def record_page(self, page_num, layers):
+        self.pages[page_num] = layers
+        self._append({"event": "page", "page": page_num, "layers": [list(layer) for layer in layers]})
+
+    def save_checkpoint(self, doc, next_page):
+        """Сохраняет уже собранные страницы (все до next_page) в partial.pdf.
+
+        Первый раз документ сохраняется целиком и открывается заново из файла, дальше
+        дописывается инкрементально. Возвращает документ, с которым работать дальше.
+        """
+        if doc.name == self.partial_path and doc.can_save_incrementally():
+            doc.saveIncr()
+        else:
+            temp_path = self.partial_path + ".tmp"
+            doc.save(temp_path)
+            doc.close()
+            os.replace(temp_path, self.partial_path)
+            doc = fitz.open(self.partial_path)
+        self.checkpoint = (next_page, len(doc))
+        self._append({"event": "checkpoint", "next_page": next_page, "doc_pages": len(doc)})
+        return doc
+
+    def open_checkpoint(self):
+        """(документ, следующая страница) из последней контрольной точки или (новый документ, 0)."""
+        if self.checkpoint is not None and os.path.exists(self.partial_path):
+            next_page, doc_pages = self.checkpoint
+            try:
+                doc = fitz.open(self.partial_path)
+                if len(doc) > doc_pages:
+                    # Инкрементальная запись успела закончиться, а запись в журнал — нет
+                    doc.delete_pages(from_page=doc_pages, to_page=len(doc) - 1)
+                if len(doc) == doc_pages:
+                    print(f"[*] Задача {self.job_id}: продолжение со страницы {next_page + 1}")
+                    return doc, next_page
+                doc.close()
+            except Exception as e:
+                print(f"[!] Контрольная точка {self.partial_path} повреждена: {e}")
+        return fitz.open(), 0
+
+    def finish(self):
+        self._append({"event": "done"})
+        self.finished = True
+        self.remove()
+
+    def release(self):
+        self.lock.unlock()
+
+    def remove(self):
+        self.lock.unlock()
+        shutil.rmtree(self.workspace, ignore_errors=True)
+
+def list_jobs(root=JOBS_ROOT):
+    if not os.path.isdir(root):
+        return []
+    return sorted(entry.path for entry in os.scandir(root) if entry.is_dir())
+
+def collect_stale_jobs(root=JOBS_ROOT, max_age_days=JOB_MAX_AGE_DAYS):
+    """Удаляет завершённые, повреждённые и слишком старые рабочие каталоги; возвращает число удалённых."""
+    removed = 0
+    deadline = time.time() - max_age_days * 24 * 3600
+    for workspace in list_jobs(root):
+        try:
+            job = StitchJob.load(workspace)
+            stale = job.finished or job.created < deadline
+        except (OSError, ValueError, KeyError):
+            job = StitchJob(workspace)
+            stale = os.path.getmtime(workspace) < deadline or not os.path.exists(job.journal_path)
+        if stale and job.try_lock():
+            job.remove()
+            removed += 1
+    if removed:
+        print(f"[*] Удалено устаревших рабочих каталогов: {removed}")
+    return removed
+
+def find_interrupted_jobs(root=JOBS_ROOT):
+    """Незавершённые задачи, которые никто не выполняет; каждая возвращается уже заблокированной."""
+    jobs = []
+    for workspace in list_jobs(root):
+        try:
+            job = StitchJob.load(workspace)
+        except (OSError, ValueError, KeyError):
+            continue
+        if not job.finished and job.try_lock():
+            jobs.append(job)
+    return jobs
@@ -0,0 +1,57 @@
+import math
+import time
+
+import jwt
+
+from client.config import SECRET_KEY
+
+LEASE_VALID = "valid"
+LEASE_GRACE = "grace"
+LEASE_EXPIRED = "expired"
+LEASE_INVALID = "invalid"
+
+def read_lease(token):
+    """Проверяет подпись токена локально и возвращает его содержимое (None, если токен подделан)."""
+    if not token:
+        return None
+    try:
+        return jwt.decode(token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
+    except jwt.InvalidTokenError:
+        return None
+
+def lease_state(payload, now=None):
+    """Состояние аренды без обращения к серверу: valid, grace, expired или invalid."""
+    if not payload:
+        return LEASE_INVALID
+    now = time.time() if now is None else now
+    license_expires_at = payload.get("license_expires_at")
+    if license_expires_at is not None and now >= license_expires_at:
+        return LEASE_EXPIRED
+    exp = payload.get("exp")
+    if exp is None or now < exp:
+        return LEASE_VALID
+    # Токены, выданные до появления аренды, не содержат grace_until
+    if now < payload.get("grace_until", exp):
+        return LEASE_GRACE
+    return LEASE_EXPIRED
+
+def is_lease_usable(payload, now=None):
+    return lease_state(payload, now) in (LEASE_VALID, LEASE_GRACE)
+
+def license_status_text(payload, now=None):
+    """Текст статуса лицензии для заголовка окна, вычисленный по аренде."""
+    if not is_lease_usable(payload, now):
+        return "Лицензия недействительна"
+    license_expires_at = payload.get("license_expires_at")
+    if payload.get("license_type_code") == "LICENSE-UNLIMITED" or license_expires_at is None:
+        return "Лицензировано"
+    now = time.time() if now is None else now
+    seconds_left = license_expires_at - now
+    days_left = math.ceil(seconds_left / (24 * 3600))
+    if seconds_left < 24 * 3600:
+        return "Лицензия истекает сегодня"
+    elif days_left > 7:
+        return "Лицензировано"
+    elif days_left == 1:
+        return "До конца лицензии 1 день"
+    return f"До конца лицензии {days_left} дн."
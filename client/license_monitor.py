@@ -0,0 +1,111 @@
+import random
+import time
+
+import requests
+from PyQt5.QtCore import QObject, QSettings, QThread, QTimer, pyqtSignal, pyqtSlot
+
+from client.client_utils import revalidate_token, REVALIDATION_OK, REVALIDATION_OFFLINE
+from client.lease import read_lease
+
+POLL_INTERVAL_MS = 300000
+BACKOFF_BASE_MS = 15000
+BACKOFF_MAX_MS = 1800000
+REQUEST_TIMEOUT = (5, 10)
+# Опрос делает до двух запросов (/verify и /refresh_token), каждый — подключение плюс чтение;
+# поток нельзя уничтожить посреди запроса, поэтому при закрытии ждём дольше худшего случая
+STOP_WAIT_MS = 2 * sum(REQUEST_TIMEOUT) * 1000 + 2000
+# ETag отправляем, только пока аренда свежая, иначе сервер должен выдать новую
+ETAG_LEASE_MIN_SECONDS = 7 * 24 * 3600
+
+class LicenseMonitor(QObject):
+    """Периодическая проверка лицензии в отдельном потоке.
+
+    Живёт в своём QThread, держит одну requests.Session с keep-alive и сообщает
+    окну о результате только через сигнал license_checked(статус, новый токен).
+    """
+    license_checked = pyqtSignal(str, object)
+    poll_requested = pyqtSignal()
+    stop_requested = pyqtSignal()
+
+    def __init__(self, interval_ms=POLL_INTERVAL_MS):
+        super().__init__()
+        self.interval_ms = interval_ms
+        self.session = None
+        self.timer = None
+        self.etag = None
+        self.etag_token = None
+        self.failures = 0
+        self.poll_requested.connect(self.poll)
+        self.stop_requested.connect(self.stop)
+
+    @pyqtSlot()
+    def start(self):
+        self.session = requests.Session()
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.poll)
+        self.poll()
+
+    @pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+        if self.session is not None:
+            self.session.close()
+            self.session = None
+        QThread.currentThread().quit()
+
+    @pyqtSlot()
+    def poll(self):
+        if self.session is None:
+            return
+        self.timer.stop()
+        license_token = QSettings("YourCompany", "DocStitcher").value("license_token")
+        if not license_token:
+            self.schedule(self.interval_ms)
+            return
+        status, new_token, etag = revalidate_token(license_token, timeout=REQUEST_TIMEOUT,
+                                                   session=self.session, etag=self.etag_for(license_token))
+        if status == REVALIDATION_OK:
+            self.failures = 0
+            self.etag = etag
+            self.etag_token = new_token or license_token
+            self.schedule(self.interval_ms)
+        elif status == REVALIDATION_OFFLINE:
+            self.failures += 1
+            self.schedule(self.backoff_ms())
+        else:
+            self.etag = None
+            self.schedule(self.interval_ms)
+        self.license_checked.emit(status, new_token)
+
+    def etag_for(self, license_token):
+        if self.etag is None or license_token != self.etag_token:
+            return None
+        payload = read_lease(license_token)
+        if not payload or payload.get("exp", 0) - time.time() < ETAG_LEASE_MIN_SECONDS:
+            return None
+        return self.etag
+
+    def backoff_ms(self):
+        """Экспоненциальная задержка с полным джиттером, чтобы клиенты не приходили к серверу разом."""
+        ceiling = min(BACKOFF_MAX_MS, BACKOFF_BASE_MS * 2 ** min(self.failures, 16))
+        return int(random.uniform(BACKOFF_BASE_MS, ceiling))
+
+    def schedule(self, delay_ms):
+        self.timer.start(delay_ms)
+
+def start_license_monitor(window, on_checked):
+    thread = QThread(window)
+    monitor = LicenseMonitor()
+    monitor.moveToThread(thread)
+    thread.started.connect(monitor.start)
+    thread.finished.connect(monitor.deleteLater)
+    monitor.license_checked.connect(on_checked)
+    thread.start(QThread.LowPriority)
+    return thread, monitor
+
+def stop_license_monitor(thread, monitor):
+    monitor.stop_requested.emit()
+    if not thread.wait(STOP_WAIT_MS):
+        print("[!] Проверка лицензии не завершилась вовремя")
@@ -3,195 +3,51 @@ import jwt
 from PyQt5.QtWidgets import QMessageBox, QInputDialog, QDialog, QLineEdit, QDialogButtonBox, QSpacerItem, QSizePolicy, \
     QWidget
 from PyQt5.QtCore import QSettings, Qt
-from datetime import datetime, timezone, timedelta
-from client.client_utils import get_device_id, deactivate_device, change_license
+from client.client_utils import get_device_id, deactivate_device, change_license, \
+    REVALIDATION_OK, REVALIDATION_REJECTED
+from client.lease import read_lease, is_lease_usable, license_status_text
 from config import *
 
 def update_license_status(window):
     settings = QSettings("YourCompany", "DocStitcher")
     license_token = settings.value("license_token")
     if license_token:
-        try:
-            response = requests.get(f"{SERVER_URL}/verify", headers={"Authorization": f"Bearer {license_token}"})
-            if response.status_code == 200:
-                payload = jwt.decode(license_token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
-                license_id = payload.get("license_id")
-                license_response = requests.get(f"{SERVER_URL}/license/{license_id}",
-                                               headers={"Authorization": f"Bearer {license_token}"})
-                if license_response.status_code == 200:
-                    license_data = license_response.json()
-                    expires_days = license_data.get("expires_days")
-                    created_at = datetime.fromisoformat(license_data.get("created_at"))
-                    now = datetime.now(timezone.utc)
-                    time_passed = now - created_at
-                    days_left = expires_days - time_passed.days if expires_days is not None else None
-                    time_left = timedelta(days=expires_days) - time_passed if expires_days is not None else None
-
-                    if license_data.get("license_type_code") == "LICENSE-UNLIMITED":
-                        window.license_status = "Лицензировано"
-                        window.setWindowTitle("DocStitcher (Лицензировано)")
-                    elif days_left is not None:
-                        if time_left.total_seconds() < 24 * 3600:  # Less than 24 hours
-                            window.license_status = "Лицензия истекает сегодня"
-                            window.setWindowTitle("DocStitcher (Лицензия истекает сегодня)")
-                        elif days_left > 7:
-                            window.license_status = "Лицензировано"
-                            window.setWindowTitle("DocStitcher (Лицензировано)")
-                        elif days_left == 1:
-                            window.license_status = "До конца лицензии 1 день"
-                            window.setWindowTitle("DocStitcher (До конца лицензии 1 день)")
-                        else:
-                            window.license_status = f"До конца лицензии {days_left} дн."
-                            window.setWindowTitle(f"DocStitcher (До конца лицензии {days_left} дн.)")
-                    else:
-                        window.license_status = "Лицензировано"
-                        window.setWindowTitle("DocStitcher (Лицензировано)")
-                else:
-                    window.license_status = "Лицензия недействительна"
-                    window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-            else:
-                window.license_status = "Лицензия недействительна"
-                window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-        except (jwt.InvalidTokenError, requests.RequestException) as e:
-            window.license_status = "Лицензия недействительна"
-            window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-            print(f"[!] Ошибка проверки лицензии: {e}")
+        window.license_status = license_status_text(read_lease(license_token))
     else:
         window.license_status = "Не активировано"
-        window.setWindowTitle("DocStitcher (Не активировано)")
+    window.setWindowTitle(f"DocStitcher ({window.license_status})")
     window.update_action_states()
 
-def check_license_periodically(window):
-    from run import WelcomeDialog
-    settings = QSettings("YourCompany", "DocStitcher")
-    device_id = get_device_id()
-    license_token = settings.value("license_token")
+def require_activation(window, settings):
+    from client.main_window import WelcomeDialog
+    window.license_status = "Лицензия недействительна"
+    window.setWindowTitle("DocStitcher (Лицензия недействительна)")
+    window.hide()
+    welcome_dialog = WelcomeDialog(settings, get_device_id())
+    if welcome_dialog.exec_() == QDialog.Accepted:
+        update_license_status(window)
+        window.show()
+        window.license_monitor.poll_requested.emit()
+    else:
+        window.close()
 
-    if not license_token:
-        window.license_status = "Не активировано"
-        window.setWindowTitle("DocStitcher (Не активировано)")
-        window.hide()
-        welcome_dialog = WelcomeDialog(settings, device_id)
-        if welcome_dialog.exec_() == QDialog.Accepted:
-            update_license_status(window)
-            window.show()
-        else:
-            window.close()
+def on_license_revalidated(window, status, new_token):
+    if not window.isVisible():
+        # Окно скрыто, пока открыт диалог активации
         return
-
-    try:
-        payload = jwt.decode(license_token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
-        exp_timestamp = payload.get("exp")
-        if exp_timestamp:
-            exp_datetime = datetime.fromtimestamp(exp_timestamp, tz=timezone.utc)
-            now = datetime.now(timezone.utc)
-            print(exp_datetime, now)
-            if (exp_datetime - now).days < 1:
-                response = requests.post(
-                    f"{SERVER_URL}/refresh_token",
-                    json={"token": license_token},
-                    timeout=10
-                )
-                if response.status_code == 200:
-                    new_token = response.json().get("access_token")
-                    settings.setValue("license_token", new_token)
-                    license_token = new_token
-                    print("[*] Токен успешно обновлён")
-                else:
-                    print(f"[!] Ошибка при обновлении токена: {response.status_code}")
-                    window.license_status = "Лицензия недействительна"
-                    window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-                    window.hide()
-                    welcome_dialog = WelcomeDialog(settings, device_id)
-                    if welcome_dialog.exec_() == QDialog.Accepted:
-                        update_license_status(window)
-                        window.show()
-                    else:
-                        window.close()
-                    return
-
-        response = requests.get(f"{SERVER_URL}/verify", headers={"Authorization": f"Bearer {license_token}"})
-        if response.status_code == 200:
-            response_data = response.json()
-            if response_data.get("status") == "updated":
-                # Сервер вернул новый токен, так как устройство привязано к другой лицензии
-                new_token = response_data.get("new_token")
-                if new_token:
-                    settings.setValue("license_token", new_token)
-                    license_token = new_token
-                    print("[*] Токен обновлён: устройство привязано к новой лицензии")
-
-            payload = jwt.decode(license_token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
-            license_id = payload.get("license_id")
-            license_response = requests.get(
-                f"{SERVER_URL}/license/{license_id}",
-                headers={"Authorization": f"Bearer {license_token}"}
-            )
-            if license_response.status_code == 200:
-                license_data = license_response.json()
-                expires_days = license_data.get("expires_days")
-                created_at = datetime.fromisoformat(license_data.get("created_at"))
-                now = datetime.now(timezone.utc)
-                time_passed = now - created_at
-                days_left = expires_days - time_passed.days if expires_days is not None else None
-                time_left = timedelta(days=expires_days) - time_passed if expires_days is not None else None
-
-                if time_left is not None and time_left.total_seconds() <= 0:
-                    window.license_status = "Лицензия истекает сегодня"
-                    window.setWindowTitle("DocStitcher (Лицензия истекает сегодня)")
-                    QMessageBox.critical(window, "Лицензия истекла",
-                                         "Ваша лицензия истекла. Пожалуйста, активируйте новую лицензию.")
-                    window.hide()
-                    welcome_dialog = WelcomeDialog(settings, device_id)
-                    if welcome_dialog.exec_() == QDialog.Accepted:
-                        update_license_status(window)
-                        window.show()
-                    else:
-                        window.close()
-                else:
-                    if days_left is None or days_left > 7:
-                        window.license_status = "Лицензировано"
-                        window.setWindowTitle("DocStitcher (Лицензировано)")
-                    elif time_left.total_seconds() < 24 * 3600:
-                        window.license_status = "Лицензия истекает сегодня"
-                        window.setWindowTitle("DocStitcher (Лицензия истекает сегодня)")
-                    elif days_left == 1:
-                        window.license_status = "До конца лицензии 1 день"
-                        window.setWindowTitle("DocStitcher (До конца лицензии 1 день)")
-                    else:
-                        window.license_status = f"До конца лицензии {days_left} дн."
-                        window.setWindowTitle(f"DocStitcher (До конца лицензии {days_left} дн.)")
-            else:
-                window.license_status = "Лицензия недействительна"
-                window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-                window.hide()
-                welcome_dialog = WelcomeDialog(settings, device_id)
-                if welcome_dialog.exec_() == QDialog.Accepted:
-                    update_license_status(window)
-                    window.show()
-                else:
-                    window.close()
-        else:
-            window.license_status = "Лицензия недействительна"
-            window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-            window.hide()
-            welcome_dialog = WelcomeDialog(settings, device_id)
-            if welcome_dialog.exec_() == QDialog.Accepted:
-                update_license_status(window)
-                window.show()
-            else:
-                window.close()
-    except (jwt.InvalidTokenError, requests.RequestException) as e:
-        print(f"[!] Ошибка проверки лицензии: {e}")
-        window.license_status = "Лицензия недействительна"
-        window.setWindowTitle("DocStitcher (Лицензия недействительна)")
-        window.hide()
-        welcome_dialog = WelcomeDialog(settings, device_id)
-        if welcome_dialog.exec_() == QDialog.Accepted:
-            update_license_status(window)
-            window.show()
-        else:
-            window.close()
+    settings = QSettings("YourCompany", "DocStitcher")
+    if status == REVALIDATION_OK:
+        if new_token:
+            settings.setValue("license_token", new_token)
+            settings.sync()
+        update_license_status(window)
+    elif status == REVALIDATION_REJECTED:
+        print("[!] Сервер отклонил лицензию")
+        require_activation(window, settings)
+    elif not is_lease_usable(read_lease(settings.value("license_token"))):
+        # Сервер недоступен: работаем по аренде, пока она не истечёт
+        print("[!] Аренда лицензии истекла, а сервер недоступен")
+        require_activation(window, settings)
 
 def deactivate_device_action(window):
     settings = QSettings("YourCompany", "DocStitcher")
@@ -307,12 +163,13 @@ def show_license_info(window):
     device_id = get_device_id()
     if license_token:
         try:
-            response = requests.get(f"{SERVER_URL}/verify", headers={"Authorization": f"Bearer {license_token}"})
+            response = requests.get(f"{SERVER_URL}/verify", headers={"Authorization": f"Bearer {license_token}"},
+                                    timeout=10)
             if response.status_code == 200:
                 payload = jwt.decode(license_token, SECRET_KEY, algorithms=["HS256"], options={"verify_exp": False})
                 license_id = payload.get("license_id")
                 license_response = requests.get(f"{SERVER_URL}/license/{license_id}",
-                                               headers={"Authorization": f"Bearer {license_token}"})
+                                               headers={"Authorization": f"Bearer {license_token}"}, timeout=10)
                 if license_response.status_code == 200:
                     license_data = license_response.json()
                     license_type_code = license_data.get("license_type_code")
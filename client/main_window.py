@@ -0,0 +1,489 @@
+"""Главное окно DocStitcher и окно активации; запуск приложения — main().
+
+Импортируется только из main() в run.py: процессы пула, которые при spawn заново
+выполняют run.py как __mp_main__, не загружают ни Qt, ни лицензирование, ни конвертеры.
+"""
+import os
+import sys
+import threading
+import importlib
+import requests
+from PyQt5.QtWidgets import (
+    QApplication, QWidget, QFileDialog, QPushButton, QVBoxLayout, QMessageBox,
+    QSpacerItem, QSizePolicy, QHBoxLayout, QProgressBar, QCheckBox, QLabel, QComboBox, QDialog, QLineEdit,
+    QToolButton, QMenu, QActionGroup
+)
+from PyQt5.QtGui import QIcon, QFont
+from PyQt5.QtCore import QSettings, QSize, Qt, QTimer
+from client.licensing import update_license_status, deactivate_device_action, on_change_license_clicked, \
+    show_license_info, on_license_revalidated
+from client.license_monitor import start_license_monitor, stop_license_monitor
+from client.preprocess import start_preprocess_service, stop_preprocess_service
+from client.file_list import FileListModel, FileListView, STATE_READY, STATE_FAILED
+from client.thumbnails import ThumbnailProvider, THUMBNAIL_MAX_PX
+from client.client_utils import resource_path, get_device_id, revalidate_token, activate_license, REVALIDATION_OK
+from client.lease import read_lease, is_lease_usable
+from client.config import SERVER_URL, RENDER_PROFILE, PROFILE_CAPTURE, RENDER_BACKEND
+from client.render_profiles import RENDER_PROFILES
+
+white_list = ['.doc', '.docx', '.pdf', '.jpg', '.jpeg', '.png']
+# Модули, которые прогреваются в фоне после показа окна. COM-конвертеры сюда не входят:
+# pythoncom инициализирует COM в импортирующем потоке
+PREWARM_MODULES = ["client.file_processing", "img2pdf"]
+
+def prewarm_modules():
+    for module_name in PREWARM_MODULES:
+        try:
+            importlib.import_module(module_name)
+        except Exception as e:
+            print(f"[!] Не удалось заранее загрузить {module_name}: {e}")
+
+class WelcomeDialog(QDialog):
+    def __init__(self, settings, device_id):
+        super().__init__()
+        self.settings = settings
+        self.device_id = device_id
+        self.setWindowTitle("DocStitcher")
+        self.setWindowIcon(QIcon(resource_path("assets/app_icon.png")))
+        self.setFixedSize(460, 260)
+        self.setStyleSheet("""
+            QLabel#subtitle {
+                color: #666666;
+                font-size: 12px;
+            }
+            QLineEdit {
+                padding: 8px;
+                font-size: 14px;
+                border: 1px solid #cccccc;
+                border-radius: 4px;
+            }
+            QPushButton {
+                padding: 8px 14px;
+                font-size: 13px;
+                background-color: #5a84b0;
+                color: white;
+                border: none;
+                border-radius: 5px;
+            }
+            QPushButton:hover {
+                background-color: #4a70a0;
+            }
+        """)
+        main_layout = QVBoxLayout()
+        main_layout.setContentsMargins(20, 20, 20, 20)
+        main_layout.setSpacing(12)
+        title = QLabel("Активация DocStitcher")
+        title.setFont(QFont("Segoe UI", 15, QFont.Bold))
+        title.setAlignment(Qt.AlignCenter)
+        subtitle = QLabel("Введите лицензионный ключ или активируйте пробный период")
+        subtitle.setObjectName("subtitle")
+        subtitle.setAlignment(Qt.AlignCenter)
+        main_layout.addWidget(title)
+        main_layout.addWidget(subtitle)
+        self.key_input = QLineEdit()
+        self.key_input.setPlaceholderText("Ключ активации")
+        self.key_input.setFixedWidth(300)
+        self.key_input.setAlignment(Qt.AlignLeft)
+        input_layout = QHBoxLayout()
+        input_layout.addStretch()
+        input_layout.addWidget(self.key_input)
+        input_layout.addStretch()
+        main_layout.addLayout(input_layout)
+        main_layout.addSpacerItem(QSpacerItem(20, 20, QSizePolicy.Minimum, QSizePolicy.Expanding))
+        button_layout = QHBoxLayout()
+        trial_button = QPushButton("Пробный период (2 дня)")
+        trial_button.clicked.connect(self.start_trial)
+        activate_button = QPushButton("Активировать лицензию")
+        activate_button.clicked.connect(self.activate_license)
+        button_layout.addStretch()
+        button_layout.addWidget(trial_button)
+        button_layout.addSpacing(20)
+        button_layout.addWidget(activate_button)
+        button_layout.addStretch()
+        main_layout.addLayout(button_layout)
+        self.setLayout(main_layout)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.key_input.setFocus(Qt.OtherFocusReason)
+
+    def start_trial(self):
+        try:
+            response = requests.post(
+                f"{SERVER_URL}/activate_trial",
+                data={"device_id": self.device_id},
+                headers={"Content-Type": "application/x-www-form-urlencoded"},
+                timeout=10
+            )
+            if response.status_code == 200:
+                token = response.json()["access_token"]
+                self.settings.setValue("license_token", token)
+                self.accept()
+            else:
+                error_detail = response.json().get("detail", "Ошибка активации пробного периода")
+                QMessageBox.critical(self, "Ошибка", f"Не удалось активировать пробный период: {error_detail}")
+        except requests.RequestException as e:
+            QMessageBox.critical(self, "Ошибка", f"Сервер недоступен или произошла ошибка соединения: {str(e)}")
+
+    def activate_license(self):
+        license_key = self.key_input.text().strip()
+        if license_key:
+            token = activate_license(license_key, self.device_id)
+            if token:
+                self.settings.setValue("license_token", token)
+                self.accept()
+        else:
+            QMessageBox.critical(self, "Ошибка", "Лицензионный ключ не введён")
+
+class MyWindow(QWidget):
+    def __init__(self):
+        super().__init__()
+        self.file_path = ""
+        self.temp_file_path = []
+        # Временный каталог сеанса (client.workspace), создаётся при первой конвертации
+        self.workspace = None
+        self.pdf_lst = []
+        self.first_page_count = 0
+        self.progress_lock = threading.Lock()
+        self.temp_file_lock = threading.Lock()
+        self.license_status = "Не активировано"
+        # Прогресс текущего объединения (client.progress), создаётся при запуске
+        self.progress = None
+        self.initUI()
+        # Первая проверка выполняется сразу, дальше монитор опрашивает сервер сам
+        self.license_thread, self.license_monitor = start_license_monitor(self, self.on_license_revalidated)
+        # Файлы конвертируются в фоне сразу после добавления в список
+        self.preprocess_thread, self.preprocess = start_preprocess_service(self)
+        self.preprocess.file_prepared.connect(self.on_file_prepared)
+        self.preprocess.digest_known.connect(self.on_digest_known)
+        self.file_model.files_added.connect(self.on_files_added)
+        self.file_model.files_removed.connect(self.on_files_removed)
+        QTimer.singleShot(0, self.prewarm_modules)
+        # Прерванные объединения предлагаются к продолжению, когда окно уже показано
+        QTimer.singleShot(500, self.resume_interrupted_jobs)
+
+    def initUI(self):
+        self.setWindowTitle("DocStitcher (Не активировано)")
+        self.setWindowIcon(QIcon(resource_path("assets/app_icon.png")))
+        self.setGeometry(100, 100, 450, 300)
+
+        license_button = QToolButton(self)
+        license_button.setText("Лицензия")
+        license_button.setToolTip("Взаимодействие с лицензией")
+
+        license_button.setPopupMode(QToolButton.InstantPopup)
+        license_button.setStyleSheet("""
+            QToolButton {
+                background-color: transparent;
+                color: #444;
+                font-size: 11px;
+                padding: 0px 0px;
+                border: 1px solid #bbb;
+                border-radius: 3px;
+                min-height: 15px;
+                min-width: 37px;
+                margin-top: -4px;
+            }
+            QToolButton:hover {
+                background-color: #f0f0f0;
+            }
+            QToolButton::menu-indicator {
+                image: none;
+            }
+        """)
+        license_menu = QMenu(license_button)
+        license_menu.setToolTipsVisible(True)
+
+        self.change_license_action = license_menu.addAction("Сменить лицензию")
+        self.deactivate_action = license_menu.addAction("Деактивировать устройство")
+        self.show_license_info_action = license_menu.addAction("Тип лицензии")
+        license_button.setMenu(license_menu)
+        self.change_license_action.setToolTip("Сменить лицензию группы устройств на другую")
+        self.deactivate_action.setToolTip("Деактивировать лицензию на текущем устройстве и освободить место лицензии")
+        self.show_license_info_action.setToolTip("Получить информацию о лицензии на этом устройстве")
+
+        self.deactivate_action.triggered.connect(self.deactivate_device_action)
+        self.change_license_action.triggered.connect(self.on_change_license_clicked)
+        self.show_license_info_action.triggered.connect(self.show_license_info)
+
+        service_button = QToolButton(self)
+        service_button.setText("Сервис")
+        service_button.setToolTip("Диагностика")
+        service_button.setPopupMode(QToolButton.InstantPopup)
+        service_button.setStyleSheet(license_button.styleSheet())
+        service_menu = QMenu(service_button)
+        service_menu.setToolTipsVisible(True)
+        # Профиль каждого сохранения пишется в файл speedscope (см. client/profiling.py)
+        self.profile_saves_action = service_menu.addAction("Профилировать сохранение")
+        self.profile_saves_action.setCheckable(True)
+        if PROFILE_CAPTURE:
+            self.profile_saves_action.setChecked(True)
+            self.profile_saves_action.setEnabled(False)
+            self.profile_saves_action.setToolTip("Включено переменной окружения DOCSTITCHER_PROFILE")
+        else:
+            settings = QSettings("YourCompany", "DocStitcher")
+            self.profile_saves_action.setChecked(settings.value("profile_saves", False, type=bool))
+            self.profile_saves_action.setToolTip("Записывать профиль каждого сохранения, чтобы разобрать медленную работу")
+        self.profile_saves_action.toggled.connect(self.on_profile_saves_toggled)
+        # Пул процессов или потоков для рендеринга страниц (см. select_render_backend)
+        backend_menu = service_menu.addMenu("Рендеринг страниц")
+        backend_group = QActionGroup(self)
+        self.render_backend = QSettings("YourCompany", "DocStitcher").value("render_backend", RENDER_BACKEND)
+        for name, label in (("auto", "Автоматически"), ("process", "Процессами"), ("thread", "Потоками")):
+            action = backend_menu.addAction(label)
+            action.setCheckable(True)
+            action.setData(name)
+            action.setChecked(name == self.render_backend)
+            backend_group.addAction(action)
+        backend_group.triggered.connect(self.on_render_backend_selected)
+        service_button.setMenu(service_menu)
+        self.file_model = FileListModel(self)
+        self.list_widget = FileListView(white_list, self)
+        self.list_widget.setModel(self.file_model)
+        self.list_widget.setIconSize(QSize(THUMBNAIL_MAX_PX, THUMBNAIL_MAX_PX))
+        self.list_widget.setUniformItemSizes(True)
+        self.thumbnails = ThumbnailProvider(self)
+        self.file_model.set_thumbnail_provider(self.thumbnails)
+        self.button1 = QPushButton("Выбрать файлы", self)
+        self.button1.clicked.connect(self.get_directory)
+        self.button3 = QPushButton("Очистить список", self)
+        self.button3.clicked.connect(self.clear)
+        self.button4 = QPushButton("Удалить выбранные", self)
+        self.button4.clicked.connect(self.remove_selected_item)
+        self.button5 = QPushButton("Объединить и сохранить", self)
+        self.button5.setToolTip("Файл будет сохранён в папке 'Итоговые документы' рядом с программой")
+        self.button5.clicked.connect(self.save)
+        self.button6 = QPushButton("Объединить и сохранить как", self)
+        self.button6.setToolTip("Ручной выбор местоположения и имени файла при сохранении итогового документа")
+        self.button6.clicked.connect(self.save_as)
+        self.button7 = QPushButton("Добавить в готовый документ", self)
+        self.button7.setToolTip("Дописать выбранные файлы в конец ранее собранного PDF без повторной обработки его страниц")
+        self.button7.clicked.connect(self.append_to_stitched)
+        self.button8 = QPushButton("Предпросмотр", self)
+        self.button8.setToolTip("Быстрый черновой просмотр итогового документа с лентой и точками без сохранения")
+        self.button8.clicked.connect(self.show_preview)
+        self.checkbox_bw_first = QCheckBox("Перевести оригинал в Ч/Б", self)
+        self.checkbox_bw_first.setChecked(False)
+        self.ribbon_position_label = QLabel("Расположение ленты:", self)
+        self.ribbon_position = QComboBox(self)
+        self.ribbon_position.addItems(["Сверху", "Слева", "По середине"])
+        self.ribbon_position.setCurrentIndex(0)
+        self.render_profile_label = QLabel("Качество:", self)
+        self.render_profile = QComboBox(self)
+        for name, profile in RENDER_PROFILES.items():
+            self.render_profile.addItem(f"{profile['label']} ({profile['dpi']} DPI)", name)
+        self.render_profile.setCurrentIndex(max(0, self.render_profile.findData(RENDER_PROFILE)))
+        self.render_profile.setToolTip("Черновик заметно быстрее для внутренних копий, архив — прежнее качество")
+        save_layout = QHBoxLayout()
+        save_layout.addWidget(self.button5)
+        save_layout.addWidget(self.button6)
+        save_layout.setSpacing(0)
+        self.progress_bar = QProgressBar(self)
+        self.progress_bar.setVisible(False)
+        self.progress_bar.setMinimum(0)
+        self.progress_bar.setMaximum(100)
+        main_layout = QVBoxLayout()
+        top_layout = QHBoxLayout()
+        top_layout.addWidget(license_button)
+        top_layout.addWidget(service_button)
+        top_layout.addStretch()
+        top_layout.setContentsMargins(0, 0, 0, 4)
+        main_layout.addLayout(top_layout)
+        main_layout.addWidget(self.button1)
+        main_layout.addLayout(save_layout)
+        main_layout.addWidget(self.button7)
+        main_layout.addWidget(self.button8)
+        main_layout.addWidget(self.button3)
+        main_layout.addWidget(self.button4)
+        main_layout.addWidget(self.list_widget)
+        main_layout.addWidget(self.progress_bar)
+        main_layout.addSpacerItem(QSpacerItem(20, 40, QSizePolicy.Minimum, QSizePolicy.Expanding))
+        checkbox_layout = QHBoxLayout()
+        checkbox_layout.addStretch()
+        checkbox_layout.addWidget(self.checkbox_bw_first)
+        checkbox_layout.addSpacing(20)
+        checkbox_layout.addWidget(self.ribbon_position_label)
+        checkbox_layout.addWidget(self.ribbon_position)
+        checkbox_layout.addSpacing(20)
+        checkbox_layout.addWidget(self.render_profile_label)
+        checkbox_layout.addWidget(self.render_profile)
+        checkbox_layout.addStretch()
+        main_layout.addLayout(checkbox_layout)
+        self.setLayout(main_layout)
+        self.update_license_status()
+
+        self.update_action_states()
+
+    def get_directory(self):
+        options = QFileDialog.Options()
+        options |= QFileDialog.ReadOnly
+        file_dialog = QFileDialog()
+        file_dialog.setOptions(options)
+        file_dialog.setFileMode(QFileDialog.ExistingFiles)
+        file_dialog.setViewMode(QFileDialog.Detail)
+        if file_dialog.exec_() == QFileDialog.Accepted:
+            paths = []
+            for file_path in file_dialog.selectedFiles():
+                if not file_path.lower().endswith(tuple(white_list)):
+                    print(f"[!] Неподдерживаемый формат файла: {file_path}")
+                    continue
+                normalized_path = os.path.normpath(file_path)
+                if os.path.exists(normalized_path):
+                    paths.append(normalized_path)
+                else:
+                    print(f"[!] Файл не найден: {normalized_path}")
+            self.file_model.add_files(paths)
+            self.file_path = os.path.dirname(self.file_lst[0]) if self.file_lst else ""
+            print(f"[+] {len(self.file_lst)} файл(ов) найден(о)!")
+
+    @property
+    def file_lst(self):
+        """Пути файлов в порядке списка."""
+        return self.file_model.paths()
+
+    def clear(self):
+        self.file_model.clear()
+        self.temp_file_path.clear()
+        self.progress_bar.setVisible(False)
+        print("[*] Очистка списка файлов")
+
+    def remove_selected_item(self):
+        rows = [index.row() for index in self.list_widget.selectionModel().selectedRows()]
+        removed = self.file_model.remove_rows(rows)
+        print(f"[*] Удалено {len(removed)} выбранных файлов")
+
+    def on_files_added(self, records):
+        for record in records:
+            self.preprocess.enqueue_requested.emit(record.path)
+
+    def on_files_removed(self, records):
+        for record in records:
+            self.preprocess.cancel_requested.emit(record.path)
+
+    def on_digest_known(self, path, digest):
+        # Миниатюра из кэша на диске показывается, пока файл ещё конвертируется
+        self.file_model.update_path(path, digest=digest)
+
+    def on_file_prepared(self, path, prepared):
+        if prepared is None:
+            self.file_model.update_path(path, state=STATE_FAILED)
+        else:
+            self.file_model.update_path(path, state=STATE_READY, size=prepared.size,
+                                        page_count=prepared.page_count, digest=prepared.digest,
+                                        pdf_path=prepared.pdf_path)
+
+    def update_license_status(self):
+        update_license_status(self)
+
+    def on_license_revalidated(self, status, new_token):
+        on_license_revalidated(self, status, new_token)
+
+    def closeEvent(self, event):
+        stop_license_monitor(self.license_thread, self.license_monitor)
+        stop_preprocess_service(self.preprocess_thread, self.preprocess)
+        self.thumbnails.stop()
+        if self.workspace is not None:
+            self.workspace.cleanup()
+        super().closeEvent(event)
+
+    def deactivate_device_action(self):
+        deactivate_device_action(self)
+
+    def on_profile_saves_toggled(self, checked):
+        QSettings("YourCompany", "DocStitcher").setValue("profile_saves", checked)
+        print(f"[*] Профилирование сохранения {'включено' if checked else 'выключено'}")
+
+    def on_render_backend_selected(self, action):
+        self.render_backend = action.data()
+        QSettings("YourCompany", "DocStitcher").setValue("render_backend", self.render_backend)
+        print(f"[*] Рендеринг страниц: {action.text().lower()}")
+
+    def on_change_license_clicked(self):
+        on_change_license_clicked(self)
+
+    def show_license_info(self):
+        show_license_info(self)
+
+    def update_action_states(self):
+        settings = QSettings("YourCompany", "DocStitcher")
+        payload = read_lease(settings.value("license_token"))
+        if is_lease_usable(payload):
+            self.deactivate_action.setEnabled(payload.get("license_type_code") != "LICENSE-TRIAL")
+            self.change_license_action.setEnabled(True)
+        else:
+            self.deactivate_action.setEnabled(False)
+            self.change_license_action.setEnabled(False)
+
+    # Конвертеры и рендеринг (PyMuPDF, COM) импортируются при первом
+    # использовании или фоновым прогревом после показа окна, а не при запуске
+    def save(self):
+        from client.file_processing import save
+        save(self)
+
+    def save_as(self):
+        from client.file_processing import save_as
+        save_as(self)
+
+    def show_preview(self):
+        from client.preview import show_preview
+        show_preview(self)
+
+    def append_to_stitched(self):
+        from client.file_processing import append_to_stitched
+        append_to_stitched(self)
+
+    def convert_to_pdf(self, doc_file):
+        from client.file_processing import convert_to_pdf
+        return convert_to_pdf(self, doc_file)
+
+    def convert_doc_to_pdf(self, doc_file):
+        from client.file_processing import convert_doc_to_pdf
+        return convert_doc_to_pdf(self, doc_file)
+
+    def convert_image_to_pdf(self, image_file):
+        from client.file_processing import convert_image_to_pdf
+        return convert_image_to_pdf(self, image_file)
+
+    def update_progress(self, fraction, eta_seconds=None):
+        from client.file_processing import update_progress
+        update_progress(self, fraction, eta_seconds)
+
+    def apply_scan_effect(self, pdf_path, output_pdf=None, job=None, profile=None):
+        from client.file_processing import apply_scan_effect
+        return apply_scan_effect(self, pdf_path, output_pdf, job, profile)
+
+    def resume_interrupted_jobs(self):
+        from client.workspace import workspace_root
+        root = workspace_root()
+        if not os.path.isdir(root) or not os.listdir(root):
+            return
+        from client.file_processing import resume_interrupted_jobs
+        resume_interrupted_jobs(self)
+
+    def prewarm_modules(self):
+        threading.Thread(target=prewarm_modules, name="prewarm", daemon=True).start()
+
+def main():
+    app = QApplication(sys.argv)
+    settings = QSettings("YourCompany", "DocStitcher")
+    license_token = settings.value("license_token")
+    lease = read_lease(license_token)
+    if lease is not None and not is_lease_usable(lease):
+        # Аренда истекла: один раз пробуем продлить её, прежде чем просить ключ
+        status, new_token, _ = revalidate_token(license_token, timeout=5)
+        if status == REVALIDATION_OK and new_token:
+            settings.setValue("license_token", new_token)
+            lease = read_lease(new_token)
+    if is_lease_usable(lease):
+        mainWin = MyWindow()
+        mainWin.show()
+        if lease.get("license_type_code") == "LICENSE-TRIAL":
+            QMessageBox.information(mainWin, "Пробный период", "Вы используете пробную версию.")
+    else:
+        welcome_dialog = WelcomeDialog(settings, get_device_id())
+        if welcome_dialog.exec_() == QDialog.Accepted:
+            mainWin = MyWindow()
+            mainWin.show()
+        else:
+            return 0
+    return app.exec_()
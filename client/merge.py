@@ -0,0 +1,34 @@
+import pymupdf as fitz
+
+from client.fitz_lock import FITZ_LOCK
+from client.pdf_output import save_pdf
+
+# Промежуточный файл сохраняется с garbage=4: одинаковые шрифты и картинки из разных
+# входных документов остаются в одном экземпляре
+MERGE_PROFILE = "archive"
+
+def merge_pdfs(pdf_lst, output_path, profile=MERGE_PROFILE):
+    """Объединяет PDF через PyMuPDF по одному входному файлу за раз.
+
+    Возвращает число страниц каждого входного документа (0, если файл не удалось добавить),
+    чтобы не открывать первый документ повторно ради first_page_count.
+    """
+    # Блокировка берётся на каждый файл, чтобы миниатюры и подготовка в фоне не ждали всё объединение
+    with FITZ_LOCK:
+        merged = fitz.open()
+    page_counts = []
+    try:
+        for pdf_file in pdf_lst:
+            try:
+                with FITZ_LOCK, fitz.open(pdf_file) as src:
+                    merged.insert_pdf(src)
+                    page_counts.append(len(src))
+            except Exception as e:
+                print(f"[!] Ошибка при добавлении {pdf_file}: {e}")
+                page_counts.append(0)
+        with FITZ_LOCK:
+            save_pdf(merged, output_path, profile)
+    finally:
+        with FITZ_LOCK:
+            merged.close()
+    return page_counts
@@ -0,0 +1,54 @@
+import os
+import time
+
+import pymupdf as fitz
+
+from client.config import OUTPUT_PROFILE
+
+# Параметры fitz.Document.save для каждого профиля; linear выполняется отдельно через pikepdf,
+# т.к. PyMuPDF больше не умеет линеаризовать
+OUTPUT_PROFILES = {
+    # Без оптимизаций: быстрее всего, файл крупнее
+    "fast": {"garbage": 1, "deflate": False, "use_objstms": False, "linear": False},
+    # Удаление неиспользуемых объектов и сжатие несжатых потоков
+    "standard": {"garbage": 3, "deflate": True, "use_objstms": True, "linear": False},
+    # Дедупликация одинаковых объектов (шрифты, картинки из разных файлов) — для архива
+    "archive": {"garbage": 4, "deflate": True, "use_objstms": True, "linear": False},
+    # Как archive, плюс линеаризация: первая страница открывается до загрузки всего файла
+    "email": {"garbage": 4, "deflate": True, "use_objstms": True, "linear": True},
+}
+DEFAULT_OUTPUT_PROFILE = "standard"
+
+def get_output_profile(name=None):
+    """Параметры профиля по имени; неизвестное имя заменяется профилем по умолчанию."""
+    name = name or OUTPUT_PROFILE
+    if name not in OUTPUT_PROFILES:
+        print(f"[!] Неизвестный профиль вывода '{name}', используется '{DEFAULT_OUTPUT_PROFILE}'")
+        name = DEFAULT_OUTPUT_PROFILE
+    return name, OUTPUT_PROFILES[name]
+
+def linearize_pdf(path):
+    import pikepdf
+    with pikepdf.open(path, allow_overwriting_input=True) as pdf:
+        pdf.save(path, linearize=True, object_stream_mode=pikepdf.ObjectStreamMode.generate)
+
+def save_pdf(doc, output_path, profile=None):
+    """Сохраняет документ с оптимизацией по профилю; возвращает (размер в байтах, время в секундах)."""
+    name, options = get_output_profile(profile)
+    start = time.perf_counter()
+    doc.save(output_path, garbage=options["garbage"], deflate=options["deflate"],
+             use_objstms=options["use_objstms"])
+    if options["linear"]:
+        try:
+            linearize_pdf(output_path)
+        except Exception as e:
+            print(f"[!] Не удалось линеаризовать {output_path}: {e}")
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(output_path)
+    print(f"[*] PDF сохранён с профилем '{name}': {size / 1024:.0f} КБ за {elapsed * 1000:.0f} мс")
+    return size, elapsed
+
+def optimize_pdf(input_path, output_path, profile=None):
+    """Переписывает готовый PDF с оптимизацией по профилю."""
+    with fitz.open(input_path) as doc:
+        return save_pdf(doc, output_path, profile)
@@ -0,0 +1,199 @@
+import hashlib
+import os
+import sys
+import threading
+from collections import deque
+
+from PyQt5.QtCore import QObject, QThread, QTimer, pyqtSignal, pyqtSlot
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+class PreparedFile:
+    """Результат предварительной обработки одного файла списка."""
+    __slots__ = ("path", "size", "mtime_ns", "digest", "pdf_path", "page_count")
+
+    def __init__(self, path, size, mtime_ns, digest, pdf_path, page_count):
+        self.path = path
+        self.size = size
+        self.mtime_ns = mtime_ns
+        self.digest = digest
+        self.pdf_path = pdf_path
+        self.page_count = page_count
+
+    @property
+    def owns_pdf(self):
+        # Для .pdf используется сам исходный файл, удалять его нельзя
+        return self.pdf_path != self.path
+
+    def is_current(self):
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            return False
+        return stat.st_size == self.size and stat.st_mtime_ns == self.mtime_ns
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+class PreprocessService(QObject):
+    """Фоновая подготовка файлов сразу после добавления в список.
+
+    Живёт в своём QThread с минимальным приоритетом: считает хэш, конвертирует .doc/.docx
+    и картинки в PDF и считает страницы, по одному файлу за шаг. Хэш сообщается сигналом
+    digest_known сразу, до конвертации: по нему список берёт миниатюру из кэша. К моменту нажатия
+    "Объединить" convert_inputs забирает готовые PDF через lookup. Конвертацию уже
+    начатого файла прервать нельзя (Word/COM), поэтому отмена удаляет результат после шага.
+    """
+    file_prepared = pyqtSignal(str, object)
+    digest_known = pyqtSignal(str, str)
+    enqueue_requested = pyqtSignal(str)
+    cancel_requested = pyqtSignal(str)
+    stop_requested = pyqtSignal()
+
+    def __init__(self):
+        super().__init__()
+        # Сюда convert_* складывают свои временные файлы, как в окне
+        self.temp_file_path = []
+        self.workspace = None
+        self.pending = deque()
+        self.refs = {}
+        self.prepared = {}
+        self.lock = threading.Lock()
+        self.timer = None
+        self.com_initialized = False
+        self.enqueue_requested.connect(self.enqueue)
+        self.cancel_requested.connect(self.cancel)
+        self.stop_requested.connect(self.stop)
+
+    @pyqtSlot()
+    def start(self):
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.step)
+        if sys.platform == "win32":
+            try:
+                import pythoncom
+                pythoncom.CoInitialize()
+                self.com_initialized = True
+            except Exception as e:
+                print(f"[!] Не удалось инициализировать COM для фоновой конвертации: {e}")
+
+    @pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+        self.pending.clear()
+        with self.lock:
+            prepared = list(self.prepared.values())
+            self.prepared.clear()
+        for item in prepared:
+            self.discard(item)
+        if self.workspace is not None:
+            self.workspace.cleanup()
+        if self.com_initialized:
+            import pythoncom
+            pythoncom.CoUninitialize()
+        QThread.currentThread().quit()
+
+    @pyqtSlot(str)
+    def enqueue(self, path):
+        # Один и тот же файл может быть в списке несколько раз
+        self.refs[path] = self.refs.get(path, 0) + 1
+        if self.refs[path] == 1:
+            self.pending.append(path)
+            self.timer.start(0)
+
+    @pyqtSlot(str)
+    def cancel(self, path):
+        count = self.refs.get(path, 0) - 1
+        if count > 0:
+            self.refs[path] = count
+            return
+        self.refs.pop(path, None)
+        try:
+            self.pending.remove(path)
+        except ValueError:
+            pass
+        with self.lock:
+            item = self.prepared.pop(path, None)
+        if item is not None:
+            self.discard(item)
+
+    @pyqtSlot()
+    def step(self):
+        while self.pending and self.pending[0] not in self.refs:
+            self.pending.popleft()
+        if not self.pending:
+            return
+        path = self.pending.popleft()
+        item = self.prepare(path)
+        if item is not None:
+            with self.lock:
+                self.prepared[path] = item
+        self.file_prepared.emit(path, item)
+        if self.pending:
+            # Через цикл событий, чтобы между файлами успели прийти отмены
+            self.timer.start(0)
+
+    def prepare(self, path):
+        from client.file_processing import convert_to_pdf, convert_doc_to_pdf, convert_image_to_pdf
+        from client.fitz_lock import FITZ_LOCK
+        import pymupdf as fitz
+        try:
+            stat = os.stat(path)
+            digest = file_digest(path)
+            self.digest_known.emit(path, digest)
+            ext = path.lower().rsplit('.', 1)[-1]
+            if ext == 'docx':
+                pdf_path = convert_to_pdf(self, path)
+            elif ext == 'doc':
+                pdf_path = convert_doc_to_pdf(self, path)
+            elif ext == 'pdf':
+                pdf_path = path
+            elif ext in ('jpg', 'jpeg', 'png'):
+                pdf_path = convert_image_to_pdf(self, path)
+            else:
+                return None
+            if not pdf_path or not os.path.exists(pdf_path):
+                return None
+            with FITZ_LOCK, fitz.open(pdf_path) as doc:
+                page_count = len(doc)
+            print(f"[+] Подготовлен заранее: {path} ({page_count} стр.)")
+            return PreparedFile(path, stat.st_size, stat.st_mtime_ns, digest, pdf_path, page_count)
+        except Exception as e:
+            print(f"[!] Ошибка фоновой подготовки {path}: {e}")
+            return None
+
+    def discard(self, item):
+        if item.owns_pdf and os.path.exists(item.pdf_path):
+            try:
+                os.remove(item.pdf_path)
+            except Exception as e:
+                print(f"[!] Ошибка при удалении временного файла {item.pdf_path}: {e}")
+        if item.pdf_path in self.temp_file_path:
+            self.temp_file_path.remove(item.pdf_path)
+
+    def lookup(self, path):
+        """Готовый результат для файла, если он не менялся после подготовки (вызывается из GUI)."""
+        with self.lock:
+            item = self.prepared.get(path)
+        if item is not None and item.is_current() and os.path.exists(item.pdf_path):
+            return item
+        return None
+
+def start_preprocess_service(window):
+    thread = QThread(window)
+    service = PreprocessService()
+    service.moveToThread(thread)
+    thread.started.connect(service.start)
+    thread.finished.connect(service.deleteLater)
+    thread.start(QThread.IdlePriority)
+    return thread, service
+
+def stop_preprocess_service(thread, service):
+    service.stop_requested.emit()
+    thread.wait(5000)
@@ -0,0 +1,173 @@
+import html
+import os
+import time
+
+import pymupdf as fitz
+from PyQt5.QtCore import Qt
+from PyQt5.QtGui import QIcon, QImage, QPixmap
+from PyQt5.QtWidgets import (
+    QComboBox, QDialog, QHBoxLayout, QLabel, QMessageBox, QPushButton, QSpinBox, QVBoxLayout
+)
+
+from client.client_utils import resource_path
+from client.file_processing import decoration_assets, current_render_profile
+from client.fitz_lock import FITZ_LOCK
+from client.render_profiles import A4_WIDTH_PT, A4_HEIGHT_PT
+from client.render_worker import compose_page, pt_to_px
+
+# DPI черновика: лента и точки масштабируются от DPI, раскладка та же, что в итоговом файле
+PREVIEW_DPI = 60
+# Сколько отрисованных страниц держать, чтобы листание назад было мгновенным
+PREVIEW_CACHE_SIZE = 32
+
+def add_placeholder_page(doc, file_path):
+    page = doc.new_page(width=A4_WIDTH_PT, height=A4_HEIGHT_PT)
+    name = html.escape(os.path.basename(file_path))
+    page.insert_htmlbox(
+        fitz.Rect(60, A4_HEIGHT_PT / 2 - 60, A4_WIDTH_PT - 60, A4_HEIGHT_PT / 2 + 60),
+        f'<div style="text-align:center;font-size:18px;color:#777">Файл ещё готовится<br><b>{name}</b></div>'
+    )
+
+def build_preview_source(window):
+    """Склеивает входные файлы в документ в памяти; возвращает (документ, страниц в первом файле, заглушек).
+
+    Ничего не конвертирует, чтобы окно открылось сразу: берутся PDF из списка и то, что
+    сервис подготовки уже сконвертировал в фоне, а вместо остальных файлов — страница-заглушка.
+    """
+    preprocess = getattr(window, "preprocess", None)
+    with FITZ_LOCK:
+        doc = fitz.open()
+    first_page_count = None
+    placeholders = 0
+    for file_path in window.file_lst:
+        prepared = preprocess.lookup(file_path) if preprocess is not None else None
+        if prepared is not None:
+            pdf_file = prepared.pdf_path
+        elif file_path.lower().endswith(".pdf"):
+            pdf_file = file_path
+        else:
+            pdf_file = None
+        # Миниатюры и подготовка в фоне тоже вызывают MuPDF: каждый файл добавляется под блокировкой
+        with FITZ_LOCK:
+            pages_before = len(doc)
+            if pdf_file is not None:
+                try:
+                    with fitz.open(pdf_file) as src:
+                        doc.insert_pdf(src)
+                except Exception as e:
+                    print(f"[!] Ошибка при добавлении {pdf_file}: {e}")
+            if len(doc) == pages_before:
+                add_placeholder_page(doc, file_path)
+                placeholders += 1
+            if first_page_count is None:
+                first_page_count = len(doc)
+    return doc, first_page_count or 0, placeholders
+
+def pil_to_pixmap(img):
+    img = img.convert("RGB")
+    data = img.tobytes()
+    image = QImage(data, img.width, img.height, img.width * 3, QImage.Format_RGB888)
+    return QPixmap.fromImage(image.copy())
+
+class PreviewDialog(QDialog):
+    """Черновой просмотр итогового документа.
+
+    Страницы рендерятся по требованию, только та, что открыта, тем же compose_page,
+    что и при сохранении, но при PREVIEW_DPI. Последняя страница, как и в итоговом
+    файле, показывается без обработки.
+    """
+
+    def __init__(self, window, doc, first_page_count, placeholders=0):
+        super().__init__(window)
+        self.main_window = window
+        self.doc = doc
+        self.first_page_count = first_page_count
+        self.placeholders = placeholders
+        self.cache = {}
+        self.setWindowTitle("Предпросмотр")
+        self.setWindowIcon(QIcon(resource_path("assets/app_icon.png")))
+        self.a4_width_px = pt_to_px(A4_WIDTH_PT, PREVIEW_DPI)
+        self.a4_height_px = pt_to_px(A4_HEIGHT_PT, PREVIEW_DPI)
+
+        self.page_label = QLabel(self)
+        self.page_label.setAlignment(Qt.AlignCenter)
+        self.page_label.setMinimumSize(self.a4_width_px, self.a4_height_px)
+        self.prev_button = QPushButton("<", self)
+        self.prev_button.clicked.connect(lambda: self.page_spin.setValue(self.page_spin.value() - 1))
+        self.next_button = QPushButton(">", self)
+        self.next_button.clicked.connect(lambda: self.page_spin.setValue(self.page_spin.value() + 1))
+        self.page_spin = QSpinBox(self)
+        self.page_spin.setRange(1, len(doc))
+        self.page_spin.setSuffix(f" из {len(doc)}")
+        self.page_spin.valueChanged.connect(self.show_page)
+        # Меняет расположение ленты и в главном окне, чтобы сохранить то, что видно здесь
+        self.ribbon_position = QComboBox(self)
+        for i in range(window.ribbon_position.count()):
+            self.ribbon_position.addItem(window.ribbon_position.itemText(i))
+        self.ribbon_position.setCurrentText(window.ribbon_position.currentText())
+        self.ribbon_position.currentTextChanged.connect(self.on_ribbon_position_changed)
+        self.status_label = QLabel(self)
+
+        navigation_layout = QHBoxLayout()
+        navigation_layout.addWidget(self.prev_button)
+        navigation_layout.addWidget(self.page_spin)
+        navigation_layout.addWidget(self.next_button)
+        navigation_layout.addStretch()
+        navigation_layout.addWidget(QLabel("Расположение ленты:", self))
+        navigation_layout.addWidget(self.ribbon_position)
+        main_layout = QVBoxLayout()
+        main_layout.addLayout(navigation_layout)
+        main_layout.addWidget(self.page_label)
+        main_layout.addWidget(self.status_label)
+        self.setLayout(main_layout)
+        self.show_page(1)
+
+    def on_ribbon_position_changed(self, text):
+        self.main_window.ribbon_position.setCurrentText(text)
+        self.show_page(self.page_spin.value())
+
+    def show_page(self, number):
+        index = number - 1
+        self.prev_button.setEnabled(index > 0)
+        self.next_button.setEnabled(index < len(self.doc) - 1)
+        ribbon_position = self.ribbon_position.currentText()
+        checkbox_bw = self.main_window.checkbox_bw_first.isChecked()
+        key = (index, ribbon_position, checkbox_bw)
+        start = time.perf_counter()
+        pixmap = self.cache.get(key)
+        if pixmap is None:
+            pixmap = self.render_page(index, ribbon_position, checkbox_bw)
+            self.cache[key] = pixmap
+            if len(self.cache) > PREVIEW_CACHE_SIZE:
+                self.cache.pop(next(iter(self.cache)))
+        self.page_label.setPixmap(pixmap)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        status = f"Черновик {PREVIEW_DPI} DPI · страница построена за {elapsed_ms:.0f} мс"
+        if self.placeholders:
+            status += f" · ещё готовятся файлов: {self.placeholders}"
+        self.status_label.setText(status)
+
+    def render_page(self, index, ribbon_position, checkbox_bw):
+        with FITZ_LOCK:
+            page = self.doc.load_page(index)
+            if index == len(self.doc) - 1:
+                pix = page.get_pixmap(dpi=PREVIEW_DPI, alpha=False)
+                image = QImage(pix.samples, pix.width, pix.height, pix.stride, QImage.Format_RGB888)
+                return QPixmap.fromImage(image.copy())
+        # compose_page сама берёт блокировку только на растеризацию
+        grayscale = index < self.first_page_count and checkbox_bw
+        img = compose_page(page, index, self.a4_width_px, self.a4_height_px, PREVIEW_DPI, grayscale,
+                           (ribbon_position, *decoration_assets()), profile=current_render_profile(self.main_window))
+        return pil_to_pixmap(img)
+
+def show_preview(window):
+    if not window.file_lst:
+        QMessageBox.warning(window, "Ошибка", "Нет файлов для предпросмотра!")
+        return
+    doc, first_page_count, placeholders = build_preview_source(window)
+    try:
+        dialog = PreviewDialog(window, doc, first_page_count, placeholders)
+        dialog.exec_()
+    finally:
+        with FITZ_LOCK:
+            doc.close()
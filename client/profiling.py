@@ -0,0 +1,234 @@
+"""Диагностический режим: выборочное профилирование сохранения в окне и в процессах пула.
+
+Поток-сэмплер через равные промежутки снимает стек профилируемого потока (sys._current_frames),
+без трассировки каждого вызова, поэтому сохранение замедляется на единицы процентов.
+Каждый процесс пула пишет свою часть в каталог снимка не чаще раза в WORKER_FLUSH_INTERVAL_S
+и последний раз при остановке пула; по окончании сохранения части сливаются в один файл
+speedscope (https://www.speedscope.app) — по профилю на процесс, с параметрами задачи
+в названии и в metadata.
+
+Модуль без зависимостей: его импортирует render_worker. Включение и каталог задаёт
+вызывающий код (DOCSTITCHER_PROFILE в client/config.py или пункт меню "Сервис").
+"""
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+SPEEDSCOPE_SCHEMA = "https://www.speedscope.app/file-format-schema.json"
+PARENT_PART = "parent.json"
+WORKER_PART_PREFIX = "worker-"
+MAX_STACK_DEPTH = 200
+# Часть целиком переписывается при каждом сохранении, поэтому не после каждой страницы
+WORKER_FLUSH_INTERVAL_S = 2.0
+
+class StackSampler:
+    """Снимает стек одного потока раз в interval_s секунд.
+
+    Вес выборки — время с предыдущей: пока C-код (PyMuPDF, Pillow) держит GIL, сэмплер ждёт,
+    и всё это время достаётся стеку, из которого этот код был вызван.
+    """
+
+    def __init__(self, interval_s, thread_id=None):
+        self.interval_s = interval_s
+        self.thread_id = thread_id or threading.get_ident()
+        # (функция, файл, строка) -> индекс в frame_list
+        self.frames = {}
+        self.frame_list = []
+        # Кортеж индексов от корня к листу -> секунды
+        self.stacks = {}
+        self.samples = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def _run(self):
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is not None:
+                self._record(frame, now - last)
+            frame = None
+            last = now
+
+    def _record(self, frame, weight):
+        stack = []
+        while frame is not None and len(stack) < MAX_STACK_DEPTH:
+            code = frame.f_code
+            key = (code.co_name, code.co_filename, code.co_firstlineno)
+            index = self.frames.get(key)
+            if index is None:
+                index = self.frames[key] = len(self.frame_list)
+                self.frame_list.append(key)
+            stack.append(index)
+            frame = frame.f_back
+        stack = tuple(reversed(stack))
+        with self._lock:
+            self.stacks[stack] = self.stacks.get(stack, 0.0) + weight
+            self.samples += 1
+
+    def snapshot(self, name):
+        """Часть профиля процесса: свои кадры и стеки в индексах этих кадров."""
+        with self._lock:
+            return {
+                "name": name,
+                "frames": [list(key) for key in self.frame_list],
+                "stacks": [[list(stack), weight] for stack, weight in self.stacks.items()],
+                "samples": self.samples,
+            }
+
+def write_part(path, part):
+    temp_path = path + ".tmp"
+    with open(temp_path, "w", encoding="utf-8") as f:
+        json.dump(part, f)
+    os.replace(temp_path, path)
+
+# Профилирование процесса (или потока) пула: запускается инициализатором, часть пишется после страниц
+_worker = threading.local()
+# (сэмплер, название, путь части) всех процессов-потоков пула в этом процессе для finish_worker_profiles
+_worker_parts = []
+_worker_parts_lock = threading.Lock()
+
+def start_worker_profiler(capture_dir, interval_s):
+    if threading.current_thread() is threading.main_thread():
+        name = f"Процесс рендеринга {os.getpid()}"
+        part = f"{WORKER_PART_PREFIX}{os.getpid()}.json"
+        # Процесс пула, остановленный через close/join, сохраняет последнюю часть при выходе;
+        # модуль импортируется здесь, чтобы не утяжелять импорт render_worker вне диагностики
+        from multiprocessing import util
+        util.Finalize(None, finish_worker_profiles, exitpriority=10)
+    else:
+        name = f"Поток рендеринга {threading.current_thread().name}"
+        part = f"{WORKER_PART_PREFIX}{os.getpid()}-{threading.get_ident()}.json"
+    _worker.sampler = StackSampler(interval_s)
+    _worker.name = name
+    _worker.part = os.path.join(capture_dir, part)
+    _worker.flushed_at = time.monotonic()
+    with _worker_parts_lock:
+        _worker_parts.append((_worker.sampler, name, _worker.part))
+    _worker.sampler.start()
+
+def save_worker_part(sampler, name, path):
+    try:
+        write_part(path, sampler.snapshot(name))
+    except OSError as e:
+        print(f"[!] Не удалось сохранить профиль процесса рендеринга: {e}")
+
+def flush_worker_profile():
+    """Сохраняет часть процесса (потока) пула, если с прошлого сохранения прошло WORKER_FLUSH_INTERVAL_S."""
+    sampler = getattr(_worker, "sampler", None)
+    if sampler is None or time.monotonic() - _worker.flushed_at < WORKER_FLUSH_INTERVAL_S:
+        return
+    save_worker_part(sampler, _worker.name, _worker.part)
+    _worker.flushed_at = time.monotonic()
+
+def finish_worker_profiles():
+    """Останавливает сэмплеры пула в этом процессе и сохраняет последние части.
+
+    Вызывается при выходе процесса пула и в родителе после остановки пула потоков.
+    """
+    with _worker_parts_lock:
+        parts = _worker_parts[:]
+        _worker_parts.clear()
+    for sampler, name, path in parts:
+        sampler.stop()
+        save_worker_part(sampler, name, path)
+
+class ProfileCapture:
+    """Снимок одного сохранения: сэмплер родителя и каталог частей процессов пула."""
+
+    def __init__(self, output_dir, interval_ms=10, name="save"):
+        os.makedirs(output_dir, exist_ok=True)
+        self.output_dir = output_dir
+        self.interval_s = interval_ms / 1000
+        self.name = name
+        self.parts_dir = tempfile.mkdtemp(prefix="profile-parts-", dir=output_dir)
+        self.sampler = StackSampler(self.interval_s)
+        self.started = time.time()
+        self.elapsed = None
+        self.sampler.start()
+
+    def worker_args(self):
+        """initargs для start_worker_profiler в процессах пула."""
+        return self.parts_dir, self.interval_s
+
+    def stop(self):
+        if self.elapsed is None:
+            self.sampler.stop()
+            self.elapsed = time.time() - self.started
+            write_part(os.path.join(self.parts_dir, PARENT_PART), self.sampler.snapshot("Окно (родительский процесс)"))
+
+    def finish(self, tags):
+        """Останавливает сэмплер, сливает части в файл speedscope и возвращает его путь."""
+        self.stop()
+        parts = []
+        for entry in sorted(os.scandir(self.parts_dir), key=lambda entry: entry.name != PARENT_PART):
+            if not entry.name.endswith(".json"):
+                continue
+            try:
+                with open(entry.path, encoding="utf-8") as f:
+                    parts.append(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"[!] Часть профиля {entry.path} пропущена: {e}")
+        tags = dict(tags, elapsed_s=round(self.elapsed, 3), processes=len(parts),
+                    interval_ms=round(self.interval_s * 1000, 3))
+        stamp = time.strftime("%Y%m%d-%H%M%S", time.localtime(self.started))
+        path = os.path.join(self.output_dir, f"{self.name}-{stamp}.speedscope.json")
+        write_part(path, merge_parts(parts, describe(self.name, tags), tags))
+        for entry in os.scandir(self.parts_dir):
+            os.remove(entry.path)
+        os.rmdir(self.parts_dir)
+        return path
+
+def describe(name, tags):
+    summary = ", ".join(f"{key}={value}" for key, value in tags.items() if not isinstance(value, (dict, list)))
+    return f"DocStitcher {name}: {summary}"
+
+def merge_parts(parts, name, metadata):
+    """Один файл speedscope из частей процессов: общая таблица кадров, профиль на процесс."""
+    frames = []
+    frame_index = {}
+    profiles = []
+    for part in parts:
+        remap = []
+        for function, filename, line in part["frames"]:
+            key = (function, filename, line)
+            if key not in frame_index:
+                frame_index[key] = len(frames)
+                frames.append({"name": function, "file": filename, "line": line})
+            remap.append(frame_index[key])
+        samples = []
+        weights = []
+        for stack, weight in part["stacks"]:
+            samples.append([remap[index] for index in stack])
+            weights.append(weight)
+        profiles.append({
+            "type": "sampled",
+            "name": part["name"],
+            "unit": "seconds",
+            "startValue": 0,
+            "endValue": sum(weights),
+            "samples": samples,
+            "weights": weights,
+        })
+    return {
+        "$schema": SPEEDSCOPE_SCHEMA,
+        "name": name,
+        "exporter": "DocStitcher",
+        "activeProfileIndex": 0,
+        "shared": {"frames": frames},
+        "profiles": profiles,
+        "metadata": metadata,
+    }
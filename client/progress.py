@@ -0,0 +1,163 @@
+"""Прогресс объединения по всему конвейеру и оценка оставшегося времени.
+
+Работа делится на этапы (конвертация файлов по типам, объединение, рендер страниц,
+сохранение), у каждого — число единиц и цена единицы в секундах. Доля готового —
+это готовая работа, делённая на всю, поэтому полоса не сбрасывается между этапами.
+Цены уточняются по замерам (экспоненциальное сглаживание) и помнятся до конца сеанса,
+так что следующее объединение сразу получает правдоподобную оценку.
+"""
+import os
+import re
+import time
+import zipfile
+
+import pymupdf as fitz
+
+from client.fitz_lock import FITZ_LOCK
+
+# Не чаще этого интервала обновляется окно (и вызывается processEvents)
+PROGRESS_INTERVAL_S = 0.1
+# Вес нового замера в сглаженной цене единицы
+SMOOTHING = 0.2
+
+# Начальные цены, с за единицу: файл для конвертации, страницу для остальных этапов
+unit_costs = {
+    "word": 3.0,
+    "image": 0.15,
+    "pdf": 0.01,
+    "merge": 0.003,
+    "render": 0.4,
+    "save": 0.01,
+}
+
+INPUT_KINDS = {
+    ".doc": "word",
+    ".docx": "word",
+    ".jpg": "image",
+    ".jpeg": "image",
+    ".png": "image",
+    ".pdf": "pdf",
+}
+
+def input_kind(path):
+    return INPUT_KINDS.get(os.path.splitext(path)[1].lower(), "pdf")
+
+def render_cost_key(profile):
+    """Цена страницы зависит от DPI профиля, поэтому замеры ведутся по каждому отдельно."""
+    return f"render:{profile['dpi']}"
+
+def estimate_pages(path):
+    """Число страниц входного файла без конвертации; для .doc неизвестно и считается одной."""
+    kind = input_kind(path)
+    try:
+        if kind == "pdf":
+            with FITZ_LOCK, fitz.open(path) as doc:
+                return len(doc)
+        if path.lower().endswith(".docx"):
+            # Word сохраняет число страниц в свойствах документа
+            with zipfile.ZipFile(path) as archive:
+                app_xml = archive.read("docProps/app.xml").decode("utf-8", "ignore")
+            match = re.search(r"<Pages>(\d+)</Pages>", app_xml)
+            if match:
+                return max(int(match.group(1)), 1)
+    except Exception:
+        pass
+    return 1
+
+def format_eta(seconds):
+    seconds = int(round(seconds))
+    if seconds < 60:
+        return f"{seconds} с"
+    minutes, seconds = divmod(seconds, 60)
+    if minutes < 60:
+        return f"{minutes} мин {seconds:02d} с"
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours} ч {minutes:02d} мин"
+
+class ProgressTracker:
+    """Взвешенный прогресс этапов; report(доля, секунд осталось или None) вызывается не чаще interval.
+
+    Цена единицы замеряется как время от предыдущего продвижения любого этапа: этапы
+    одного объединения идут друг за другом, а страницы из пула приходят по порядку,
+    так что интервал между ними — это и есть пропускная способность рендера.
+    """
+
+    def __init__(self, report=None, interval=PROGRESS_INTERVAL_S):
+        self.report = report
+        self.interval = interval
+        # Этап -> [ключ цены, всего единиц, готово единиц]
+        self.stages = {}
+        self.measured = False
+        self.last_tick = time.perf_counter()
+        self.last_report = 0.0
+
+    def plan(self, stage, total, cost_key=None):
+        """Задаёт (или уточняет) объём этапа; уже сделанная часть сохраняется."""
+        entry = self.stages.get(stage)
+        done = entry[2] if entry is not None else 0
+        self.stages[stage] = [cost_key or stage, max(total, done), done]
+
+    def planned(self, stage):
+        return stage in self.stages
+
+    def restart_clock(self):
+        """Время с этого момента не попадёт в замер (например, пока открыт диалог)."""
+        self.last_tick = time.perf_counter()
+
+    def advance(self, stage, units=1):
+        now = time.perf_counter()
+        entry = self._entry(stage, units)
+        if units > 0:
+            sample = (now - self.last_tick) / units
+            previous = self._cost(entry[0])
+            unit_costs[entry[0]] = previous + SMOOTHING * (sample - previous)
+            self.measured = True
+        entry[2] += units
+        self.last_tick = now
+        self.maybe_report()
+
+    def skip(self, stage, units=1):
+        """Единицы, сделанные раньше (продолжение задачи, готовый PDF): считаются, но не замеряются."""
+        entry = self._entry(stage, units)
+        entry[2] += units
+        self.last_tick = time.perf_counter()
+        self.maybe_report()
+
+    def _entry(self, stage, units):
+        entry = self.stages.get(stage)
+        if entry is None:
+            entry = self.stages[stage] = [stage, 0, 0]
+        entry[1] = max(entry[1], entry[2] + units)
+        return entry
+
+    def _cost(self, key):
+        if key in unit_costs:
+            return unit_costs[key]
+        return unit_costs.get(key.split(":", 1)[0], 0.0)
+
+    def fraction(self):
+        total = done = 0.0
+        for key, stage_total, stage_done in self.stages.values():
+            cost = self._cost(key)
+            total += stage_total * cost
+            done += stage_done * cost
+        return min(done / total, 1.0) if total > 0 else 0.0
+
+    def eta(self):
+        """Секунд до конца по сглаженным ценам или None, пока не было ни одного замера."""
+        if not self.measured:
+            return None
+        return sum((stage_total - stage_done) * self._cost(key)
+                   for key, stage_total, stage_done in self.stages.values())
+
+    def maybe_report(self, force=False):
+        now = time.perf_counter()
+        if self.report is None or (not force and now - self.last_report < self.interval):
+            return
+        self.last_report = now
+        self.report(self.fraction(), self.eta())
+
+    def finish(self):
+        for entry in self.stages.values():
+            entry[2] = entry[1]
+        self.maybe_report(force=True)
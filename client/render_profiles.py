@@ -0,0 +1,48 @@
+"""Профили рендеринга страниц: DPI, фильтр уменьшения, резкость и настройки JPEG.
+
+Модуль без зависимостей: его импортируют и GUI, и процессы пула рендеринга.
+Размеры ленты и точек пересчитываются из DPI профиля (см. render_worker.draw_decorations).
+"""
+
+RENDER_PROFILES = {
+    # Внутренние копии: примерно в 3-4 раза быстрее архивного за счёт DPI и дешёвого фильтра
+    "draft": {
+        "label": "Черновик",
+        "dpi": 110,
+        "resample": "bilinear",
+        "sharpness": None,
+        "jpeg_quality": 80,
+        "jpeg_subsampling": 2,
+        "jpeg_optimize": True,
+    },
+    "standard": {
+        "label": "Стандарт",
+        "dpi": 150,
+        "resample": "lanczos",
+        "sharpness": 1.2,
+        "jpeg_quality": 90,
+        "jpeg_subsampling": 2,
+        "jpeg_optimize": True,
+    },
+    # Прежние параметры итогового файла
+    "archival": {
+        "label": "Архив",
+        "dpi": 210,
+        "resample": "lanczos",
+        "sharpness": 1.3,
+        "jpeg_quality": 100,
+        "jpeg_subsampling": 0,
+        "jpeg_optimize": True,
+    },
+}
+DEFAULT_RENDER_PROFILE = "archival"
+A4_WIDTH_PT = 595
+A4_HEIGHT_PT = 842
+
+def get_render_profile(name=None):
+    """Профиль по имени; неизвестное имя заменяется архивным."""
+    if name not in RENDER_PROFILES:
+        if name is not None:
+            print(f"[!] Неизвестный профиль рендеринга '{name}', используется '{DEFAULT_RENDER_PROFILE}'")
+        name = DEFAULT_RENDER_PROFILE
+    return RENDER_PROFILES[name]
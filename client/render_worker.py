@@ -0,0 +1,433 @@
+"""Процесс-рабочий рендеринга страниц.
+
+Модуль импортируется каждым процессом пула, поэтому зависит только от PyMuPDF и Pillow:
+без Qt, WMI, requests и конфигурации клиента. Это проверяет benchmarks/render_worker_imports.py.
+Те же функции выполняет и пул потоков (DOCSTITCHER_RENDER_BACKEND=thread): у каждого потока
+свои открытые документы, а вызовы MuPDF идут под FITZ_LOCK.
+"""
+import io
+import mmap
+import os
+import random
+import tempfile
+import threading
+from collections import OrderedDict
+
+import pymupdf as fitz
+from PIL import Image, ImageEnhance
+
+from client.fitz_lock import FITZ_LOCK
+from client.profiling import flush_worker_profile, start_worker_profiler
+from client.render_profiles import get_render_profile
+
+# Сколько памяти может занять растр исходной страницы в одном процессе пула
+RENDER_MEMORY_BUDGET_MB = 256
+# Запас строк вокруг полосы, чтобы фильтр LANCZOS на стыках видел соседние пиксели
+TILE_OVERLAP_PX = 8
+MIN_TILE_HEIGHT_PX = 64
+# Разрешение, под которое нарисованы PNG ленты
+SPRITE_BASE_DPI = 210
+# Скан считается страницей целиком, если его края не дальше этого от краёв страницы
+SCAN_COVER_TOLERANCE_PT = 1.5
+# Сканы с большим разрешением обычным путём уменьшаются до рабочего DPI
+MAX_NATIVE_DPI = 400
+
+# Исходные документы, разобранные один раз на процесс (поток) пула: ключ файла -> (файл, отображение,
+# буфер, документ). Общий пул демона горячих папок чередует страницы нескольких документов,
+# поэтому их держится несколько
+SOURCE_CACHE_SIZE = 4
+_local = threading.local()
+# (поток, кэш) всех потоков процесса, чтобы close_source закрыл их после пула потоков
+_caches = []
+_caches_lock = threading.Lock()
+
+def _source_cache():
+    sources = getattr(_local, "sources", None)
+    if sources is None:
+        sources = _local.sources = OrderedDict()
+        with _caches_lock:
+            _caches.append((threading.current_thread(), sources))
+    return sources
+
+def _file_key(doc_path):
+    stat = os.stat(doc_path)
+    return os.path.abspath(doc_path), stat.st_size, stat.st_mtime_ns
+
+def _close_entry(entry):
+    file, mapping, buffer, doc = entry
+    doc.close()
+    if mapping is not None:
+        buffer.release()
+        mapping.close()
+        file.close()
+
+def close_source():
+    """Закрывает документы всех потоков; вызывается, когда пул потоков уже остановлен."""
+    with _caches_lock:
+        caches = [sources for _, sources in _caches]
+        _caches[:] = [(thread, sources) for thread, sources in _caches if thread.is_alive()]
+    with FITZ_LOCK:
+        for sources in caches:
+            while sources:
+                _close_entry(sources.popitem(last=False)[1])
+
+def open_source(doc_path):
+    """Исходный PDF из кэша процесса (потока пула).
+
+    Файл отображается в память только для чтения, и PyMuPDF читает его прямо из отображения:
+    все процессы пула используют одни и те же страницы кэша ОС, а xref разбирается один раз
+    на процесс, а не на каждую страницу.
+    """
+    key = _file_key(doc_path)
+    sources = _source_cache()
+    entry = sources.get(key)
+    if entry is not None:
+        sources.move_to_end(key)
+        return entry[3]
+    while len(sources) >= SOURCE_CACHE_SIZE:
+        _close_entry(sources.popitem(last=False)[1])
+    file = open(doc_path, "rb")
+    try:
+        mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        # Пустой файл или ФС без поддержки mmap
+        file.close()
+        entry = (None, None, None, fitz.open(doc_path))
+    else:
+        buffer = memoryview(mapping)
+        entry = (file, mapping, buffer, fitz.open(stream=buffer, filetype="pdf"))
+    sources[key] = entry
+    return entry[3]
+
+def init_worker(doc_path, profiler=None):
+    """Инициализатор пула: документ открывается заранее, пока родитель раздаёт задачи.
+
+    profiler — (каталог частей, интервал) из ProfileCapture.worker_args в диагностическом режиме.
+    """
+    if profiler is not None:
+        start_worker_profiler(*profiler)
+    try:
+        with FITZ_LOCK:
+            open_source(doc_path)
+    except Exception as e:
+        print(f"[!] Не удалось открыть {doc_path} в процессе рендеринга: {e}")
+
+RESAMPLING_FILTERS = {
+    "nearest": Image.Resampling.NEAREST,
+    "bilinear": Image.Resampling.BILINEAR,
+    "bicubic": Image.Resampling.BICUBIC,
+    "lanczos": Image.Resampling.LANCZOS,
+}
+
+def pt_to_px(pt, dpi):
+    """Конвертирует пункты (pt) в пиксели (px) на основе DPI."""
+    return int(pt * dpi / 72)
+
+def render_fitted(page, dpi, max_width, max_height, grayscale, memory_budget_mb=RENDER_MEMORY_BUDGET_MB,
+                  resample=Image.Resampling.LANCZOS):
+    """Растеризует страницу и вписывает её в max_width x max_height.
+
+    Если растр всей страницы (A0, скан на 10 000 px) не помещается в бюджет памяти,
+    страница рендерится горизонтальными полосами, и каждая полоса сразу уменьшается
+    в свою часть итогового изображения. Результат не совпадает с рендером целиком побитно:
+    MuPDF сглаживает края обрезки иначе, и у отдельных пикселей на стыках (до 1% пикселей)
+    значение отличается на единицы уровней, в замерах — до 13 из 255.
+    """
+    matrix = fitz.Matrix(dpi / 72, dpi / 72)
+    with FITZ_LOCK:
+        page_rect = page.rect
+    full_rect = (page_rect * matrix).irect
+    # Растр MuPDF и его копия в PIL
+    full_bytes = full_rect.width * full_rect.height * 3 * 2
+    if full_bytes <= memory_budget_mb * 1024 * 1024:
+        with FITZ_LOCK:
+            pix = page.get_pixmap(alpha=False, matrix=matrix)
+            size, samples = (pix.width, pix.height), pix.samples
+            pix = None
+        img = Image.frombytes("RGB", size, samples)
+        samples = None
+        if grayscale:
+            img = img.convert("L")
+        scale = min(max_width / img.width, max_height / img.height)
+        new_width = int(img.width * scale)
+        new_height = int(img.height * scale)
+        return img.resize((new_width, new_height), resample)
+
+    src_width, src_height = full_rect.width, full_rect.height
+    scale = min(max_width / src_width, max_height / src_height)
+    new_width = int(src_width * scale)
+    new_height = int(src_height * scale)
+    scale_y = src_height / new_height
+    row_bytes = src_width * 3 * 2
+    tile_rows = max(MIN_TILE_HEIGHT_PX, memory_budget_mb * 1024 * 1024 // row_bytes - 2 * TILE_OVERLAP_PX)
+    target_rows = max(1, int(tile_rows / scale_y))
+    print(f"[*] Страница {src_width}x{src_height} px не помещается в {memory_budget_mb} МБ, "
+          f"рендер полосами по {tile_rows} строк")
+
+    result = Image.new("L" if grayscale else "RGB", (new_width, new_height), 255 if grayscale else (255, 255, 255))
+    for target_top in range(0, new_height, target_rows):
+        target_bottom = min(new_height, target_top + target_rows)
+        src_top = target_top * scale_y
+        src_bottom = target_bottom * scale_y
+        tile_top = max(0, int(src_top) - TILE_OVERLAP_PX)
+        tile_bottom = min(src_height, int(src_bottom + 0.999) + TILE_OVERLAP_PX)
+        clip = fitz.Rect(
+            page_rect.x0,
+            page_rect.y0 + tile_top * 72 / dpi,
+            page_rect.x1,
+            page_rect.y0 + tile_bottom * 72 / dpi
+        )
+        with FITZ_LOCK:
+            pix = page.get_pixmap(alpha=False, matrix=matrix, clip=clip)
+            size, samples = (pix.width, pix.height), pix.samples
+            pix = None
+        tile = Image.frombytes("RGB", size, samples)
+        samples = None
+        if grayscale:
+            tile = tile.convert("L")
+        # box задаёт точное (дробное) положение полосы в исходнике, а пиксели запаса
+        # вокруг box участвуют в фильтре, поэтому стыков между полосами не видно
+        tile_resized = tile.resize(
+            (new_width, target_bottom - target_top),
+            resample,
+            box=(0, src_top - tile_top, tile.width, src_bottom - tile_top)
+        )
+        result.paste(tile_resized, (0, target_top))
+        tile = tile_resized = None
+    return result
+
+def paste_sprite(canvas, sprite, x, y):
+    if canvas.mode != "RGBA":
+        canvas.paste(sprite, (x, y), sprite)
+        return
+    # На прозрачном слое paste умножил бы альфу спрайта саму на себя
+    if x < 0 or y < 0:
+        sprite = sprite.crop((max(0, -x), max(0, -y), sprite.width, sprite.height))
+        x, y = max(0, x), max(0, y)
+    sprite = sprite.crop((0, 0, min(sprite.width, canvas.width - x), min(sprite.height, canvas.height - y)))
+    canvas.alpha_composite(sprite, dest=(x, y))
+
+def draw_decorations(canvas, page_num, x_offset, y_offset, new_height, dpi, ribbon_position, ribbon_path,
+                     ribbon_left_path, ribbon_middle_path, dot1_path, dot2_path, dot_mid_path):
+    """Рисует ленту (первая страница) или точку (остальные) поверх уже размещённой страницы."""
+    # Размеры ленты заданы в пикселях исходного PNG для 210 DPI
+    sprite_scale = dpi / SPRITE_BASE_DPI
+    if page_num == 0:
+        ribbon_scale = 0.6 * sprite_scale
+        if ribbon_position == "Слева" and os.path.exists(ribbon_left_path):
+            ribbon = Image.open(ribbon_left_path).convert("RGBA")
+            ribbon_width = int(ribbon.width * ribbon_scale)
+            ribbon_height = int(ribbon.height * ribbon_scale)
+            ribbon_resized = ribbon.resize((ribbon_width, ribbon_height), Image.Resampling.LANCZOS)
+            ribbon_x = x_offset - pt_to_px(3.09, dpi)
+            ribbon_y = y_offset + pt_to_px(40, dpi)
+            paste_sprite(canvas, ribbon_resized, ribbon_x, ribbon_y)
+        elif ribbon_position == "По середине" and os.path.exists(ribbon_middle_path):
+            ribbon_scale = 0.7 * sprite_scale
+            ribbon = Image.open(ribbon_middle_path).convert("RGBA")
+            ribbon_width = int(ribbon.width * ribbon_scale)
+            ribbon_height = int(ribbon.height * ribbon_scale)
+            ribbon_resized = ribbon.resize((ribbon_width, ribbon_height), Image.Resampling.LANCZOS)
+            ribbon_x = x_offset
+            ribbon_y = y_offset + (new_height // 2) - ribbon_height // 2
+            paste_sprite(canvas, ribbon_resized, ribbon_x, ribbon_y)
+        else:
+            ribbon = Image.open(ribbon_path).convert("RGBA")
+            ribbon_width = int(ribbon.width * ribbon_scale)
+            ribbon_height = int(ribbon.height * ribbon_scale)
+            ribbon_resized = ribbon.resize((ribbon_width, ribbon_height), Image.Resampling.LANCZOS)
+            ribbon_x = x_offset + pt_to_px(51, dpi)
+            ribbon_y = y_offset - pt_to_px(2.74, dpi)
+            paste_sprite(canvas, ribbon_resized, ribbon_x, ribbon_y)
+    elif os.path.exists(dot1_path) and os.path.exists(dot2_path):
+        if ribbon_position == "Слева" or ribbon_position == "Сверху":
+            dot_file = random.choice([dot1_path, dot2_path])
+            dot = Image.open(dot_file).convert("RGBA")
+            dot_width = pt_to_px(16, dpi)
+            dot_height = pt_to_px(16, dpi)
+            dot = dot.resize((dot_width, dot_height), Image.Resampling.LANCZOS)
+            if ribbon_position == "Слева":
+                dot_x = x_offset + pt_to_px(17, dpi)
+                dot_y = y_offset + pt_to_px(40, dpi)
+            else:
+                dot_x = x_offset + pt_to_px(59, dpi)
+                dot_y = y_offset + pt_to_px(30, dpi)
+            paste_sprite(canvas, dot, dot_x, dot_y)
+        elif ribbon_position == "По середине" and os.path.exists(dot_mid_path):
+            dot = Image.open(dot_mid_path).convert("RGBA")
+            original_width, original_height = dot.size
+            scale_height = new_height / original_height
+            new_dot_height = new_height
+            new_dot_width = int(original_width * scale_height)
+            dot_resized = dot.resize((new_dot_width, new_dot_height), Image.Resampling.LANCZOS)
+            paste_sprite(canvas, dot_resized, x_offset, y_offset)
+
+def find_scan_image(page):
+    """Возвращает xref картинки, если страница — это один скан на весь лист и больше ничего.
+
+    Невидимый текст (OCR-слой) допускается: при рендере он всё равно не отображается.
+    """
+    if page.rotation:
+        return None
+    images = page.get_images(full=True)
+    if len(images) != 1:
+        return None
+    xref = images[0][0]
+    if images[0][1]:
+        # У картинки есть маска прозрачности
+        return None
+    if any(span["type"] != 3 for span in page.get_texttrace()):
+        return None
+    if page.get_drawings():
+        return None
+    placements = page.get_image_rects(xref, transform=True)
+    if len(placements) != 1:
+        return None
+    rect, matrix = placements[0]
+    if matrix.b or matrix.c or matrix.a <= 0 or matrix.d <= 0:
+        # Картинка повёрнута или отражена
+        return None
+    page_rect = page.rect
+    if any(abs(a - b) > SCAN_COVER_TOLERANCE_PT for a, b in zip(rect, page_rect)):
+        return None
+    return xref
+
+def fitted_layout(width, height, a4_width, a4_height, margin):
+    """Размер и смещение страницы, вписанной в A4 с полями (в тех же единицах, что и аргументы)."""
+    scale = min((a4_width - 2 * margin) / width, (a4_height - 2 * margin) / height)
+    new_width = int(width * scale)
+    new_height = int(height * scale)
+    return new_width, new_height, (a4_width - new_width) // 2, (a4_height - new_height) // 2
+
+def save_page_jpeg(img, dpi, profile, output_dir=None):
+    temp_img_path = new_temp_path(".jpg", output_dir)
+    img.save(temp_img_path, "JPEG", dpi=(dpi, dpi), quality=profile["jpeg_quality"],
+             subsampling=profile["jpeg_subsampling"], optimize=profile["jpeg_optimize"])
+    return temp_img_path
+
+def process_scan_page(doc, page, xref, page_num, a4_width_px, a4_height_px, dpi, grayscale, decorations, profile,
+                      output_dir=None):
+    """Страница-скан без повторной растеризации.
+
+    JPEG без перевода в Ч/Б вставляется в итоговый PDF как есть, а декор кладётся
+    отдельным прозрачным слоем. Иначе картинка декодируется и декор рисуется на ней
+    в её собственном разрешении. Возвращает список слоёв или None, если скан не подходит.
+    """
+    with FITZ_LOCK:
+        image_info = doc.extract_image(xref)
+        page_rect = page.rect
+    if not image_info or image_info.get("colorspace") not in (1, 3):
+        return None
+    a4_width_pt = a4_width_px * 72 / dpi
+    a4_height_pt = a4_height_px * 72 / dpi
+    width_pt, height_pt, x_pt, y_pt = fitted_layout(page_rect.width, page_rect.height, a4_width_pt, a4_height_pt, 5)
+    # Разрешение, в котором пиксель скана совпадает с пикселем холста
+    native_dpi = image_info["width"] / width_pt * 72
+    if native_dpi > MAX_NATIVE_DPI:
+        return None
+    native_a4_width = pt_to_px(a4_width_pt, native_dpi)
+    native_a4_height = pt_to_px(a4_height_pt, native_dpi)
+    new_width = pt_to_px(width_pt, native_dpi)
+    new_height = pt_to_px(height_pt, native_dpi)
+    x_offset = pt_to_px(x_pt, native_dpi)
+    y_offset = pt_to_px(y_pt, native_dpi)
+
+    if image_info["ext"] in ("jpeg", "jpg") and (not grayscale or image_info["colorspace"] == 1):
+        scan_path = new_temp_path(".jpg", output_dir)
+        with open(scan_path, "wb") as f:
+            f.write(image_info["image"])
+        layers = [(scan_path, (x_pt, y_pt, x_pt + width_pt, y_pt + height_pt))]
+        overlay = Image.new("RGBA", (native_a4_width, native_a4_height), (0, 0, 0, 0))
+        draw_decorations(overlay, page_num, x_offset, y_offset, new_height, native_dpi, *decorations)
+        bbox = overlay.getbbox()
+        if bbox:
+            overlay_path = new_temp_path(".png", output_dir)
+            overlay.crop(bbox).save(overlay_path, "PNG", optimize=False, compress_level=1)
+            x0, y0, x1, y1 = (v * 72 / native_dpi for v in bbox)
+            layers.append((overlay_path, (x0, y0, x1, y1)))
+        return layers
+
+    try:
+        img = Image.open(io.BytesIO(image_info["image"]))
+        img = img.convert("L" if grayscale else "RGB")
+    except Exception:
+        return None
+    if img.size != (new_width, new_height):
+        img = img.resize((new_width, new_height), RESAMPLING_FILTERS[profile["resample"]])
+    new_img = Image.new("RGB", (native_a4_width, native_a4_height), (255, 255, 255))
+    new_img.paste(img, (x_offset, y_offset))
+    draw_decorations(new_img, page_num, x_offset, y_offset, new_height, native_dpi, *decorations)
+    return [(save_page_jpeg(new_img, native_dpi, profile, output_dir), None)]
+
+def new_temp_path(suffix, directory=None):
+    # Файлы создаёт несколько процессов пула сразу, поэтому имя резервируется самим файлом
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    os.close(fd)
+    return path
+
+def compose_page(page, output_index, a4_width_px, a4_height_px, dpi, grayscale, decorations,
+                 memory_budget_mb=RENDER_MEMORY_BUDGET_MB, profile=None):
+    """Растеризует страницу, вписывает её в лист A4 и рисует декор; возвращает изображение листа.
+
+    Общий код для сохранения и предпросмотра (низкое DPI). Фильтр и резкость берутся из профиля,
+    DPI передаётся отдельно, чтобы предпросмотр мог его понизить.
+    """
+    profile = profile or get_render_profile()
+    margin_px = pt_to_px(5, dpi)
+    max_width = a4_width_px - 2 * margin_px
+    max_height = a4_height_px - 2 * margin_px
+    img_resized = render_fitted(page, dpi, max_width, max_height, grayscale, memory_budget_mb,
+                                RESAMPLING_FILTERS[profile["resample"]])
+    new_width, new_height = img_resized.size
+
+    if profile["sharpness"]:
+        enhancer = ImageEnhance.Sharpness(img_resized)
+        img_resized = enhancer.enhance(profile["sharpness"])
+
+    new_img = Image.new("RGB", (a4_width_px, a4_height_px), (255, 255, 255))
+    x_offset = (a4_width_px - new_width) // 2
+    y_offset = (a4_height_px - new_height) // 2
+    new_img.paste(img_resized, (x_offset, y_offset))
+    draw_decorations(new_img, output_index, x_offset, y_offset, new_height, dpi, *decorations)
+    return new_img
+
+def process_page(page_num, doc_path, a4_width_px, a4_height_px, dpi, ribbon_position, first_page_count,
+                 checkbox_bw, ribbon_path, ribbon_left_path, ribbon_middle_path, dot1_path, dot2_path,
+                 dot_mid_path, memory_budget_mb=RENDER_MEMORY_BUDGET_MB, page_offset=0, profile=None,
+                 output_dir=None):
+    """Обрабатывает одну страницу в отдельном процессе.
+
+    page_num — номер страницы в doc_path, page_offset — номер первой страницы doc_path в итоговом
+    документе (при дописывании в готовый документ). Возвращает номер страницы и список слоёв
+    (путь к картинке, прямоугольник на листе A4 в pt или None для всего листа), которые нужно
+    наложить друг на друга. profile — словарь из render_profiles (по умолчанию архивный).
+    output_dir — каталог для слоёв (рабочий каталог задачи), по умолчанию системный временный.
+    """
+    try:
+        profile = profile or get_render_profile()
+        output_index = page_num + page_offset
+        grayscale = output_index < first_page_count and checkbox_bw
+        decorations = (ribbon_position, ribbon_path, ribbon_left_path, ribbon_middle_path, dot1_path, dot2_path,
+                       dot_mid_path)
+
+        with FITZ_LOCK:
+            doc = open_source(doc_path)
+            page = doc.load_page(page_num)
+            scan_xref = find_scan_image(page)
+        if scan_xref is not None:
+            layers = process_scan_page(doc, page, scan_xref, output_index, a4_width_px, a4_height_px, dpi, grayscale,
+                                       decorations, profile, output_dir)
+            if layers is not None:
+                return page_num, layers
+
+        new_img = compose_page(page, output_index, a4_width_px, a4_height_px, dpi, grayscale, decorations,
+                               memory_budget_mb, profile)
+        page = None
+
+        # subsampling = 2 на взгляд ничего не меняет, но уменьшает файл на ~22%: так сделано в профиле standard
+        return page_num, [(save_page_jpeg(new_img, dpi, profile, output_dir), None)]
+    except Exception as e:
+        print(f"[!] Ошибка при обработке страницы {page_num}: {e}")
+        return page_num, None
+    finally:
+        flush_worker_profile()
@@ -0,0 +1,225 @@
+import os
+import tempfile
+from collections import OrderedDict, deque
+
+from PyQt5.QtCore import QObject, QStandardPaths, QThread, QTimer, pyqtSignal, pyqtSlot
+from PyQt5.QtGui import QColor, QPainter, QPixmap
+
+from client.config import THUMBNAIL_CACHE_MB
+
+# Длинная сторона миниатюры в пикселях; страница рендерится сразу в этот размер (~4-6 DPI для A4)
+THUMBNAIL_MAX_PX = 48
+# Миниатюр в памяти GUI-процесса
+MEMORY_CACHE_SIZE = 512
+# Запросы для строк, которые уже прокрутили, отбрасываются: рендерятся самые свежие
+MAX_PENDING_REQUESTS = 64
+
+def default_cache_dir():
+    # Свой подкаталог: ~/.cache/thumbnails на Linux уже занят системным кэшем миниатюр
+    base = QStandardPaths.writableLocation(QStandardPaths.GenericCacheLocation) or tempfile.gettempdir()
+    return os.path.join(base, "DocStitcher", "thumbnails")
+
+class ThumbnailDiskCache:
+    """PNG-миниатюры на диске по SHA-256 содержимого файла; при превышении лимита удаляются давно не открытые."""
+
+    def __init__(self, cache_dir, max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.total_bytes = None
+
+    def path_for(self, digest):
+        return os.path.join(self.cache_dir, digest[:2], digest + ".png")
+
+    def get(self, digest):
+        path = self.path_for(digest)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # Время изменения служит отметкой последнего использования для вытеснения
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, digest, data):
+        path = self.path_for(digest)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        if self.total_bytes is None:
+            self.total_bytes = sum(size for _, _, size in self.entries())
+        else:
+            self.total_bytes += len(data)
+        if self.total_bytes > self.max_bytes:
+            self.evict()
+
+    def entries(self):
+        if not os.path.isdir(self.cache_dir):
+            return []
+        result = []
+        for bucket in os.scandir(self.cache_dir):
+            if not bucket.is_dir():
+                continue
+            for entry in os.scandir(bucket.path):
+                if entry.name.endswith(".png"):
+                    stat = entry.stat()
+                    result.append((stat.st_mtime, entry.path, stat.st_size))
+        return result
+
+    def evict(self):
+        # Освобождаем до 90% лимита, чтобы не сканировать каталог на каждой новой миниатюре
+        entries = sorted(self.entries())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.total_bytes = total
+
+def render_thumbnail(pdf_path, max_px=THUMBNAIL_MAX_PX):
+    """PNG первой страницы, вписанной в max_px по длинной стороне."""
+    import pymupdf as fitz
+    from client.fitz_lock import FITZ_LOCK
+    # Поток миниатюр работает одновременно с окном и потоками рендеринга
+    with FITZ_LOCK, fitz.open(pdf_path) as doc:
+        page = doc.load_page(0)
+        scale = max_px / max(page.rect.width, page.rect.height)
+        pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+        return pix.tobytes("png")
+
+class ThumbnailWorker(QObject):
+    """Рендер миниатюр в отдельном потоке с минимальным приоритетом."""
+    thumbnail_ready = pyqtSignal(str, bytes)
+    request_dropped = pyqtSignal(str)
+    thumbnail_missing = pyqtSignal(str)
+    render_requested = pyqtSignal(str, str)
+    stop_requested = pyqtSignal()
+
+    def __init__(self, disk_cache):
+        super().__init__()
+        self.disk_cache = disk_cache
+        self.pending = deque()
+        self.timer = None
+        self.render_requested.connect(self.enqueue)
+        self.stop_requested.connect(self.stop)
+
+    @pyqtSlot()
+    def start(self):
+        self.timer = QTimer(self)
+        self.timer.setSingleShot(True)
+        self.timer.timeout.connect(self.step)
+
+    @pyqtSlot()
+    def stop(self):
+        if self.timer is not None:
+            self.timer.stop()
+        self.pending.clear()
+        QThread.currentThread().quit()
+
+    @pyqtSlot(str, str)
+    def enqueue(self, digest, pdf_path):
+        self.pending.append((digest, pdf_path))
+        while len(self.pending) > MAX_PENDING_REQUESTS:
+            dropped_digest, _ = self.pending.popleft()
+            self.request_dropped.emit(dropped_digest)
+        self.timer.start(0)
+
+    @pyqtSlot()
+    def step(self):
+        if not self.pending:
+            return
+        # Последний запрос — строка, которую видно сейчас
+        digest, pdf_path = self.pending.pop()
+        data = self.disk_cache.get(digest)
+        if data is None and not pdf_path:
+            # Файл ещё конвертируется, а в кэше миниатюры нет: отрисуем, когда появится PDF
+            self.thumbnail_missing.emit(digest)
+        elif data is None:
+            try:
+                data = render_thumbnail(pdf_path)
+                self.disk_cache.put(digest, data)
+            except Exception as e:
+                print(f"[!] Не удалось построить миниатюру {pdf_path}: {e}")
+                data = b""
+        if data is not None:
+            self.thumbnail_ready.emit(digest, data)
+        if self.pending:
+            self.timer.start(0)
+
+class ThumbnailProvider(QObject):
+    """Миниатюры для списка файлов: память, затем диск, затем фоновый рендер.
+
+    pixmap() вызывается из data() модели только для видимых строк и никогда не блокирует:
+    если миниатюры ещё нет, ставит запрос в очередь и возвращает None. Без pdf_path (файл
+    ещё конвертируется) миниатюра берётся только из кэша на диске.
+    """
+    thumbnail_changed = pyqtSignal(str)
+
+    def __init__(self, parent=None, cache_dir=None, max_bytes=THUMBNAIL_CACHE_MB * 1024 * 1024):
+        super().__init__(parent)
+        self.pixmaps = OrderedDict()
+        self.requested = set()
+        # Нет на диске; без pdf_path их не запрашиваем повторно при каждой отрисовке
+        self.missing = set()
+        self.thread = QThread(self)
+        self.worker = ThumbnailWorker(ThumbnailDiskCache(cache_dir or default_cache_dir(), max_bytes))
+        self.worker.moveToThread(self.thread)
+        self.thread.started.connect(self.worker.start)
+        self.thread.finished.connect(self.worker.deleteLater)
+        self.worker.thumbnail_ready.connect(self.on_thumbnail_ready)
+        self.worker.request_dropped.connect(self.on_request_dropped)
+        self.worker.thumbnail_missing.connect(self.on_thumbnail_missing)
+        self.thread.start(QThread.LowestPriority)
+
+    def pixmap(self, digest, pdf_path):
+        pixmap = self.pixmaps.get(digest)
+        if pixmap is not None:
+            self.pixmaps.move_to_end(digest)
+            return pixmap
+        if not pdf_path and digest in self.missing:
+            return None
+        if digest not in self.requested:
+            self.requested.add(digest)
+            self.worker.render_requested.emit(digest, pdf_path or "")
+        return None
+
+    def on_request_dropped(self, digest):
+        # Строка снова станет видимой — запрос повторится из data()
+        self.requested.discard(digest)
+
+    def on_thumbnail_missing(self, digest):
+        self.requested.discard(digest)
+        self.missing.add(digest)
+
+    def on_thumbnail_ready(self, digest, data):
+        self.requested.discard(digest)
+        self.missing.discard(digest)
+        pixmap = QPixmap()
+        if not data or not pixmap.loadFromData(data, "PNG"):
+            # Пустая картинка, чтобы не запрашивать сломанный файл при каждой отрисовке
+            pixmap = QPixmap(1, 1)
+            pixmap.fill()
+        else:
+            # Рамка, иначе белая страница сливается с фоном списка
+            painter = QPainter(pixmap)
+            painter.setPen(QColor(180, 180, 180))
+            painter.drawRect(0, 0, pixmap.width() - 1, pixmap.height() - 1)
+            painter.end()
+        self.pixmaps[digest] = pixmap
+        while len(self.pixmaps) > MEMORY_CACHE_SIZE:
+            self.pixmaps.popitem(last=False)
+        self.thumbnail_changed.emit(digest)
+
+    def stop(self):
+        self.worker.stop_requested.emit()
+        self.thread.wait(3000)
@@ -0,0 +1,115 @@
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+import weakref
+
+from PyQt5.QtCore import QLockFile
+
+from client.config import WORKSPACE_ROOT, WORKSPACE_QUOTA_MB
+
+LOCK_NAME = "workspace.lock"
+SESSION_PREFIX = "session-"
+
+def workspace_root():
+    """Каталог DocStitcher внутри DOCSTITCHER_WORKSPACE_ROOT (по умолчанию системный временный)."""
+    return os.path.join(WORKSPACE_ROOT or tempfile.gettempdir(), "DocStitcher")
+
+class Workspace:
+    """Каталог промежуточных файлов с учётом занятого места.
+
+    Файлы получают имена через new_path и учитываются через track/remove; has_room сообщает,
+    помещается ли ещё столько-то байт в квоту, и по нему пул рендеринга придерживает
+    новые страницы. Созданный через create каталог удаляется в cleanup, при выходе из with,
+    при сборке объекта и при завершении интерпретатора; после падения процесса его убирает
+    collect_stale_workspaces по устаревшей блокировке.
+    """
+
+    def __init__(self, directory, quota_bytes=None, owned=False, dir_lock=None):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.quota_bytes = WORKSPACE_QUOTA_MB * 1024 * 1024 if quota_bytes is None else quota_bytes
+        self._names = itertools.count(1)
+        self._lock = threading.Lock()
+        # Файлы, оставшиеся с прошлого запуска (продолжение задачи), тоже занимают квоту
+        self._sizes = {entry.path: entry.stat().st_size for entry in os.scandir(directory)
+                       if entry.is_file() and entry.name != LOCK_NAME}
+        self.used_bytes = sum(self._sizes.values())
+        self._dir_lock = dir_lock
+        self._finalizer = weakref.finalize(self, _remove_directory, directory, dir_lock) if owned else None
+
+    @classmethod
+    def create(cls, prefix=SESSION_PREFIX, root=None, quota_bytes=None):
+        root = root or workspace_root()
+        os.makedirs(root, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=prefix, dir=root)
+        dir_lock = QLockFile(os.path.join(directory, LOCK_NAME))
+        dir_lock.setStaleLockTime(0)
+        dir_lock.tryLock(0)
+        return cls(directory, quota_bytes, owned=True, dir_lock=dir_lock)
+
+    def new_path(self, suffix):
+        with self._lock:
+            return os.path.join(self.directory, f"{next(self._names):06d}{suffix}")
+
+    def track(self, paths):
+        with self._lock:
+            for path in paths:
+                try:
+                    size = os.path.getsize(path)
+                except OSError:
+                    continue
+                self.used_bytes += size - self._sizes.get(path, 0)
+                self._sizes[path] = size
+
+    def remove(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                print(f"[!] Ошибка при удалении временного файла {path}: {e}")
+                continue
+            with self._lock:
+                self.used_bytes -= self._sizes.pop(path, 0)
+
+    def has_room(self, extra_bytes=0):
+        return self.used_bytes + extra_bytes <= self.quota_bytes
+
+    def cleanup(self):
+        if self._finalizer is not None:
+            self._finalizer()
+        self._sizes.clear()
+        self.used_bytes = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.cleanup()
+
+def _remove_directory(directory, dir_lock):
+    if dir_lock is not None:
+        dir_lock.unlock()
+    shutil.rmtree(directory, ignore_errors=True)
+
+def collect_stale_workspaces(root=None):
+    """Удаляет каталоги сеансов, чей процесс завершился, не успев их убрать; возвращает число удалённых."""
+    root = root or workspace_root()
+    if not os.path.isdir(root):
+        return 0
+    removed = 0
+    for entry in os.scandir(root):
+        if not entry.is_dir() or not entry.name.startswith(SESSION_PREFIX):
+            continue
+        lock = QLockFile(os.path.join(entry.path, LOCK_NAME))
+        lock.setStaleLockTime(0)
+        if lock.tryLock(0):
+            lock.unlock()
+            shutil.rmtree(entry.path, ignore_errors=True)
+            removed += 1
+    if removed:
+        print(f"[*] Удалено временных каталогов прошлых сеансов: {removed}")
+    return removed